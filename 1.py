@@ -1,19 +1,4 @@
-data_map = {
-    'index': '1997-2022年市场化指数（含分项指数）',
-    'province1': '分省年度数据',
-    'province2': '分省年度数据-GDP',
-    'province3': '分省年度数据-第二产业增加值',
-    'province4': '分省年度数据-第三产业增加值',
-    'province5': '分省年度数据-二氧化硫排放量',
-    'province6': '分省年度数据-工业增加值',
-    'province7': '分省年度数据-规模以上工业企业R&D经费‘’支出‘’',
-    'province8': '分省年度数据-规模以上工业企业利润总额',
-    'province9': '分省年度数据-规模以上工业企业主营业务成本',
-    'province10': '分省年度数据-规模以上工业营业收入',
-    'province11': '分省年度数据-化学需氧量',
-    'province12': '分省年度数据-货物进出口总额',
-    'province13': '分省年度数据-煤炭消费量',
-    'province14': '分省年度数据-外商直接投资额',
-    'product1': '制造业高质量发展指数',
-    'product2': '制造业指标',
-}
\ No newline at end of file
+from config import Config
+
+# 指标数据目录已移至Config.DATA_MAP，由app.models.panel统一加载
+data_map = Config.DATA_MAP
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+应用工厂
+
+create_app()只导入Flask和各视图模块，视图在处理请求时才导入pandas、Spark等数据层模块，
+数据处理器和Spark会话也在首次使用时才创建，应用创建后即可响应请求。
+为了不让第一个数据请求承担导入耗时，应用创建后在后台线程中导入数据层模块
+（Config.PRELOAD_ON_START）并预热Spark会话（Config.SPARK_WARMUP_ON_START）。
+
+启动耗时可用 python startup_report.py 检查。
+"""
+
+import importlib
+import importlib.util
+import os
+import sys
+import threading
+
+from flask import Flask
+
+from config import Config
+from app.models.metrics import timer
+
+# 后台预热时导入的数据层模块
+PRELOAD_MODULES = (
+    'app.models.data_processor',
+    'app.models.preview',
+    'app.models.stats_index',
+    'app.models.chart_service',
+    'app.models.correlation',
+    'app.models.upload_jobs',
+    'app.models.jobs',
+)
+
+# 退出时关闭的后台资源：(模块, 模块中保存单例的变量, 关闭方法)
+SERVICES = (
+    ('app.models.spark_manager', '_manager', 'stop'),
+    ('app.models.chart_service', '_renderer', 'shutdown'),
+    ('app.models.upload_jobs', '_queue', 'shutdown'),
+    ('app.models.jobs', '_queue', 'shutdown'),
+)
+
+
+def _register_routes(app):
+    from app.views.charts import register_chart_routes
+    from app.views.correlation import register_correlation_routes
+    from app.views.export import register_export_routes
+    from app.views.health import register_health_routes
+    from app.views.jobs import register_job_routes
+    from app.views.metrics import register_metrics
+    from app.views.preview import register_preview_routes
+    from app.views.uploads import register_upload_routes
+
+    register_metrics(app)
+    # 页面路由模块（首页、数据预览、分析、可视化页面）存在时注册
+    if importlib.util.find_spec('app.routes') is not None:
+        from app.routes import register_routes
+        register_routes(app)
+    else:
+        print("未找到页面路由模块app.routes，只注册接口路由")
+    register_health_routes(app)
+    register_chart_routes(app)
+    register_correlation_routes(app)
+    register_preview_routes(app)
+    register_upload_routes(app)
+    register_job_routes(app)
+    register_export_routes(app)
+
+
+def _preload():
+    """在后台导入数据层模块"""
+    with timer('startup_preload'):
+        for name in PRELOAD_MODULES:
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                print(f"预加载模块 {name} 失败: {str(e)}")
+
+
+def start_warmup(preload=None, spark=None):
+    """在后台导入数据层模块并预热Spark会话，参数为None时按配置决定"""
+    preload = Config.PRELOAD_ON_START if preload is None else preload
+    spark = Config.SPARK_WARMUP_ON_START if spark is None else spark
+    if preload:
+        threading.Thread(target=_preload, name='preload', daemon=True).start()
+    if spark:
+        from app.models.spark_manager import get_spark_manager
+        get_spark_manager().start_warmup()
+
+
+def create_app(warmup=True):
+    """创建Flask应用；warmup为False时不启动后台预热（用于测试和启动耗时检查）"""
+    with timer('startup_create_app'):
+        # Spark工作进程使用与driver相同的Python解释器
+        os.environ["PYSPARK_PYTHON"] = sys.executable
+        os.environ["PYSPARK_DRIVER_PYTHON"] = sys.executable
+
+        app = Flask('app', static_folder='static', template_folder='templates')
+        # MAX_CONTENT_LENGTH等配置项由Flask/Werkzeug在解析请求时检查
+        app.config.from_object(Config)
+        _register_routes(app)
+    if warmup:
+        start_warmup()
+    return app
+
+
+def shutdown():
+    """关闭已创建的后台资源，从未使用过的不会为了关闭而创建"""
+    for module_name, attribute, method in SERVICES:
+        service = getattr(sys.modules.get(module_name), attribute, None)
+        if service is None:
+            continue
+        try:
+            getattr(service, method)()
+        except Exception as e:
+            print(f"关闭 {module_name} 失败: {str(e)}")
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Spark、pandas与NumPy之间基于Arrow的数据交换
+
+toPandas/createDataFrame在启用Arrow时以列式的record batch传输，省去逐行pickle；
+按省份分组的变换用applyInPandas（分组pandas UDF）在executor上执行。
+pyarrow未安装、会话未启用Arrow或数据类型Arrow不支持时退回逐行转换。走哪条路径在转换前
+按Spark自己的检查（pyarrow、会话配置、schema和pandas列类型能否转换为Arrow类型）决定，
+不依赖Spark自动退回时发出的警告；每次转换成功后记录实际使用的路径，第一次走某条路径时打印说明。
+"""
+
+import threading
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+ARROW_ENABLED_KEY = 'spark.sql.execution.arrow.pyspark.enabled'
+
+_counters = Counter()
+_reported = set()
+_lock = threading.Lock()
+_pyarrow = None
+
+
+def pyarrow_available():
+    """pyarrow是否可用（结果缓存）"""
+    global _pyarrow
+    if _pyarrow is None:
+        try:
+            import pyarrow  # noqa: F401
+            _pyarrow = True
+        except ImportError:
+            _pyarrow = False
+    return _pyarrow
+
+
+def _record(operation, path, reason=None):
+    """记录本次转换使用的路径，每种(操作, 路径)第一次出现时打印"""
+    with _lock:
+        _counters[f"{operation}.{path}"] += 1
+        first = (operation, path) not in _reported
+        _reported.add((operation, path))
+    if first:
+        message = f"{operation} 使用{'Arrow' if path == 'arrow' else '逐行'}转换"
+        print(message + (f"（{reason}）" if reason else ''))
+
+
+def transfer_stats():
+    """各操作按路径统计的调用次数，如 {'to_pandas.arrow': 12, 'to_spark.pickle': 1}"""
+    with _lock:
+        return dict(_counters)
+
+
+def _session_arrow_enabled(spark):
+    try:
+        return spark.conf.get(ARROW_ENABLED_KEY, 'false').lower() == 'true'
+    except Exception:
+        return False
+
+
+def _arrow_path(spark, schema=None):
+    """判断能否走Arrow，返回(是否可用, 不可用的原因)"""
+    if not pyarrow_available():
+        return False, '未安装pyarrow'
+    if not _session_arrow_enabled(spark):
+        return False, f'会话未启用{ARROW_ENABLED_KEY}'
+    if schema is not None:
+        from pyspark.sql.pandas.types import to_arrow_schema
+        try:
+            to_arrow_schema(schema)
+        except (TypeError, NotImplementedError) as e:
+            return False, f'Arrow不支持的数据类型: {str(e)}'
+    return True, None
+
+
+def _pandas_arrow_reason(pdf, schema=None):
+    """
+    按createDataFrame的类型检查判断pdf能否走Arrow，返回不能走的原因，能走时返回None
+
+    给出schema时检查其字段能否转换为Arrow类型，否则检查pandas列推断出的Arrow类型Spark是否支持；
+    这些检查不通过时Spark会自动退回逐行转换，事先判断后不会在Arrow路径上发生退回
+    """
+    import pyarrow as pa
+    from pyspark.sql.pandas.types import from_arrow_type, to_arrow_schema
+    from pyspark.sql.types import StructType, _parse_datatype_string
+    try:
+        if isinstance(schema, str):
+            schema = _parse_datatype_string(schema)
+        if isinstance(schema, StructType):
+            to_arrow_schema(schema)
+        else:
+            for field in pa.Schema.from_pandas(pdf, preserve_index=False):
+                from_arrow_type(field.type)
+    except (TypeError, ValueError, NotImplementedError, pa.ArrowException) as e:
+        return f'Arrow不支持的数据类型: {str(e)}'
+    return None
+
+
+def to_pandas(sdf):
+    """Spark DataFrame转pandas，能用Arrow时按record batch传输"""
+    use_arrow, reason = _arrow_path(sdf.sparkSession, sdf.schema)
+    if use_arrow:
+        try:
+            result = sdf.toPandas()
+        except Exception as e:
+            reason = f'Arrow转换失败: {str(e)}'
+        else:
+            _record('to_pandas', 'arrow')
+            return result
+    _record('to_pandas', 'pickle', reason)
+    rows = sdf.collect()
+    return pd.DataFrame.from_records([row.asDict() for row in rows], columns=sdf.columns)
+
+
+def to_numpy(sdf, columns=None, dtype=float):
+    """Spark DataFrame的若干列转为NumPy二维数组"""
+    if columns is not None:
+        sdf = sdf.select(*[f"`{column}`" for column in columns])
+    return to_pandas(sdf).to_numpy(dtype=dtype)
+
+
+def to_spark(spark, pdf, schema=None):
+    """pandas DataFrame转Spark，能用Arrow时按record batch传输"""
+    # Spark不支持Categorical列（Arrow字典类型），标签列还原为普通列再传输
+    categorical = [column for column in pdf.columns if isinstance(pdf[column].dtype, pd.CategoricalDtype)]
+    if categorical:
+        pdf = pdf.astype({column: object for column in categorical})
+    if pdf.empty:
+        # 空表Spark不走Arrow，由Spark按pandas的列直接转换
+        result = spark.createDataFrame(pdf, schema=schema)
+        _record('to_spark', 'pickle', '空表')
+        return result
+    use_arrow, reason = _arrow_path(spark)
+    if use_arrow:
+        reason = _pandas_arrow_reason(pdf, schema)
+        use_arrow = reason is None
+    if use_arrow:
+        try:
+            result = spark.createDataFrame(pdf, schema=schema)
+        except Exception as e:
+            reason = f'Arrow转换失败: {str(e)}'
+        else:
+            _record('to_spark', 'arrow')
+            return result
+    _record('to_spark', 'pickle', reason)
+    # 用元组而不是字典传递行，字典行在推断schema时会按键名重新排序列
+    records = [tuple(value.item() if isinstance(value, np.generic) else value for value in row)
+               for row in pdf.astype(object).where(pdf.notna(), None).itertuples(index=False, name=None)]
+    return spark.createDataFrame(records, schema=schema or [str(column) for column in pdf.columns])
+
+
+def apply_by_province(sdf, func, schema, key='province'):
+    """
+    按省份分组执行pandas函数func(分组DataFrame) -> DataFrame
+
+    Arrow可用时用applyInPandas在executor上逐组执行；否则拉回driver用pandas分组计算再转回Spark。
+    schema为结果的Spark schema（DDL字符串或StructType）。
+    """
+    use_arrow, reason = _arrow_path(sdf.sparkSession, sdf.schema)
+    if use_arrow:
+        try:
+            result = sdf.groupBy(key).applyInPandas(func, schema=schema)
+        except Exception as e:
+            reason = f'applyInPandas不可用: {str(e)}'
+        else:
+            _record('apply_by_province', 'arrow')
+            return result
+    _record('apply_by_province', 'pickle', reason)
+    pdf = to_pandas(sdf)
+    result = pd.concat([func(group) for _, group in pdf.groupby(key, sort=False)], ignore_index=True) \
+        if len(pdf) else pd.DataFrame()
+    return to_spark(sdf.sparkSession, result, schema=schema)
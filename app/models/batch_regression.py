@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量趋势回归：一次求解所有 (指标, 省份) 的最小二乘问题
+
+每个 (指标, 省份) 序列对年份做多项式趋势拟合 value = b0 + b1·t + b2·t² + ...，
+t = 年份 - 面板起始年。最小二乘只依赖各序列的矩 Σtᵏ（k≤2d）、Σtᵏ·y（k≤d）和 Σy²，
+所以先一次算出所有序列的矩（NumPy上是两次矩阵乘法，Spark上是一次分组聚合），
+再把正规方程堆叠成 (序列数, d+1, d+1) 的数组一起求解，缺失年份直接不计入。
+结果是一张表: indicator, name, province, n, intercept, slope, [coef_t2 ...], r2, rmse, forecast_<年份> ...
+
+    python -m app.models.batch_regression --degree 1 --horizon 3 --output trends.csv
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def coefficient_names(degree):
+    return ['intercept', 'slope'][:degree + 1] + [f'coef_t{k}' for k in range(2, degree + 1)]
+
+
+def dense_moments(values, t, degree):
+    """
+    二维数组（行=序列，列=年份，缺失为NaN）各行的矩
+
+    返回 (s, ty, yy)：s[:, k] = Σtᵏ，ty[:, k] = Σtᵏ·y，yy = Σy²，只累加有数值的年份
+    """
+    values = np.asarray(values, dtype=float)
+    observed = ~np.isnan(values)
+    y = np.where(observed, values, 0.0)
+    powers = np.vander(np.asarray(t, dtype=float), 2 * degree + 1, increasing=True)
+    return observed.astype(float) @ powers, y @ powers[:, :degree + 1], (y * y).sum(axis=1)
+
+
+def solve_moments(s, ty, yy, degree):
+    """
+    由矩堆叠正规方程并一起求解
+
+    返回 (系数 (序列数, d+1), r2, rmse, n)；样本数不超过d的序列系数为NaN
+    """
+    p = degree + 1
+    xtx = s[:, np.add.outer(np.arange(p), np.arange(p))]
+    # 伪逆对整批一起计算，个别序列的年份过少（奇异）时也不会中断
+    coefficients = np.einsum('gpq,gq->gp', np.linalg.pinv(xtx), ty)
+    n = s[:, 0]
+    sse = yy - 2 * np.einsum('gp,gp->g', coefficients, ty) + np.einsum('gp,gpq,gq->g', coefficients, xtx, coefficients)
+    sse = np.maximum(sse, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sst = yy - ty[:, 0] ** 2 / n
+        r2 = np.where(sst > 0, 1 - sse / sst, np.nan)
+        rmse = np.sqrt(sse / n)
+    invalid = n <= degree
+    coefficients[invalid] = np.nan
+    r2[invalid] = np.nan
+    rmse[invalid] = np.nan
+    return coefficients, r2, rmse, n
+
+
+def _table(keys, coefficients, r2, rmse, n, degree, base_year, forecast_years):
+    """组装结果表，keys为各序列的 (indicator, name, province)"""
+    table = pd.DataFrame(keys, columns=['indicator', 'name', 'province'])
+    table['n'] = n.astype(int)
+    for i, column in enumerate(coefficient_names(degree)):
+        table[column] = coefficients[:, i]
+    table['r2'] = r2
+    table['rmse'] = rmse
+    if forecast_years:
+        future = np.vander(np.asarray(forecast_years, dtype=float) - base_year, degree + 1, increasing=True)
+        forecasts = coefficients @ future.T
+        for j, year in enumerate(forecast_years):
+            table[f'forecast_{year}'] = forecasts[:, j]
+    return table[table['n'] > 0].reset_index(drop=True)
+
+
+def trend_regression(panel, degree=1, horizon=3):
+    """在进程内用NumPy拟合面板中所有 (指标, 省份) 序列的趋势"""
+    indicators, provinces, years = panel.shape
+    t = np.asarray(panel.years, dtype=float) - panel.years[0]
+    s, ty, yy = dense_moments(panel.as_float64().reshape(indicators * provinces, years), t, degree)
+    coefficients, r2, rmse, n = solve_moments(s, ty, yy, degree)
+    keys = [(key, panel.names.get(key, key), province) for key in panel.indicators for province in panel.provinces]
+    forecast_years = [panel.years[-1] + h for h in range(1, horizon + 1)]
+    return _table(keys, coefficients, r2, rmse, n, degree, panel.years[0], forecast_years)
+
+
+def spark_trend_regression(sdf, degree=1, horizon=3, base_year=None, names=None):
+    """
+    在Spark上拟合长表 (indicator, province, year, value) 中所有序列的趋势
+
+    各序列的矩由一次groupBy聚合得到，拉回driver的只有每个序列一行，正规方程在driver上一起求解
+    """
+    from pyspark.sql import functions as F
+    from app.models.arrow_bridge import to_pandas
+
+    bounds = sdf.agg(F.min('year'), F.max('year')).collect()[0]
+    if bounds[0] is None:
+        return _table([], np.empty((0, degree + 1)), np.empty(0), np.empty(0), np.empty(0), degree, 0, [])
+    base_year = int(bounds[0]) if base_year is None else base_year
+    data = sdf.where(F.col('value').isNotNull() & ~F.isnan('value')) \
+        .select('indicator', 'province', (F.col('year') - base_year).cast('double').alias('t'),
+                F.col('value').cast('double').alias('y'))
+    aggregates = [F.sum(F.pow('t', k)).alias(f's{k}') for k in range(2 * degree + 1)]
+    aggregates += [F.sum(F.pow('t', k) * F.col('y')).alias(f'ty{k}') for k in range(degree + 1)]
+    aggregates.append(F.sum(F.col('y') * F.col('y')).alias('yy'))
+    moments = to_pandas(data.groupBy('indicator', 'province').agg(*aggregates).orderBy('indicator', 'province'))
+
+    s = moments[[f's{k}' for k in range(2 * degree + 1)]].to_numpy(dtype=float)
+    ty = moments[[f'ty{k}' for k in range(degree + 1)]].to_numpy(dtype=float)
+    coefficients, r2, rmse, n = solve_moments(s, ty, moments['yy'].to_numpy(dtype=float), degree)
+    names = names or {}
+    keys = [(key, names.get(key, key), province) for key, province in zip(moments['indicator'], moments['province'])]
+    forecast_years = [int(bounds[1]) + h for h in range(1, horizon + 1)]
+    return _table(keys, coefficients, r2, rmse, n, degree, base_year, forecast_years)
+
+
+def main():
+    import argparse
+
+    from app.models.data_processor import DataProcessor
+
+    parser = argparse.ArgumentParser(description='所有指标、所有省份的趋势回归')
+    parser.add_argument('--degree', type=int, default=1, help='趋势多项式的次数')
+    parser.add_argument('--horizon', type=int, default=3, help='预测的年数')
+    parser.add_argument('--output', help='结果CSV文件路径（默认打印前几行）')
+    args = parser.parse_args()
+
+    table = DataProcessor().trend_regression(degree=args.degree, horizon=args.horizon)
+    if args.output:
+        table.to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f"{len(table)} 个序列的结果已写入: {args.output}")
+    else:
+        print(table.head(20).to_string())
+
+
+if __name__ == '__main__':
+    main()
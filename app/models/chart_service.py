@@ -0,0 +1,338 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+图表渲染服务
+
+Matplotlib渲染放到一组常驻的工作进程中（启动时预先导入Matplotlib/Seaborn），
+不再占用Flask请求线程。生成的PNG按 (数据集版本, 图表类型, 数据列, 标题, 轴标签)
+内容寻址保存，同一张图只渲染一次；作图的列按Parquet副本的schema确定，
+缓存命中时不读取数据。
+
+另外提供JSON格式的图表数据（chart_payload），由前端交互式绘制：折线图用LTTB
+降采样，散点图均匀抽样，柱状图/饼图合并小类别，热力图只返回相关系数矩阵
+（由correlation.py计算并按数据集版本缓存）。
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from app.models.metrics import timer
+from app.models.parquet_cache import read_excel_cached, read_schema
+from app.models.reshape import key_column
+from app.models.result_cache import dataset_fingerprint, resolve_dataset
+
+CHART_TYPES = ('bar', 'line', 'scatter', 'pie', 'heatmap')
+HEATMAP_LABEL = '_label'  # 传给渲染进程的相关矩阵中行标签列的列名
+
+
+def chart_columns(dataset, x=None, y=None):
+    """
+    按数据集的schema确定作图的列：x默认为标签列（地区/时间），y默认为全部数值列
+
+    返回 (x列名, y列名列表)，不读取数据；列不存在时抛出KeyError，y中有非数值列时抛出ValueError
+    """
+    schema = read_schema(resolve_dataset(dataset))
+    x = x or key_column(pd.DataFrame(columns=list(schema)))
+    if not y:
+        y = [column for column, numeric in schema.items() if numeric and column != x]
+    elif isinstance(y, str):
+        y = [y]
+    missing = [column for column in [x] + list(y) if column not in schema]
+    if missing:
+        raise KeyError(f"数据集中不存在列: {', '.join(map(str, missing))}")
+    text = [column for column in y if not schema[column]]
+    if text:
+        raise ValueError(f"只能选择数值列作图: {', '.join(map(str, text))}")
+    return x, list(y)
+
+
+def select_chart_frame(dataset, x=None, y=None):
+    """
+    可视化页面使用的数据选取，列的规则见chart_columns，只读取用到的列
+
+    返回 (DataFrame, x列名, y列名列表)
+    """
+    x, y = chart_columns(dataset, x, y)
+    df = read_excel_cached(resolve_dataset(dataset), columns=list(dict.fromkeys([x] + y)))
+    return df[[x] + y], x, y
+
+
+def chart_key(version, chart_type, x, y, title='', xlabel='', ylabel=''):
+    """图表的内容地址"""
+    spec = json.dumps([version, chart_type, x, list(y), title or '', xlabel or '', ylabel or ''],
+                      ensure_ascii=False)
+    return hashlib.sha256(spec.encode('utf-8')).hexdigest()[:32]
+
+
+def chart_path(key):
+    """图表PNG文件路径"""
+    return os.path.join(Config.CHART_CACHE_DIR, f"{key}.png")
+
+
+def lttb_indices(values, threshold):
+    """
+    Largest-Triangle-Three-Buckets降采样，返回保留点的下标
+
+    首尾点总是保留，中间每个桶选出与前一个保留点、下一个桶均值组成的三角形面积最大的点，
+    折线的峰谷形状基本不变。
+    """
+    y = np.nan_to_num(np.asarray(values, dtype=float))
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    indices = [0]
+    for i in range(threshold - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        if i + 2 < len(edges):
+            next_x = (edges[i + 1] + edges[i + 2] - 1) / 2.0
+            next_y = y[edges[i + 1]:edges[i + 2]].mean()
+        else:
+            next_x, next_y = n - 1, y[n - 1]
+        previous = indices[-1]
+        bucket = np.arange(start, end)
+        areas = np.abs((previous - next_x) * (y[bucket] - y[previous])
+                       - (previous - bucket) * (next_y - y[previous]))
+        indices.append(int(bucket[np.argmax(areas)]))
+    indices.append(n - 1)
+    return np.asarray(indices)
+
+
+def _json_values(values):
+    """转为JSON可序列化的列表，NaN转为None"""
+    return [None if value is None or (isinstance(value, float) and np.isnan(value)) else value
+            for value in (v.item() if isinstance(v, np.generic) else v for v in values)]
+
+
+def _series(df, x, y, indices=None):
+    rows = df if indices is None else df.iloc[indices]
+    return {
+        'labels': _json_values(rows[x].tolist()),
+        'series': [{'name': str(column), 'data': _json_values(rows[column].tolist())} for column in y],
+    }
+
+
+def _top_categories(df, x, y, limit):
+    """按第一个数值列取前limit-1个类别，其余类别求和合并为“其他”"""
+    if len(df) <= limit:
+        return df
+    order = df[y[0]].abs().sort_values(ascending=False).index
+    head, rest = df.loc[order[:limit - 1]], df.loc[order[limit - 1:]]
+    other = pd.DataFrame([{x: '其他', **{column: rest[column].sum() for column in y}}])
+    return pd.concat([head, other], ignore_index=True)
+
+
+def chart_payload(df, chart_type, x, y, max_points=None, max_categories=None, corr=None):
+    """
+    生成前端绘图用的JSON数据（已聚合/降采样）
+
+    df、x、y来自select_chart_frame，与PNG图表使用同一份数据；
+    corr为热力图预先算好的相关矩阵（CorrelationEngine.dataset_matrix），为None时现算
+    """
+    max_points = max_points or Config.CHART_MAX_POINTS
+    max_categories = max_categories or Config.CHART_MAX_CATEGORIES
+    payload = {'type': chart_type, 'x': str(x), 'y': [str(column) for column in y], 'points': len(df)}
+
+    if chart_type == 'line':
+        # 多条折线各自降采样后取下标并集，保证所有序列共用同一组横轴标签
+        per_series = max(3, max_points // max(len(y), 1))
+        indices = np.unique(np.concatenate([lttb_indices(df[column].values, per_series) for column in y]))
+        payload.update(_series(df, x, y, indices))
+    elif chart_type == 'scatter':
+        x_column, y_column = (y[0], y[1]) if len(y) >= 2 else (x, y[0])
+        points = df.dropna(subset=[x_column, y_column])
+        if len(points) > max_points:
+            points = points.iloc[np.linspace(0, len(points) - 1, max_points).astype(int)]
+        payload.update({
+            'x': str(x_column), 'y': [str(y_column)],
+            'labels': _json_values(points[x].tolist()),
+            'data': [[a, b] for a, b in zip(_json_values(points[x_column].tolist()),
+                                            _json_values(points[y_column].tolist()))],
+        })
+    elif chart_type == 'bar':
+        payload.update(_series(_top_categories(df, x, y, max_categories), x, y))
+    elif chart_type == 'pie':
+        values = df[[x, y[0]]].dropna()
+        values = values[values[y[0]] > 0]
+        payload['y'] = [str(y[0])]
+        payload.update(_series(_top_categories(values, x, y[:1], max_categories), x, y[:1]))
+    elif chart_type == 'heatmap':
+        if corr is None:
+            from app.models.correlation import correlate
+            corr = pd.DataFrame(correlate(df[y].to_numpy(dtype=float)), index=y, columns=y)
+        payload.update({
+            'labels': [str(column) for column in corr.columns],
+            'matrix': [_json_values(np.round(row, 4).tolist()) for row in corr.values],
+        })
+    else:
+        raise ValueError(f"不支持的图表类型: {chart_type}")
+
+    payload['returned'] = len(payload.get('labels', [])) if chart_type != 'heatmap' else len(y) ** 2
+    return payload
+
+
+def init_worker():
+    """工作进程初始化：导入Matplotlib/Seaborn并设置中文字体"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import seaborn  # noqa: F401  预先导入，避免首次渲染时加载
+
+    plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'WenQuanYi Micro Hei', 'DejaVu Sans']
+    plt.rcParams['axes.unicode_minus'] = False
+
+
+def _ping():
+    return os.getpid()
+
+
+def render_inputs(dataset, df, chart_type, x, y):
+    """
+    传给render_chart的 (data, x, y)：图表使用的各列，热力图时为相关系数引擎按数据集版本缓存的相关矩阵
+    """
+    if chart_type == 'heatmap':
+        from app.models.correlation import get_correlation_engine
+        corr = get_correlation_engine().dataset_matrix(dataset, y)
+        data = {HEATMAP_LABEL: list(corr.index), **{label: corr[label].tolist() for label in corr.columns}}
+        return data, HEATMAP_LABEL, list(corr.columns)
+    data = {str(column): df[column].tolist() for column in df.columns}
+    return data, str(x), [str(column) for column in y]
+
+
+def render_chart(path, chart_type, data, x, y, title='', xlabel='', ylabel=''):
+    """在工作进程中绘制图表并保存为PNG（data为 {列名: 数值列表}，热力图时为以x列为行标签的相关矩阵）"""
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    import seaborn as sns
+
+    df = pd.DataFrame(data)
+    fig, ax = plt.subplots(figsize=(10, 6))
+    try:
+        if chart_type == 'bar':
+            df.set_index(x)[y].plot.bar(ax=ax)
+        elif chart_type == 'line':
+            df.set_index(x)[y].plot.line(ax=ax, marker='o')
+        elif chart_type == 'scatter':
+            # 两个以上数值列时画前两列的关系，否则画x与第一个数值列
+            x_column, y_column = (y[0], y[1]) if len(y) >= 2 else (x, y[0])
+            ax.scatter(df[x_column], df[y_column])
+        elif chart_type == 'pie':
+            values = df.set_index(x)[y[0]].dropna()
+            ax.pie(values[values > 0], labels=values[values > 0].index, autopct='%1.1f%%')
+            ax.axis('equal')
+        elif chart_type == 'heatmap':
+            sns.heatmap(df.set_index(x)[y], annot=len(y) <= 12, fmt='.2f', cmap='coolwarm', ax=ax)
+        else:
+            raise ValueError(f"不支持的图表类型: {chart_type}")
+
+        ax.set_title(title or '')
+        if chart_type not in ('pie', 'heatmap'):
+            ax.set_xlabel(xlabel or '')
+            ax.set_ylabel(ylabel or '')
+        fig.tight_layout()
+        tmp_path = f"{path}.{os.getpid()}.tmp.png"
+        fig.savefig(tmp_path, dpi=Config.CHART_DPI)
+        os.replace(tmp_path, path)
+    finally:
+        plt.close(fig)
+    return path
+
+
+def _forward(done, future):
+    """把工作进程的渲染结果（或异常）转交给占位的future"""
+    if done.cancelled():
+        future.cancel()
+    elif done.exception() is not None:
+        future.set_exception(done.exception())
+    else:
+        future.set_result(done.result())
+
+
+class ChartRenderer:
+    """图表渲染服务：常驻工作进程池 + 内容寻址的图片缓存"""
+
+    def __init__(self, workers=None):
+        self.workers = workers or Config.CHART_WORKERS
+        self._executor = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+            return self._executor
+
+    def warm(self):
+        """提前启动全部工作进程"""
+        pool = self._pool()
+        for future in [pool.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def render(self, dataset, chart_type, x=None, y=None, title='', xlabel='', ylabel=''):
+        """返回图表的内容地址，缓存中没有时提交到工作进程渲染"""
+        if chart_type not in CHART_TYPES:
+            raise ValueError(f"不支持的图表类型: {chart_type}")
+        x, y = chart_columns(dataset, x, y)
+        key = chart_key(dataset_fingerprint(dataset), chart_type, x, y, title, xlabel, ylabel)
+        path = chart_path(key)
+        if os.path.exists(path):
+            return key
+
+        os.makedirs(Config.CHART_CACHE_DIR, exist_ok=True)
+        pool = self._pool()
+        with self._lock:
+            # 相同图表的并发请求共用一次渲染；锁内只登记占位的future，读取数据和提交在锁外进行
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+        try:
+            if owner:
+                try:
+                    df = None if chart_type == 'heatmap' else select_chart_frame(dataset, x, y)[0]
+                    data, data_x, data_y = render_inputs(dataset, df, chart_type, x, y)
+                    submitted = pool.submit(render_chart, path, chart_type, data, data_x, data_y,
+                                            title, xlabel, ylabel)
+                except BaseException as e:
+                    # 读取数据或提交失败时，等待同一图表的其他请求也得到这个异常
+                    future.set_exception(e)
+                    raise
+                submitted.add_done_callback(lambda done: _forward(done, future))
+            with timer('chart_render', chart=chart_type):
+                future.result(timeout=Config.CHART_RENDER_TIMEOUT)
+        finally:
+            with self._lock:
+                if self._pending.get(key) is future:
+                    del self._pending[key]
+        return key
+
+    def shutdown(self):
+        """关闭工作进程池"""
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_chart_renderer():
+    """返回进程内共享的图表渲染服务"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = ChartRenderer()
+        return _renderer
@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+指标相关系数矩阵
+
+所有指标两两之间的相关系数一次向量化算出：缺失值按“成对完整”处理，
+每对指标只使用两者都有数值的观测，计数、和、平方和、交叉积分别是一次矩阵乘法，
+再逐元素组合成相关系数。多组矩阵（各省份、各滑动窗口）作为批量维度一起计算。
+
+    全国:     所有 (省份, 年份) 观测合并，得到 指标×指标 矩阵
+    分省份:   每个省份以年份为观测，得到 (省份, 指标, 指标)
+    滑动窗口: 按连续window年分窗，得到 (窗口, 指标, 指标) 或 (省份, 窗口, 指标, 指标)
+
+Spearman相关把每对指标在两者都有数值的观测上排名（平均名次）后计算Pearson相关，
+与pandas逐对计算的结果一致；没有缺失值时各列只需排名一次。
+滑动窗口的长度不能小于Config.CORRELATION_MIN_PERIODS，否则每个窗口的相关系数都为缺失。
+完整矩阵按面板（或数据集）版本缓存在结果缓存中，视图按需取子矩阵。
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from app.models.metrics import timer
+from app.models.result_cache import get_result_cache, make_key, resolve_dataset
+
+METHODS = ('pearson', 'spearman')
+SCOPES = ('national', 'province')
+PANEL_TAG = '_panel'  # 面板相关矩阵在结果缓存中的数据集标记
+
+
+def rank_columns(values):
+    """沿观测轴（倒数第二维）对每一列排名，相同值取平均名次，NaN保持为NaN"""
+    values = np.asarray(values, dtype=float)
+    moved = np.moveaxis(values, -2, 0)
+    ranks = pd.DataFrame(moved.reshape(moved.shape[0], -1)).rank(method='average').to_numpy()
+    return np.moveaxis(ranks.reshape(moved.shape), 0, -2)
+
+
+def min_window(min_periods=None):
+    """滑动窗口的最小长度：窗口内的观测数不少于计算相关系数所需的最少共同观测数"""
+    return max(min_periods or Config.CORRELATION_MIN_PERIODS, 2)
+
+
+def _finish(r, n, constant, min_periods):
+    """去掉共同观测不足或为常数的项，对角线（有值时）置为1"""
+    r = np.clip(r, -1.0, 1.0)
+    r[(n < min_periods) | constant] = np.nan
+    diagonal = np.diagonal(r, axis1=-2, axis2=-1)
+    k = r.shape[-1]
+    r[..., np.arange(k), np.arange(k)] = np.where(np.isnan(diagonal), np.nan, 1.0)
+    return r
+
+
+def _pairwise_spearman(values, min_periods):
+    """
+    有缺失值时的Spearman相关：对每对列 (i, j) 只在两者都有数值的观测上排名
+
+    ranks[..., j, :, i]为第i列在第j列有数值的观测上的名次，第i、j两列的名次分别是
+    ranks[..., j, :, i]和ranks[..., i, :, j]，中间结果为 (..., 列, 观测, 列)
+    """
+    observed = ~np.isnan(values)
+    masked = np.where(np.swapaxes(observed, -1, -2)[..., None], values[..., None, :, :], np.nan)
+    a = rank_columns(masked)
+    b = np.swapaxes(a, -3, -1)
+    common = ~np.isnan(a)
+    n = common.sum(axis=-2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        da = np.where(common, a - np.nansum(a, axis=-2, keepdims=True) / n[..., None, :], 0.0)
+        db = np.where(common, b - np.nansum(b, axis=-2, keepdims=True) / n[..., None, :], 0.0)
+        saa, sbb = (da * da).sum(axis=-2), (db * db).sum(axis=-2)
+        r = (da * db).sum(axis=-2) / np.sqrt(saa * sbb)
+    # 共同观测上为常数的列名次全部相同，离差平方和为0
+    return _finish(r, n, (saa <= 1e-12) | (sbb <= 1e-12), min_periods)
+
+
+def correlate(values, method='pearson', min_periods=None):
+    """
+    成对完整的相关系数矩阵
+
+    values形状为 (..., 观测, 列)，返回 (..., 列, 列)；两列共同观测数少于min_periods
+    或其中一列在共同观测上为常数时为NaN
+    """
+    if method not in METHODS:
+        raise ValueError(f"不支持的相关系数: {method}")
+    min_periods = min_window(min_periods)
+    values = np.asarray(values, dtype=float)
+    if method == 'spearman':
+        if np.isnan(values).any():
+            return _pairwise_spearman(values, min_periods)
+        values = rank_columns(values)
+
+    observed = ~np.isnan(values)
+    m = observed.astype(float)
+    # 先减去各列均值，避免大数值的平方和相减损失精度
+    with np.errstate(invalid='ignore', divide='ignore'):
+        center = np.where(observed, values, 0.0).sum(axis=-2, keepdims=True) / m.sum(axis=-2, keepdims=True)
+    x = np.where(observed, values - np.nan_to_num(center), 0.0)
+    mt, xt = np.swapaxes(m, -1, -2), np.swapaxes(x, -1, -2)
+
+    n = mt @ m            # n[i, j]   两列共同的观测数
+    sx = xt @ m           # sx[i, j]  共同观测上第i列的和
+    sxx = (xt * xt) @ m   # sxx[i, j] 共同观测上第i列的平方和
+    sxy = xt @ x          # sxy[i, j] 共同观测上的交叉积
+    sy, syy = np.swapaxes(sx, -1, -2), np.swapaxes(sxx, -1, -2)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vx = sxx - sx * sx / n
+        vy = syy - sy * sy / n
+        r = (sxy - sx * sy / n) / np.sqrt(vx * vy)
+    # 共同观测上为常数的列（方差只剩舍入误差）没有相关系数
+    return _finish(r, n, (vx <= 1e-12 * sxx) | (vy <= 1e-12 * syy), min_periods)
+
+
+def rolling_correlate(values, window, method='pearson', min_periods=None):
+    """
+    滑动窗口相关系数：values形状为 (..., 观测, 列)，按连续window个观测分窗
+
+    返回 (..., 窗口数, 列, 列)，第w个窗口覆盖观测 w .. w+window-1
+    """
+    values = np.asarray(values, dtype=float)
+    if not min_window(min_periods) <= window <= values.shape[-2]:
+        raise ValueError(f"窗口长度必须在{min_window(min_periods)}到{values.shape[-2]}之间: {window}")
+    windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=-2)
+    # sliding_window_view把窗口放在最后一维：(..., 窗口数, 列, window) -> (..., 窗口数, window, 列)
+    return correlate(np.swapaxes(windows, -1, -2), method, min_periods)
+
+
+def panel_observations(panel, scope):
+    """
+    面板整理成相关计算的输入
+
+    national: (省份×年份, 指标)；province: (省份, 年份, 指标)
+    """
+    values = np.moveaxis(panel.as_float64(), 0, -1)  # (省份, 年份, 指标)
+    if scope == 'province':
+        return values
+    if scope == 'national':
+        return values.reshape(-1, values.shape[-1])
+    raise ValueError(f"不支持的范围: {scope}（可选 {', '.join(SCOPES)}）")
+
+
+def _matrix_frame(matrix, labels):
+    return pd.DataFrame(matrix, index=labels, columns=labels)
+
+
+class CorrelationEngine:
+    """按版本缓存完整相关矩阵，按需返回子矩阵"""
+
+    def __init__(self, result_cache=None):
+        self._cache = result_cache
+
+    def _result_cache(self):
+        return self._cache or get_result_cache()
+
+    def panel_matrices(self, method='pearson', scope='national', window=None, panel=None):
+        """
+        面板所有指标的相关矩阵（带缓存）
+
+        返回 {'indicators', 'provinces', 'years', 'windows', 'matrix'}：matrix形状按scope和window为
+        (指标, 指标)、(省份, 指标, 指标)、(窗口, 指标, 指标) 或 (省份, 窗口, 指标, 指标)，
+        windows为各窗口的 (起始年, 结束年)
+        """
+        if panel is None:
+            from app.models.panel import get_panel
+            panel = get_panel()
+        if window is not None and not min_window() <= window <= len(panel.years):
+            raise ValueError(f"窗口长度必须在{min_window()}到{len(panel.years)}之间: {window}")
+        params = {'method': method, 'scope': scope, 'window': window}
+        key = make_key('correlation', panel.version, params)
+        cache = self._result_cache()
+        hit, result = cache.get(PANEL_TAG, panel.version or '', key)
+        if hit:
+            return result
+
+        values = panel_observations(panel, scope)
+        with timer('correlation', method=method, scope=scope, rolling=str(window is not None).lower()):
+            if window is None:
+                matrix = correlate(values, method)
+                windows = None
+            elif scope == 'national':
+                # 全国滑动窗口：每个窗口合并该时段内所有省份的观测
+                per_province = np.moveaxis(panel_observations(panel, 'province'), 0, 1)  # (年份, 省份, 指标)
+                stacked = np.lib.stride_tricks.sliding_window_view(per_province, window, axis=0)
+                # (窗口数, 省份, 指标, window) -> (窗口数, 省份×window, 指标)
+                stacked = np.swapaxes(stacked, -1, -2).reshape(stacked.shape[0], -1, stacked.shape[2])
+                matrix = correlate(stacked, method)
+                windows = [(panel.years[i], panel.years[i + window - 1]) for i in range(stacked.shape[0])]
+            else:
+                matrix = rolling_correlate(values, window, method)
+                windows = [(panel.years[i], panel.years[i + window - 1]) for i in range(matrix.shape[-3])]
+        result = {'indicators': list(panel.indicators), 'provinces': list(panel.provinces),
+                  'years': list(panel.years), 'windows': windows, 'matrix': matrix}
+        if panel.version:
+            cache.put(PANEL_TAG, panel.version, key, result)
+        return result
+
+    def indicator_matrix(self, method='pearson', province=None, indicators=None, window=None,
+                         window_end=None, panel=None):
+        """
+        指标×指标 子矩阵（DataFrame）
+
+        province为None时为全国；window指定时取以window_end结尾的窗口（默认最后一个窗口）。
+        indicators中有不存在的指标、省份不存在或窗口不存在时抛出KeyError
+        """
+        scope = 'national' if province is None else 'province'
+        result = self.panel_matrices(method, scope, window, panel)
+        matrix = result['matrix']
+        if province is not None:
+            if province not in result['provinces']:
+                raise KeyError(province)
+            matrix = matrix[result['provinces'].index(province)]
+        if window is not None:
+            ends = [end for _, end in result['windows']]
+            if not ends:
+                raise KeyError(f"窗口长度 {window} 没有完整的窗口")
+            end = ends[-1] if window_end is None else int(window_end)
+            if end not in ends:
+                raise KeyError(f"没有以 {end} 年结尾的窗口")
+            matrix = matrix[ends.index(end)]
+        return self._select(_matrix_frame(matrix, result['indicators']), indicators)
+
+    def rolling_pair(self, a, b, method='pearson', window=5, province=None, panel=None):
+        """两个指标之间的滑动窗口相关系数序列：{窗口结束年: r}"""
+        scope = 'national' if province is None else 'province'
+        result = self.panel_matrices(method, scope, window, panel)
+        indicators = result['indicators']
+        for key in (a, b):
+            if key not in indicators:
+                raise KeyError(key)
+        matrix = result['matrix']
+        if province is not None:
+            if province not in result['provinces']:
+                raise KeyError(province)
+            matrix = matrix[result['provinces'].index(province)]
+        series = matrix[:, indicators.index(a), indicators.index(b)]
+        return {end: (None if np.isnan(r) else float(r)) for (_, end), r in zip(result['windows'], series)}
+
+    def top_pairs(self, method='pearson', province=None, limit=10, panel=None):
+        """相关性最强（按绝对值）的指标对：[(指标a, 指标b, r)]"""
+        frame = self.indicator_matrix(method, province, panel=panel)
+        labels = list(frame.columns)
+        upper = np.triu_indices(len(labels), k=1)
+        values = frame.to_numpy()[upper]
+        order = [i for i in np.argsort(-np.abs(np.nan_to_num(values, nan=0.0)), kind='stable')
+                 if not np.isnan(values[i])][:limit]
+        return [(labels[upper[0][i]], labels[upper[1][i]], float(values[i])) for i in order]
+
+    def dataset_matrix(self, dataset, columns=None, method='pearson'):
+        """
+        单个数据集各数值列之间的相关矩阵（DataFrame），完整矩阵按数据集版本缓存
+
+        columns为需要的子集，有不存在或非数值的列时抛出KeyError
+        """
+        if method not in METHODS:
+            raise ValueError(f"不支持的相关系数: {method}")
+
+        def compute():
+            from app.models.parquet_cache import read_excel_cached
+            df = read_excel_cached(resolve_dataset(dataset))
+            numeric = df.select_dtypes('number')
+            with timer('correlation', method=method, scope='dataset', rolling='false'):
+                matrix = correlate(numeric.to_numpy(dtype=float), method)
+            return _matrix_frame(matrix, [str(column) for column in numeric.columns])
+
+        frame = self._result_cache().get_or_compute('correlation', dataset, {'method': method}, compute)
+        return self._select(frame, columns)
+
+    @staticmethod
+    def _select(frame, labels):
+        if not labels:
+            return frame
+        labels = [str(label) for label in labels]
+        missing = [label for label in labels if label not in frame.columns]
+        if missing:
+            raise KeyError(', '.join(missing))
+        return frame.loc[labels, labels]
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_correlation_engine():
+    """返回进程内共享的相关系数引擎"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = CorrelationEngine()
+        return _engine
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据处理器：负责数据集的发现、加载和分析
+"""
+
+import os
+import threading
+
+import pandas as pd
+
+from config import Config
+from app.models.arrow_bridge import apply_by_province, to_pandas, to_spark
+from app.models.batch_regression import spark_trend_regression, trend_regression
+from app.models.engines import data_size, select_engine, warm_start_centers
+from app.models.metrics import timer
+from app.models.panel import get_panel
+from app.models.parquet_cache import find_source, list_source_workbooks, read_excel_cached
+from app.models.reshape import GROWTH_SCHEMA, wide_to_long, year_over_year
+from app.models.result_cache import frame_fingerprint, get_result_cache
+from app.models.spark_profiles import estimate_bytes
+
+
+def _fit(model, df, fit):
+    """选择引擎并训练模型，耗时按模型和引擎记录"""
+    engine = select_engine(df)
+    with timer('model_fit', model=model, engine=engine.name):
+        return fit(engine)
+
+
+class DataProcessor:
+    """数据处理器"""
+
+    def __init__(self):
+        # 各 (数据集, 特征, k) 上一次聚类的中心，数据集更新后用于热启动
+        self._centers = {}
+        self._lock = threading.Lock()
+
+    def list_datasets(self):
+        """列出可用的数据集文件名"""
+        return [os.path.basename(path) for path in list_source_workbooks()]
+
+    def get_source_path(self, name):
+        """返回数据集对应的本地文件路径，不存在时抛出FileNotFoundError"""
+        source = find_source(name)
+        if source is None:
+            raise FileNotFoundError(f"数据集不存在: {name}")
+        return source
+
+    def load_data(self, name, sheet_name=0):
+        """加载数据集，优先读取Parquet缓存"""
+        return read_excel_cached(self.get_source_path(name), sheet_name=sheet_name)
+
+    def get_basic_stats(self, df, columns=None):
+        """基本统计信息（按数据规模自动选择pandas或Spark）"""
+        engine = select_engine(df)
+        with timer('describe', engine=engine.name):
+            return engine.describe(df, columns)
+
+    def run_kmeans(self, df, features, k=3, dataset=None, mode='auto'):
+        """
+        K-means聚类分析，指定dataset时结果按数据集版本和参数缓存
+
+        数据集更新（如追加了新的年份）导致缓存失效时，若上一次的中心对新数据仍然适用，
+        则从这些中心热启动，而不是重新初始化
+        """
+        def compute():
+            key = (os.path.basename(str(dataset)), tuple(str(f) for f in features), k)
+            with self._lock:
+                previous = self._centers.get(key) if dataset is not None else None
+            init_centers = warm_start_centers(df, features, previous)
+            result = _fit('kmeans', df, lambda engine: engine.kmeans(df, features, k=k, mode=mode,
+                                                                     init_centers=init_centers))
+            if dataset is not None and result['labels']:
+                with self._lock:
+                    self._centers[key] = {'centers': result['centers'],
+                                          'mean_cost': result['inertia'] / len(result['labels'])}
+            return result
+
+        if dataset is None:
+            return compute()
+        params = {'features': features, 'k': k, 'mode': mode, 'data': frame_fingerprint(df, features)}
+        return get_result_cache().get_or_compute('kmeans', dataset, params, compute)
+
+    def run_kmeans_sweep(self, df, features, k_values=range(2, 9), dataset=None, mode='auto'):
+        """对一组k聚类，返回肘部法则和轮廓系数选出的k；指定dataset时结果按数据集版本和参数缓存"""
+        k_values = sorted(set(int(k) for k in k_values))
+        compute = lambda: _fit('kmeans_sweep', df,
+                               lambda engine: engine.kmeans_sweep(df, features, k_values=k_values, mode=mode))
+        if dataset is None:
+            return compute()
+        params = {'features': features, 'k_values': k_values, 'mode': mode, 'data': frame_fingerprint(df, features)}
+        return get_result_cache().get_or_compute('kmeans_sweep', dataset, params, compute)
+
+    def run_regression(self, df, features, target, dataset=None):
+        """线性回归分析，指定dataset时结果按数据集版本和参数缓存"""
+        compute = lambda: _fit('regression', df, lambda engine: engine.linear_regression(df, features, target))
+        if dataset is None:
+            return compute()
+        params = {'features': features, 'target': target, 'data': frame_fingerprint(df, list(features) + [target])}
+        return get_result_cache().get_or_compute('regression', dataset, params, compute)
+
+    def trend_regression(self, degree=1, horizon=3, panel=None):
+        """
+        所有指标、所有省份的趋势回归，一次批量求解，返回包含系数、R²和预测值的结果表
+
+        面板不大时在进程内用NumPy求解，否则由Spark一次分组聚合完成
+        """
+        panel = panel or get_panel()
+        if panel.values.size <= Config.FAST_PATH_MAX_CELLS:
+            with timer('model_fit', model='trend', engine='pandas'):
+                return trend_regression(panel, degree, horizon)
+
+        from app.models.spark_manager import get_spark_manager
+        long = panel.to_long()
+        with get_spark_manager().job('regression', '批量趋势回归', input_bytes=estimate_bytes(long)) as spark:
+            with timer('model_fit', model='trend', engine='spark'):
+                return spark_trend_regression(to_spark(spark, long), degree, horizon,
+                                              base_year=panel.years[0], names=panel.names)
+
+    def growth_rates(self, name):
+        """
+        各省份各指标值的同比增长率，返回长表 (province, year, value, growth)
+
+        小数据集在进程内按省份分组计算，大数据集用Spark按省份分组执行（Arrow可用时为pandas UDF）
+        """
+        long = wide_to_long(self.load_data(name))
+        if data_size(long) <= Config.FAST_PATH_MAX_CELLS:
+            return pd.concat([year_over_year(group) for _, group in long.groupby('province', observed=True)],
+                             ignore_index=True)
+
+        from app.models.spark_manager import get_spark_manager
+        with get_spark_manager().job('preview', f'同比增长 {name}', input_bytes=estimate_bytes(long)) as spark:
+            sdf = apply_by_province(to_spark(spark, long), year_over_year, GROWTH_SCHEMA)
+            return to_pandas(sdf.orderBy('province', 'year'))
+
+    def close(self):
+        """释放资源"""
+        pass
+
+
+_processor = None
+_processor_lock = threading.Lock()
+
+
+def get_data_processor():
+    """返回进程内共享的数据处理器（首次使用时创建）"""
+    global _processor
+    with _processor_lock:
+        if _processor is None:
+            _processor = DataProcessor()
+        return _processor
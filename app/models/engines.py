@@ -0,0 +1,515 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分析执行引擎
+
+小数据集（如31个省份×十几个年份）直接用pandas/scikit-learn在进程内计算，
+超过Config.FAST_PATH_MAX_CELLS时才交给Spark ML。两个引擎返回的结果结构完全相同:
+
+    describe -> {'engine', 'rows', 'columns': {列名: {count, missing, mean, std, min, max}}}
+    kmeans -> {'engine', 'k', 'mode', 'init', 'features', 'index', 'labels', 'centers',
+               'cluster_sizes', 'inertia'}
+    kmeans_sweep -> {'engine', 'mode', 'features', 'rows', 'k_values', 'inertia', 'silhouette',
+                     'best_k', 'elbow_k'}
+    linear_regression -> {'engine', 'features', 'target', 'index', 'coefficients',
+                          'intercept', 'r2', 'rmse', 'predictions'}
+
+聚类标签按样本首次出现的顺序重新编号，两个引擎得到相同划分时标签也相同。
+K-means有full（完整Lloyd迭代）和minibatch（每次迭代只用一批抽样）两种模式，mode='auto'时
+按样本数选择；传入init_centers时从这些中心热启动（数据集追加新年份后沿用上次的中心）。
+"""
+
+import operator
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from app.models.arrow_bridge import to_numpy, to_pandas, to_spark
+from app.models.spark_profiles import estimate_bytes
+
+ROW_COLUMN = '_row'
+KMEANS_MODES = ('auto', 'full', 'minibatch')
+
+
+def _clean(value):
+    """把NumPy标量/NaN转换成可JSON序列化的Python值"""
+    if value is None:
+        return None
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def _canonical_labels(labels, centers):
+    """按首次出现顺序重新编号聚类标签，返回(标签, 中心, 每类样本数)"""
+    order = list(dict.fromkeys(int(label) for label in labels))
+    order += [label for label in range(len(centers)) if label not in order]
+    mapping = {old: new for new, old in enumerate(order)}
+    labels = [mapping[int(label)] for label in labels]
+    centers = [[float(v) for v in centers[old]] for old in order]
+    sizes = [0] * len(centers)
+    for label in labels:
+        sizes[label] += 1
+    return labels, centers, sizes
+
+
+def _model_frame(df, columns):
+    """取出建模所需的列并去掉含缺失值的行"""
+    frame = df[list(columns)].apply(pd.to_numeric, errors='coerce')
+    return frame.dropna()
+
+
+def _kmeans_mode(mode, rows):
+    """解析K-means模式，auto按样本数在full和minibatch之间选择"""
+    if mode not in KMEANS_MODES:
+        raise ValueError(f"未知的K-means模式: {mode}")
+    if mode == 'auto':
+        return 'minibatch' if rows >= Config.KMEANS_MINIBATCH_MIN_ROWS else 'full'
+    return mode
+
+
+def _k_values(k_values, rows):
+    """k扫描的取值：去重排序，只保留 2 <= k < 样本数"""
+    return [k for k in sorted(set(int(k) for k in k_values)) if 2 <= k < rows]
+
+
+def _squared_distances(X, centers):
+    """每个样本到每个中心的平方距离，形状为 (样本数, k)"""
+    centers = np.asarray(centers, dtype=float)
+    distances = (X ** 2).sum(axis=1)[:, None] - 2 * X @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+    return np.maximum(distances, 0)
+
+
+def warm_start_centers(df, features, previous, tolerance=None):
+    """
+    判断能否从上次的聚类中心热启动
+
+    previous为上次结果的 {'centers', 'mean_cost'}（mean_cost为样本到最近中心的平均平方距离）。
+    新数据到这些中心的平均平方距离增加不超过tolerance（默认Config.KMEANS_WARM_START_TOLERANCE）
+    时返回这些中心，否则返回None，重新初始化。
+    """
+    if not previous:
+        return None
+    tolerance = Config.KMEANS_WARM_START_TOLERANCE if tolerance is None else tolerance
+    X = _model_frame(df, features).to_numpy(dtype=float)
+    centers = np.asarray(previous['centers'], dtype=float)
+    if not len(X) or centers.ndim != 2 or centers.shape[1] != X.shape[1] or len(centers) > len(X):
+        return None
+    cost = _squared_distances(X, centers).min(axis=1).mean()
+    return previous['centers'] if cost <= previous['mean_cost'] * (1 + tolerance) else None
+
+
+def _elbow(k_values, inertia):
+    """肘部法则：误差平方和曲线归一化后，离首尾连线最远的k"""
+    if len(k_values) < 3:
+        return k_values[0] if k_values else None
+    x = (np.asarray(k_values, dtype=float) - k_values[0]) / (k_values[-1] - k_values[0])
+    y = np.asarray(inertia, dtype=float)
+    if y[0] <= y[-1]:
+        return k_values[0]
+    y = (y - y[-1]) / (y[0] - y[-1])
+    # 首尾连线为 y = 1 - x，下凸曲线上的点到连线的距离与 1 - x - y 成正比
+    return k_values[int(np.argmax(1 - x - y))]
+
+
+def _sweep_sample(X, seed, size=None):
+    """轮廓系数用的抽样及其距离矩阵，各k共用"""
+    from sklearn.metrics import pairwise_distances
+
+    size = size or Config.KMEANS_SWEEP_SAMPLE
+    if len(X) > size:
+        X = X[np.random.RandomState(seed).choice(len(X), size, replace=False)]
+    return X, pairwise_distances(X)
+
+
+def _sweep_result(engine, mode, features, rows, k_values, inertia, sample_labels, distances):
+    from sklearn.metrics import silhouette_score
+
+    silhouettes = []
+    for labels in sample_labels:
+        clusters = len(set(labels.tolist()))
+        silhouettes.append(float(silhouette_score(distances, labels, metric='precomputed'))
+                           if 1 < clusters < len(labels) else None)
+    scored = [(score, k) for score, k in zip(silhouettes, k_values) if score is not None]
+    return {
+        'engine': engine,
+        'mode': mode,
+        'features': [str(f) for f in features],
+        'rows': int(rows),
+        'k_values': k_values,
+        'inertia': [float(value) for value in inertia],
+        'silhouette': silhouettes,
+        'best_k': max(scored)[1] if scored else None,
+        'elbow_k': _elbow(k_values, inertia),
+    }
+
+
+def _spark_assign(sdf, features, centers):
+    """按最近的中心分配样本，增加 __cluster 和 __distance（平方距离）两列"""
+    from pyspark.sql import functions as F
+
+    columns = [F.col(f"`{feature}`").cast('double') for feature in features]
+    distances = []
+    for j, center in enumerate(centers):
+        terms = [(column - F.lit(float(value))) * (column - F.lit(float(value)))
+                 for column, value in zip(columns, center)]
+        distances.append(reduce(operator.add, terms).alias(f'__d{j}'))
+    names = [f'__d{j}' for j in range(len(centers))]
+    sdf = sdf.select('*', *distances)
+    nearest = F.least(*names) if len(names) > 1 else F.col(names[0])
+    cluster = F.coalesce(*[F.when(F.col(name) == nearest, F.lit(j)) for j, name in enumerate(names)])
+    return sdf.withColumn('__distance', nearest).withColumn('__cluster', cluster).drop(*names)
+
+
+def _spark_lloyd(data, features, centers, max_iter, seed, batch_fraction=None, tol=1e-4):
+    """
+    在Spark上从给定中心迭代
+
+    batch_fraction为None时每次迭代用全部数据（Lloyd）；否则每次抽样一批，
+    按各中心累计分到的样本数递减学习率更新（mini-batch K-means）。
+    每次迭代是一次分配加按类聚合的Spark作业，中心移动距离都不超过tol时停止。
+    """
+    from pyspark.sql import functions as F
+
+    centers = np.array(centers, dtype=float)
+    counts = np.zeros(len(centers))
+    sums = [F.sum(F.col(f"`{feature}`").cast('double')).alias(f'__s{i}') for i, feature in enumerate(features)]
+    for step in range(max_iter):
+        batch = data.sample(False, batch_fraction, seed + step) if batch_fraction else data
+        rows = _spark_assign(batch, features, centers).groupBy('__cluster') \
+            .agg(F.count(F.lit(1)).alias('__n'), *sums).collect()
+        updated = centers.copy()
+        for row in rows:
+            j, n = int(row['__cluster']), row['__n']
+            total = np.array([row[f'__s{i}'] for i in range(len(features))], dtype=float)
+            if batch_fraction:
+                counts[j] += n
+                updated[j] += (total - n * centers[j]) / counts[j]
+            else:
+                updated[j] = total / n
+        shift = ((updated - centers) ** 2).sum(axis=1).max()
+        centers = updated
+        if shift <= tol ** 2:
+            break
+    return centers
+
+
+class PandasEngine:
+    """进程内引擎：pandas + scikit-learn"""
+
+    name = 'pandas'
+
+    def describe(self, df, columns=None):
+        """基本统计信息"""
+        columns = list(columns) if columns is not None else list(df.select_dtypes('number').columns)
+        stats = {}
+        for column in columns:
+            values = pd.to_numeric(df[column], errors='coerce')
+            stats[str(column)] = {
+                'count': int(values.count()),
+                'missing': int(values.isna().sum()),
+                'mean': _clean(values.mean()),
+                'std': _clean(values.std()),
+                'min': _clean(values.min()),
+                'max': _clean(values.max()),
+            }
+        return {'engine': self.name, 'rows': int(len(df)), 'columns': stats}
+
+    @staticmethod
+    def _fit_kmeans(X, k, seed, max_iter, mode, init_centers=None, batch_size=None):
+        """训练一个K-means模型，返回(标签, 中心, 误差平方和)"""
+        from sklearn.cluster import KMeans, MiniBatchKMeans
+
+        if init_centers is not None:
+            init, n_init = np.asarray(init_centers, dtype=float), 1
+        else:
+            init, n_init = 'k-means++', (10 if mode == 'full' else 3)
+        if mode == 'minibatch':
+            model = MiniBatchKMeans(n_clusters=k, random_state=seed, max_iter=max_iter, init=init, n_init=n_init,
+                                    batch_size=batch_size or Config.KMEANS_BATCH_SIZE)
+        else:
+            model = KMeans(n_clusters=k, random_state=seed, max_iter=max_iter, init=init, n_init=n_init)
+        model.fit(X)
+        distances = _squared_distances(X, model.cluster_centers_)
+        labels = distances.argmin(axis=1)
+        return labels, model.cluster_centers_, float(distances[np.arange(len(X)), labels].sum())
+
+    def kmeans(self, df, features, k=3, seed=42, max_iter=300, mode='auto', init_centers=None, batch_size=None):
+        """K-means聚类，init_centers为热启动的初始中心"""
+        frame = _model_frame(df, features)
+        X = frame.to_numpy(dtype=float)
+        mode = _kmeans_mode(mode, len(X))
+        labels, centers, inertia = self._fit_kmeans(X, k, seed, max_iter, mode, init_centers, batch_size)
+        labels, centers, sizes = _canonical_labels(labels, centers)
+        return {
+            'engine': self.name,
+            'k': k,
+            'mode': mode,
+            'init': 'k-means++' if init_centers is None else 'warm',
+            'features': [str(f) for f in features],
+            'index': frame.index.tolist(),
+            'labels': labels,
+            'centers': centers,
+            'cluster_sizes': sizes,
+            'inertia': inertia,
+        }
+
+    def kmeans_sweep(self, df, features, k_values=range(2, 9), seed=42, max_iter=300, mode='auto'):
+        """
+        对一组k分别聚类，返回各k的误差平方和（肘部法则）与轮廓系数
+
+        特征矩阵、轮廓系数的抽样和距离矩阵只计算一次，各k共用
+        """
+        X = _model_frame(df, features).to_numpy(dtype=float)
+        mode = _kmeans_mode(mode, len(X))
+        k_values = _k_values(k_values, len(X))
+        sample, distances = _sweep_sample(X, seed)
+        inertia, sample_labels = [], []
+        for k in k_values:
+            _, centers, cost = self._fit_kmeans(X, k, seed, max_iter, mode)
+            inertia.append(cost)
+            sample_labels.append(_squared_distances(sample, centers).argmin(axis=1))
+        return _sweep_result(self.name, mode, features, len(X), k_values, inertia, sample_labels, distances)
+
+    def linear_regression(self, df, features, target):
+        """最小二乘线性回归"""
+        from sklearn.linear_model import LinearRegression
+
+        frame = _model_frame(df, list(features) + [target])
+        X = frame[list(features)].to_numpy(dtype=float)
+        y = frame[target].to_numpy(dtype=float)
+        model = LinearRegression().fit(X, y)
+        predictions = model.predict(X)
+        residual = y - predictions
+        total = ((y - y.mean()) ** 2).sum()
+        return {
+            'engine': self.name,
+            'features': [str(f) for f in features],
+            'target': str(target),
+            'index': frame.index.tolist(),
+            'coefficients': {str(f): float(c) for f, c in zip(features, model.coef_)},
+            'intercept': float(model.intercept_),
+            'r2': _clean(1 - (residual ** 2).sum() / total) if total > 0 else None,
+            'rmse': float(np.sqrt((residual ** 2).mean())),
+            'predictions': [float(p) for p in predictions],
+        }
+
+
+class SparkEngine:
+    """分布式引擎：Spark SQL + Spark ML"""
+
+    name = 'spark'
+
+    def __init__(self, spark=None, manager=None, profile=None):
+        self._spark = spark
+        self._manager = manager
+        self._profile = profile
+
+    def _session(self, pool, description, df=None):
+        """返回(上下文管理器)：显式传入会话时直接使用，否则通过会话管理器提交到调度池"""
+        if self._spark is not None:
+            from contextlib import nullcontext
+            return nullcontext(self._spark)
+        from app.models.spark_manager import get_spark_manager
+        return (self._manager or get_spark_manager()).job(pool, description, profile=self._profile,
+                                                          input_bytes=estimate_bytes(df))
+
+    @staticmethod
+    def _to_spark(spark, df, columns):
+        """pandas DataFrame转换为带行号的Spark DataFrame，Spark DataFrame原样返回"""
+        if isinstance(df, pd.DataFrame):
+            frame = _model_frame(df, columns)
+            frame.insert(0, ROW_COLUMN, np.arange(len(frame)))
+            return to_spark(spark, frame), frame.index.tolist()
+        return df, None
+
+    def describe(self, df, columns=None):
+        """基本统计信息，所有列在一次聚合中完成"""
+        from pyspark.sql import functions as F
+
+        with self._session('preview', '基本统计', df) as spark:
+            if isinstance(df, pd.DataFrame):
+                columns = list(columns) if columns is not None else list(df.select_dtypes('number').columns)
+                sdf = to_spark(spark, df[columns].apply(pd.to_numeric, errors='coerce'))
+            else:
+                sdf = df
+                columns = list(columns) if columns is not None else sdf.columns
+            exprs = [F.count(F.lit(1)).alias('__rows')]
+            for i, column in enumerate(columns):
+                # NaN与null一样视为缺失值
+                c = F.nanvl(F.col(f"`{column}`").cast('double'), F.lit(None).cast('double'))
+                exprs += [
+                    F.count(c).alias(f'count_{i}'),
+                    F.sum(F.when(c.isNull(), 1).otherwise(0)).alias(f'missing_{i}'),
+                    F.mean(c).alias(f'mean_{i}'),
+                    F.stddev(c).alias(f'std_{i}'),
+                    F.min(c).alias(f'min_{i}'),
+                    F.max(c).alias(f'max_{i}'),
+                ]
+            row = sdf.agg(*exprs).collect()[0]
+
+        stats = {}
+        for i, column in enumerate(columns):
+            stats[str(column)] = {
+                'count': int(row[f'count_{i}']),
+                'missing': int(row[f'missing_{i}'] or 0),
+                'mean': _clean(row[f'mean_{i}']),
+                'std': _clean(row[f'std_{i}']),
+                'min': _clean(row[f'min_{i}']),
+                'max': _clean(row[f'max_{i}']),
+            }
+        return {'engine': self.name, 'rows': int(row['__rows']), 'columns': stats}
+
+    @staticmethod
+    def _fit_kmeans(data, features, k, seed, max_iter, mode, rows, init_centers=None, batch_size=None):
+        """
+        训练K-means，返回(中心, Spark ML模型)
+
+        full模式且没有初始中心时用Spark ML的KMeans（k-means||初始化），返回模型；
+        热启动或mini-batch时在Spark上直接迭代（见_spark_lloyd），模型为None
+        """
+        from pyspark.ml.clustering import KMeans
+
+        def fit(frame, iterations):
+            return KMeans(k=k, seed=seed, maxIter=iterations, featuresCol='__features',
+                          predictionCol='__cluster').fit(frame)
+
+        if mode == 'full' and init_centers is None:
+            model = fit(data, max_iter)
+            return [center.tolist() for center in model.clusterCenters()], model
+        if mode == 'full':
+            return _spark_lloyd(data, features, init_centers, max_iter, seed).tolist(), None
+
+        fraction = min(1.0, (batch_size or Config.KMEANS_BATCH_SIZE) / max(rows, 1))
+        centers = init_centers
+        if centers is None:
+            # 在第一批抽样上用k-means||初始化
+            batch = data.sample(False, fraction, seed)
+            centers = [center.tolist() for center in fit(batch if batch.count() >= k else data, 20).clusterCenters()]
+        steps = min(max_iter, Config.KMEANS_MINIBATCH_MAX_STEPS)
+        return _spark_lloyd(data, features, centers, steps, seed, batch_fraction=fraction).tolist(), None
+
+    def kmeans(self, df, features, k=3, seed=42, max_iter=300, mode='auto', init_centers=None, batch_size=None):
+        """K-means聚类，init_centers为热启动的初始中心"""
+        from pyspark.ml.feature import VectorAssembler
+
+        features = list(features)
+        with self._session('analysis', f'K-means聚类 k={k}', df) as spark:
+            sdf, index = self._to_spark(spark, df, features)
+            assembler = VectorAssembler(inputCols=features, outputCol='__features', handleInvalid='skip')
+            data = assembler.transform(sdf).cache()
+            try:
+                rows = len(index) if index is not None else data.count()
+                mode = _kmeans_mode(mode, rows)
+                centers, model = self._fit_kmeans(data, features, k, seed, max_iter, mode, rows,
+                                                  init_centers, batch_size)
+                predicted = model.transform(data) if model is not None else _spark_assign(data, features, centers)
+                if ROW_COLUMN in sdf.columns:
+                    predicted = predicted.orderBy(ROW_COLUMN)
+                if model is not None:
+                    labels = to_pandas(predicted.select('__cluster'))['__cluster'].tolist()
+                    inertia = model.summary.trainingCost
+                else:
+                    assigned = to_pandas(predicted.select('__cluster', '__distance'))
+                    labels, inertia = assigned['__cluster'].tolist(), assigned['__distance'].sum()
+            finally:
+                data.unpersist()
+
+        labels, centers, sizes = _canonical_labels(labels, centers)
+        return {
+            'engine': self.name,
+            'k': k,
+            'mode': mode,
+            'init': 'k-means++' if init_centers is None else 'warm',
+            'features': [str(f) for f in features],
+            'index': index if index is not None else list(range(len(labels))),
+            'labels': labels,
+            'centers': centers,
+            'cluster_sizes': sizes,
+            'inertia': float(inertia),
+        }
+
+    def kmeans_sweep(self, df, features, k_values=range(2, 9), seed=42, max_iter=300, mode='auto'):
+        """
+        对一组k分别聚类，返回各k的误差平方和（肘部法则）与轮廓系数
+
+        特征向量只组装和缓存一次；轮廓系数在一次抽样拉回的样本上计算，距离矩阵各k共用
+        """
+        from pyspark.ml.feature import VectorAssembler
+        from pyspark.sql import functions as F
+
+        features = list(features)
+        with self._session('analysis', 'K-means k扫描', df) as spark:
+            sdf, index = self._to_spark(spark, df, features)
+            assembler = VectorAssembler(inputCols=features, outputCol='__features', handleInvalid='skip')
+            data = assembler.transform(sdf).cache()
+            try:
+                rows = len(index) if index is not None else data.count()
+                mode = _kmeans_mode(mode, rows)
+                fraction = min(1.0, Config.KMEANS_SWEEP_SAMPLE * 1.1 / max(rows, 1))
+                sample, distances = _sweep_sample(to_numpy(data.sample(False, fraction, seed), features), seed)
+                k_values = _k_values(k_values, rows)
+                inertia, sample_labels = [], []
+                for k in k_values:
+                    centers, model = self._fit_kmeans(data, features, k, seed, max_iter, mode, rows)
+                    if model is not None:
+                        inertia.append(model.summary.trainingCost)
+                    else:
+                        inertia.append(_spark_assign(data, features, centers).agg(F.sum('__distance')).collect()[0][0])
+                    sample_labels.append(_squared_distances(sample, centers).argmin(axis=1))
+            finally:
+                data.unpersist()
+        return _sweep_result(self.name, mode, features, rows, k_values, inertia, sample_labels, distances)
+
+    def linear_regression(self, df, features, target):
+        """最小二乘线性回归（正规方程求解，无正则化）"""
+        from pyspark.ml.feature import VectorAssembler
+        from pyspark.ml.regression import LinearRegression
+
+        features = list(features)
+        with self._session('regression', f'线性回归 {target}', df) as spark:
+            sdf, index = self._to_spark(spark, df, features + [target])
+            assembler = VectorAssembler(inputCols=features, outputCol='__features', handleInvalid='skip')
+            data = assembler.transform(sdf.dropna(subset=[target]))
+            model = LinearRegression(featuresCol='__features', labelCol=target, predictionCol='__prediction',
+                                     regParam=0.0, elasticNetParam=0.0, solver='normal').fit(data)
+            predicted = model.transform(data)
+            if ROW_COLUMN in sdf.columns:
+                predicted = predicted.orderBy(ROW_COLUMN)
+            predictions = to_pandas(predicted.select('__prediction'))['__prediction'].tolist()
+            summary = model.summary
+
+        return {
+            'engine': self.name,
+            'features': [str(f) for f in features],
+            'target': str(target),
+            'index': index if index is not None else list(range(len(predictions))),
+            'coefficients': {str(f): float(c) for f, c in zip(features, model.coefficients)},
+            'intercept': float(model.intercept),
+            'r2': _clean(summary.r2),
+            'rmse': float(summary.rootMeanSquaredError),
+            'predictions': [float(p) for p in predictions],
+        }
+
+
+def data_size(df):
+    """数据规模（单元格数），Spark DataFrame视为无限大"""
+    if isinstance(df, pd.DataFrame):
+        return df.shape[0] * max(df.shape[1], 1)
+    return float('inf')
+
+
+def select_engine(df, threshold=None):
+    """按数据规模选择执行引擎"""
+    threshold = Config.FAST_PATH_MAX_CELLS if threshold is None else threshold
+    return PandasEngine() if data_size(df) <= threshold else SparkEngine()
+
+
+def get_engine(name):
+    """按名称获取执行引擎"""
+    engines = {PandasEngine.name: PandasEngine, SparkEngine.name: SparkEngine}
+    if name not in engines:
+        raise ValueError(f"未知的执行引擎: {name}")
+    return engines[name]()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+增量、并行的HDFS同步
+
+通过WebHDFS（hdfs库，共享一个带连接池的requests会话）上传文件，不再为每个文件
+启动一个hadoop JVM。大小、内容哈希和HDFS校验和都与清单一致的文件直接跳过；
+每上传成功一个文件就写一次清单，中断后重新运行会从断点继续。
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from hdfs import HdfsError, InsecureClient
+from requests.adapters import HTTPAdapter
+
+from config import Config
+from app.models.metrics import count, timer
+from app.models.parquet_cache import EXCEL_EXTENSIONS, file_sha256
+
+
+def create_client(url=None, user=None, pool_size=None):
+    """创建WebHDFS客户端，所有线程共用一个带连接池的会话"""
+    pool_size = pool_size or Config.HDFS_SYNC_WORKERS
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return InsecureClient(url or Config.HDFS_WEB_URL, user=user or Config.HADOOP_USER,
+                          session=session, timeout=Config.HDFS_TIMEOUT)
+
+
+class HdfsSync:
+    """HDFS同步器"""
+
+    def __init__(self, client=None, workers=None, manifest_path=None):
+        self.workers = workers or Config.HDFS_SYNC_WORKERS
+        self.client = client or create_client(pool_size=self.workers)
+        self.manifest_path = manifest_path or Config.HDFS_SYNC_MANIFEST
+        self._lock = threading.Lock()
+        self._manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _record(self, hdfs_path, entry):
+        """记录一个已上传的文件并立即写回清单"""
+        with self._lock:
+            self._manifest[hdfs_path] = entry
+            os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+            tmp_path = self.manifest_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._manifest, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.manifest_path)
+
+    def is_available(self):
+        """检查WebHDFS是否可以访问"""
+        try:
+            self.client.status('/')
+            return True
+        except (HdfsError, requests.RequestException):
+            return False
+
+    def exists(self, hdfs_path):
+        """检查HDFS路径是否存在"""
+        return self.client.status(hdfs_path, strict=False) is not None
+
+    def makedirs(self, hdfs_path):
+        """创建HDFS目录（已存在时无副作用）"""
+        self.client.makedirs(hdfs_path)
+
+    def is_synced(self, local_path, hdfs_path, sha256=None):
+        """本地文件与HDFS上的副本一致时返回True"""
+        entry = self._manifest.get(hdfs_path)
+        sha256 = sha256 or file_sha256(local_path)
+        if not entry or entry.get('sha256') != sha256:
+            return False
+        status = self.client.status(hdfs_path, strict=False)
+        if status is None or status.get('length') != entry.get('size'):
+            return False
+        return self.client.checksum(hdfs_path) == entry.get('hdfs_checksum')
+
+    def upload_file(self, local_path, hdfs_path, force=False):
+        """上传单个文件，返回'uploaded'或'skipped'，失败时抛出异常"""
+        sha256 = file_sha256(local_path)
+        if not force and self.is_synced(local_path, hdfs_path, sha256):
+            count('hdfs_files_total', result='skipped')
+            return 'skipped'
+        with timer('hdfs_upload'), open(local_path, 'rb') as f:
+            self.client.write(hdfs_path, data=f, overwrite=True)
+        status = self.client.status(hdfs_path)
+        self._record(hdfs_path, {
+            'local_path': os.path.abspath(local_path),
+            'sha256': sha256,
+            'size': status['length'],
+            'hdfs_checksum': self.client.checksum(hdfs_path),
+        })
+        count('hdfs_files_total', result='uploaded')
+        return 'uploaded'
+
+    def sync_files(self, pairs, force=False):
+        """
+        并行同步多个(本地路径, HDFS路径)
+
+        返回 {'uploaded': [...], 'skipped': [...], 'failed': {本地路径: 错误信息}}
+        """
+        report = {'uploaded': [], 'skipped': [], 'failed': {}}
+        pairs = list(pairs)
+        if not pairs:
+            return report
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.upload_file, local_path, hdfs_path, force): local_path
+                       for local_path, hdfs_path in pairs}
+            for future, local_path in futures.items():
+                try:
+                    report[future.result()].append(local_path)
+                except (HdfsError, requests.RequestException, OSError) as e:
+                    report['failed'][local_path] = str(e)
+        return report
+
+    def sync_directory(self, local_dir=None, hdfs_dir=None, extensions=EXCEL_EXTENSIONS, force=False):
+        """把本地目录中的数据文件同步到HDFS目录"""
+        local_dir = local_dir or Config.DATA_DIR
+        hdfs_dir = (hdfs_dir or Config.HDFS_BASE_PATH).rstrip('/')
+        files = sorted(name for name in os.listdir(local_dir)
+                       if name.lower().endswith(extensions) and os.path.isfile(os.path.join(local_dir, name)))
+        self.makedirs(hdfs_dir)
+        return self.sync_files(((os.path.join(local_dir, name), f"{hdfs_dir}/{name}") for name in files),
+                               force=force)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+spark-excel依赖JAR的准备
+
+JAR按SHA-1内容寻址保存在Config.JAR_CACHE_DIR中，下载后与仓库提供的 .sha1 校验文件核对；
+已缓存的JAR不再下载，缺少的并行下载，仓库按Config.MAVEN_REPOSITORIES的顺序回退。
+也可以打包成离线包（zip）在没有网络的机器上安装。init_spark_session直接使用
+spark_jars()返回的路径列表作为spark.jars，启动时不再经过Ivy解析依赖。
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import Config
+
+# Maven坐标 group:artifact:version
+ARTIFACTS = [
+    # 使用旧版本的POI (4.1.2)，这个版本与XMLBeans兼容性更好
+    'org.apache.poi:poi:4.1.2',
+    'org.apache.poi:poi-ooxml:4.1.2',
+    'org.apache.poi:poi-ooxml-schemas:4.1.2',
+    # XMLBeans 3.1.0 (与POI 4.1.2兼容)
+    'org.apache.xmlbeans:xmlbeans:3.1.0',
+    # 其他依赖
+    'org.apache.commons:commons-compress:1.19',
+    'org.apache.commons:commons-collections4:4.4',
+    'org.apache.commons:commons-math3:3.6.1',
+    'com.github.virtuald:curvesapi:1.06',
+    # Spark Excel读取库 (使用与POI 4.1.2兼容的版本)
+    'com.crealytics:spark-excel_2.12:0.13.7',
+    # 日志库
+    'commons-logging:commons-logging:1.2',
+    'commons-io:commons-io:2.6',
+    'commons-codec:commons-codec:1.13',
+    # Log4j
+    'org.apache.logging.log4j:log4j-api:2.17.2',
+    'org.apache.logging.log4j:log4j-core:2.17.2',
+]
+
+INDEX_NAME = 'index.json'
+
+
+class ChecksumMismatch(IOError):
+    """下载内容与仓库的SHA-1校验值不一致"""
+
+
+def parse_coordinate(coordinate):
+    group, artifact, version = coordinate.split(':')
+    return group, artifact, version
+
+
+def jar_filename(coordinate):
+    _, artifact, version = parse_coordinate(coordinate)
+    return f"{artifact}-{version}.jar"
+
+
+def artifact_path(coordinate):
+    """仓库中的相对路径，如 org/apache/poi/poi/4.1.2/poi-4.1.2.jar"""
+    group, artifact, version = parse_coordinate(coordinate)
+    return f"{group.replace('.', '/')}/{artifact}/{version}/{jar_filename(coordinate)}"
+
+
+def sha1_of(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class JarProvisioner:
+    """JAR缓存与下载"""
+
+    def __init__(self, cache_dir=None, repositories=None, artifacts=None, workers=None, timeout=None):
+        self.cache_dir = cache_dir or Config.JAR_CACHE_DIR
+        self.repositories = [url.rstrip('/') for url in (repositories or Config.MAVEN_REPOSITORIES)]
+        self.artifacts = list(artifacts or ARTIFACTS)
+        self.workers = workers or Config.JAR_DOWNLOAD_WORKERS
+        self.timeout = timeout or Config.JAR_DOWNLOAD_TIMEOUT
+        self._lock = threading.Lock()
+        self._session = None
+
+    # ---- 缓存索引 ----
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, INDEX_NAME)
+
+    def _load_index(self):
+        try:
+            with open(self._index_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _record(self, coordinate, entry):
+        with self._lock:
+            index = self._load_index()
+            index[coordinate] = entry
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = self._index_path() + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp_path, self._index_path())
+
+    def _blob_path(self, sha1):
+        return os.path.join(self.cache_dir, sha1[:2], f"{sha1}.jar")
+
+    def cached_path(self, coordinate, verify=False):
+        """已缓存且完整的JAR路径，没有时返回None；verify=True时重新计算SHA-1"""
+        entry = self._load_index().get(coordinate)
+        if not entry:
+            return None
+        path = self._blob_path(entry['sha1'])
+        try:
+            if os.path.getsize(path) != entry['size']:
+                return None
+        except OSError:
+            return None
+        if verify and sha1_of(path) != entry['sha1']:
+            return None
+        return path
+
+    def missing(self, verify=False):
+        return [coordinate for coordinate in self.artifacts if self.cached_path(coordinate, verify) is None]
+
+    # ---- 下载 ----
+
+    def _http(self):
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
+
+    def _add_file(self, coordinate, path, expected_sha1):
+        """把文件按SHA-1放入缓存（校验失败时抛出ChecksumMismatch），返回缓存路径"""
+        actual = sha1_of(path)
+        if expected_sha1 and actual != expected_sha1:
+            raise ChecksumMismatch(f"{coordinate} 的SHA-1不一致: 期望 {expected_sha1}，实际 {actual}")
+        blob = self._blob_path(actual)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        os.replace(path, blob)
+        self._record(coordinate, {'sha1': actual, 'size': os.path.getsize(blob),
+                                  'file': jar_filename(coordinate)})
+        return blob
+
+    def _download_from(self, repository, coordinate):
+        url = f"{repository}/{artifact_path(coordinate)}"
+        http = self._http()
+        response = http.get(url + '.sha1', timeout=self.timeout)
+        response.raise_for_status()
+        # .sha1文件有时带文件名：“<sha1>  xxx.jar”
+        expected = response.text.strip().split()[0].lower()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = os.path.join(self.cache_dir, f"{jar_filename(coordinate)}.{threading.get_ident()}.part")
+        try:
+            with http.get(url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                with open(tmp_path, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        f.write(chunk)
+            return self._add_file(coordinate, tmp_path, expected)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def download(self, coordinate):
+        """从第一个可用的仓库下载并校验，所有仓库都失败时抛出最后一个错误"""
+        error = None
+        for repository in self.repositories:
+            try:
+                return self._download_from(repository, coordinate)
+            except (requests.RequestException, ChecksumMismatch, OSError) as e:
+                error = e
+                print(f"从 {repository} 下载 {coordinate} 失败: {str(e)}")
+        raise error or IOError(f"没有可用的Maven仓库: {coordinate}")
+
+    def ensure(self, verify=False):
+        """
+        并行下载缺少的JAR
+
+        返回 {'cached': [...], 'downloaded': [...], 'failed': {坐标: 错误信息}}
+        """
+        missing = self.missing(verify)
+        report = {'cached': [c for c in self.artifacts if c not in missing], 'downloaded': [], 'failed': {}}
+        if not missing:
+            return report
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self.download, coordinate): coordinate for coordinate in missing}
+            for future, coordinate in futures.items():
+                try:
+                    future.result()
+                    report['downloaded'].append(coordinate)
+                except Exception as e:
+                    report['failed'][coordinate] = str(e)
+        return report
+
+    # ---- 使用 ----
+
+    def spark_jars(self):
+        """全部JAR都已缓存时返回路径列表（ARTIFACTS顺序），否则返回None"""
+        paths = [self.cached_path(coordinate) for coordinate in self.artifacts]
+        return None if any(path is None for path in paths) else paths
+
+    # ---- 离线包 ----
+
+    def build_bundle(self, bundle_path):
+        """把已缓存的JAR和索引打包成zip，缺少JAR时抛出FileNotFoundError"""
+        missing = self.missing()
+        if missing:
+            raise FileNotFoundError(f"以下JAR尚未缓存，无法打包: {', '.join(missing)}")
+        index = self._load_index()
+        with zipfile.ZipFile(bundle_path, 'w', compression=zipfile.ZIP_STORED) as bundle:
+            manifest = {}
+            for coordinate in self.artifacts:
+                entry = index[coordinate]
+                bundle.write(self._blob_path(entry['sha1']), f"jars/{entry['file']}")
+                manifest[coordinate] = entry
+            bundle.writestr(INDEX_NAME, json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True))
+        return bundle_path
+
+    def install_bundle(self, bundle_path):
+        """从离线包安装JAR（逐个校验SHA-1），返回安装的数量"""
+        installed = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with zipfile.ZipFile(bundle_path) as bundle:
+            manifest = json.loads(bundle.read(INDEX_NAME).decode('utf-8'))
+            for coordinate, entry in manifest.items():
+                if self.cached_path(coordinate) is not None:
+                    continue
+                tmp_path = os.path.join(self.cache_dir, f"{entry['file']}.bundle.part")
+                with bundle.open(f"jars/{entry['file']}") as source, open(tmp_path, 'wb') as target:
+                    shutil.copyfileobj(source, target)
+                try:
+                    self._add_file(coordinate, tmp_path, entry['sha1'])
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+                installed += 1
+        return installed
+
+
+def spark_jars():
+    """init_spark_session使用的spark.jars路径列表，JAR未准备好时返回None"""
+    return JarProvisioner().spark_jars()
@@ -0,0 +1,423 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+长时间分析的后台任务
+
+提交的任务写入SQLite（Config.JOB_DB）中的队列，由固定数量的工作线程按提交顺序领取执行，
+请求线程立即返回任务编号，页面轮询任务状态，完成后从结果缓存读取结果。
+进程重启后，未完成的任务重新排队。每个任务的Spark作业归入以任务编号命名的作业组，
+取消任务时取消该作业组；pandas计算在阶段之间检查取消标记。
+多进程部署（serve.py）时Web工作进程（Config.SPARK_ROLE为client）只提交和查询任务，
+由独占Spark会话的驱动进程领取执行，其他进程发出的取消请求由驱动进程轮询处理。
+
+任务类型见JOB_KINDS，处理函数签名为 handler(context, dataset, params) -> 结果，
+结果（dict、list或DataFrame）转换为可JSON序列化的值后保存。
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from app.models.metrics import count, timer
+from app.models.result_cache import get_result_cache, make_key, resolve_dataset
+from app.models.spark_manager import get_spark_manager, job_group
+
+RESULT_TAG = '_jobs'  # 任务结果在结果缓存中的数据集标记，不随数据集更新而清理
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    dataset TEXT,
+    params TEXT NOT NULL,
+    state TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created);
+"""
+
+
+class JobError(ValueError):
+    """任务参数无效"""
+
+
+class JobCancelled(Exception):
+    """任务已被取消"""
+
+
+def _records(frame):
+    """DataFrame转为记录列表，NaN转为None"""
+    return frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+
+
+def to_json(value):
+    """把结果中的NumPy/pandas对象转换为可JSON序列化的值"""
+    if isinstance(value, dict):
+        return {str(key): to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, pd.DataFrame):
+        return to_json(_records(value))
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+
+def _processor():
+    """任务共用的DataProcessor（保留上次聚类的中心，用于热启动）"""
+    from app.models.data_processor import get_data_processor
+    return get_data_processor()
+
+
+def _features(params):
+    features = params.get('features')
+    if not features or not isinstance(features, list):
+        raise JobError('参数features必须是非空的列名列表')
+    return [str(feature) for feature in features]
+
+
+def _run_stats(context, dataset, params):
+    from app.models.stats_index import get_stats_index
+    return get_stats_index().describe(dataset, columns=params.get('columns'))
+
+
+def _run_kmeans(context, dataset, params):
+    processor = _processor()
+    df = processor.load_data(dataset)
+    context.progress(0.2, '数据已加载')
+    return processor.run_kmeans(df, _features(params), k=int(params.get('k', 3)), dataset=dataset,
+                                mode=params.get('mode', 'auto'))
+
+
+def _run_kmeans_sweep(context, dataset, params):
+    processor = _processor()
+    df = processor.load_data(dataset)
+    context.progress(0.2, '数据已加载')
+    return processor.run_kmeans_sweep(df, _features(params), k_values=params.get('k_values', range(2, 9)),
+                                      dataset=dataset, mode=params.get('mode', 'auto'))
+
+
+def _run_regression(context, dataset, params):
+    if not params.get('target'):
+        raise JobError('缺少参数target')
+    processor = _processor()
+    df = processor.load_data(dataset)
+    context.progress(0.2, '数据已加载')
+    return processor.run_regression(df, _features(params), params['target'], dataset=dataset)
+
+
+def _run_growth(context, dataset, params):
+    return _processor().growth_rates(dataset)
+
+
+def _run_trend_regression(context, dataset, params):
+    return _processor().trend_regression(degree=int(params.get('degree', 1)),
+                                         horizon=int(params.get('horizon', 3)))
+
+
+def _run_report_export(context, dataset, params):
+    from app.models.report_export import export_path, export_report, prune_exports
+    manifest = export_report(export_path(context.job_id), indicators=params.get('indicators'),
+                             chart_types=params.get('chart_types'), progress=context.progress)
+    prune_exports()
+    return manifest
+
+
+# 任务类型 -> (处理函数, 是否需要数据集)
+JOB_KINDS = {
+    'stats': (_run_stats, True),
+    'kmeans': (_run_kmeans, True),
+    'kmeans_sweep': (_run_kmeans_sweep, True),
+    'regression': (_run_regression, True),
+    'growth': (_run_growth, True),
+    'trend_regression': (_run_trend_regression, False),
+    'report_export': (_run_report_export, False),
+}
+
+
+class JobContext:
+    """传给处理函数的任务上下文：报告进度、检查取消"""
+
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.job_id = job_id
+
+    def progress(self, fraction, message=None):
+        self.check_cancelled()
+        self.queue._execute('UPDATE jobs SET progress = ?, message = COALESCE(?, message) WHERE id = ?',
+                            (float(fraction), message, self.job_id))
+
+    def check_cancelled(self):
+        row = self.queue._query('SELECT cancel_requested FROM jobs WHERE id = ?', (self.job_id,))
+        if row and row[0]['cancel_requested']:
+            raise JobCancelled()
+
+
+class JobQueue:
+    """SQLite持久化的任务队列和固定大小的工作线程池"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    FINISHED = (DONE, FAILED, CANCELLED)
+
+    def __init__(self, db_path=None, workers=None, kinds=None, result_cache=None, spark_manager=None):
+        self.db_path = db_path or Config.JOB_DB
+        self.workers = workers or Config.JOB_WORKERS
+        self.kinds = kinds or JOB_KINDS
+        self._cache = result_cache
+        self._manager = spark_manager
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._threads = []
+        self.executes = Config.SPARK_ROLE != 'client'
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        db = self._connect()
+        try:
+            db.executescript(SCHEMA)
+            if self.executes:
+                # 上次进程退出时还在运行的任务重新排队
+                db.execute('UPDATE jobs SET state = ?, progress = 0, started = NULL WHERE state = ?',
+                           (self.QUEUED, self.RUNNING))
+        finally:
+            db.close()
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        db.execute('PRAGMA journal_mode=WAL')
+        return db
+
+    def _execute(self, sql, args=()):
+        db = self._connect()
+        try:
+            return db.execute(sql, args).rowcount
+        finally:
+            db.close()
+
+    def _query(self, sql, args=()):
+        db = self._connect()
+        try:
+            return db.execute(sql, args).fetchall()
+        finally:
+            db.close()
+
+    def _result_cache(self):
+        return self._cache or get_result_cache()
+
+    def _spark_manager(self):
+        return self._manager or get_spark_manager()
+
+    @staticmethod
+    def group_id(job_id):
+        return f"job-{job_id}"
+
+    # ---- 提交和查询 ----
+
+    def start(self):
+        """启动工作线程（重复调用无影响，Web工作进程中不启动）"""
+        with self._wakeup:
+            if self._threads or not self.executes:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            if Config.SPARK_ROLE == 'driver':
+                thread = threading.Thread(target=self._watch_cancellations, name='job-cancel-watcher', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, kind, dataset=None, params=None):
+        """提交任务，返回任务状态；类型或参数无效时抛出JobError，数据集不存在时抛出FileNotFoundError"""
+        if kind not in self.kinds:
+            raise JobError(f"未知的任务类型: {kind}")
+        params = params or {}
+        if not isinstance(params, dict):
+            raise JobError('参数params必须是对象')
+        if self.kinds[kind][1]:
+            if not dataset:
+                raise JobError(f"任务类型 {kind} 需要指定dataset")
+            dataset = os.path.basename(resolve_dataset(dataset))
+        job_id = uuid.uuid4().hex
+        self._execute('INSERT INTO jobs (id, kind, dataset, params, state, created) VALUES (?, ?, ?, ?, ?, ?)',
+                      (job_id, kind, dataset, json.dumps(params, ensure_ascii=False), self.QUEUED, time.time()))
+        self._prune()
+        count('jobs_total', kind=kind, state='submitted')
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return self.get(job_id)
+
+    def _prune(self):
+        """只保留最近Config.JOB_HISTORY个已结束的任务"""
+        self._execute('DELETE FROM jobs WHERE state IN (?, ?, ?) AND id NOT IN '
+                      '(SELECT id FROM jobs WHERE state IN (?, ?, ?) ORDER BY created DESC LIMIT ?)',
+                      self.FINISHED + self.FINISHED + (Config.JOB_HISTORY,))
+
+    def _status(self, row):
+        job = dict(row)
+        job['params'] = json.loads(job['params'])
+        job['cancel_requested'] = bool(job['cancel_requested'])
+        if job['state'] == self.QUEUED:
+            ahead = self._query('SELECT COUNT(*) AS n FROM jobs WHERE state = ? AND created < ?',
+                                (self.QUEUED, job['created']))
+            job['queue_position'] = ahead[0]['n'] + 1
+        elif job['state'] == self.RUNNING:
+            spark = self._spark_manager().group_progress(self.group_id(job['id']))
+            if spark is not None:
+                job['spark'] = spark
+        return job
+
+    def get(self, job_id):
+        """任务状态，不存在时返回None"""
+        rows = self._query('SELECT * FROM jobs WHERE id = ?', (job_id,))
+        return self._status(rows[0]) if rows else None
+
+    def list(self, limit=50):
+        return [self._status(row) for row in
+                self._query('SELECT * FROM jobs ORDER BY created DESC LIMIT ?', (int(limit),))]
+
+    def result(self, job_id):
+        """已完成任务的结果，返回(是否找到, 结果)；结果已从缓存中淘汰时返回(False, None)"""
+        return self._result_cache().get(RESULT_TAG, job_id, make_key('job', job_id, {}))
+
+    def cancel(self, job_id):
+        """
+        取消任务：排队中的直接取消；运行中的设置取消标记并取消其Spark作业组
+
+        返回取消后的任务状态，任务不存在时返回None
+        """
+        job = self.get(job_id)
+        if job is None or job['state'] in self.FINISHED:
+            return job
+        if self._execute('UPDATE jobs SET state = ?, finished = ? WHERE id = ? AND state = ?',
+                         (self.CANCELLED, time.time(), job_id, self.QUEUED)):
+            count('jobs_total', kind=job['kind'], state=self.CANCELLED)
+            return self.get(job_id)
+        self._execute('UPDATE jobs SET cancel_requested = 1 WHERE id = ?', (job_id,))
+        try:
+            self._spark_manager().cancel_group(self.group_id(job_id))
+        except Exception as e:
+            print(f"取消Spark作业组失败 {job_id}: {str(e)}")
+        return self.get(job_id)
+
+    # ---- 执行 ----
+
+    def _claim(self):
+        """领取最早排队的任务并标记为运行中，没有时返回None"""
+        db = self._connect()
+        try:
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute('SELECT * FROM jobs WHERE state = ? ORDER BY created LIMIT 1', (self.QUEUED,)).fetchone()
+            if row is not None:
+                db.execute('UPDATE jobs SET state = ?, started = ?, progress = 0 WHERE id = ?',
+                           (self.RUNNING, time.time(), row['id']))
+            db.execute('COMMIT')
+            return row
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        finally:
+            db.close()
+
+    def _work(self):
+        # 驱动进程收不到其他进程提交时的通知，缩短轮询间隔
+        poll = 1 if Config.SPARK_ROLE == 'driver' else 5
+        while not self._stopping:
+            try:
+                row = self._claim()
+            except sqlite3.Error as e:
+                print(f"读取任务队列失败: {str(e)}")
+                row = None
+            if row is None:
+                with self._wakeup:
+                    if not self._stopping:
+                        self._wakeup.wait(timeout=poll)
+                continue
+            self._run(row)
+
+    def _watch_cancellations(self):
+        """驱动进程：取消其他进程请求取消的运行中任务的Spark作业组"""
+        cancelled = set()
+        while not self._stopping:
+            try:
+                rows = self._query('SELECT id FROM jobs WHERE state = ? AND cancel_requested = 1', (self.RUNNING,))
+            except sqlite3.Error as e:
+                print(f"读取任务队列失败: {str(e)}")
+                rows = []
+            for row in rows:
+                if row['id'] not in cancelled:
+                    cancelled.add(row['id'])
+                    try:
+                        self._spark_manager().cancel_group(self.group_id(row['id']))
+                    except Exception as e:
+                        print(f"取消Spark作业组失败 {row['id']}: {str(e)}")
+            cancelled &= {row['id'] for row in rows}
+            with self._wakeup:
+                if not self._stopping:
+                    self._wakeup.wait(timeout=1)
+
+    def _run(self, row):
+        job_id, kind = row['id'], row['kind']
+        handler = self.kinds[kind][0]
+        context = JobContext(self, job_id)
+        try:
+            context.check_cancelled()
+            with job_group(self.group_id(job_id)), timer('job', kind=kind):
+                result = to_json(handler(context, row['dataset'], json.loads(row['params'])))
+            context.check_cancelled()
+            self._result_cache().put(RESULT_TAG, job_id, make_key('job', job_id, {}), result)
+        except Exception as e:
+            cancelled = isinstance(e, JobCancelled) or bool(
+                self._query('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,))[0]['cancel_requested'])
+            state = self.CANCELLED if cancelled else self.FAILED
+            self._execute('UPDATE jobs SET state = ?, error = ?, finished = ? WHERE id = ?',
+                          (state, None if cancelled else str(e), time.time(), job_id))
+            if not cancelled:
+                print(f"任务执行失败 {job_id} ({kind}): {str(e)}")
+        else:
+            state = self.DONE
+            self._execute('UPDATE jobs SET state = ?, progress = 1, finished = ? WHERE id = ?',
+                          (state, time.time(), job_id))
+        count('jobs_total', kind=kind, state=state)
+
+    def shutdown(self):
+        """停止领取新任务（运行中的任务执行完为止，排队中的任务下次启动时继续）"""
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+            self._threads = []
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """返回进程内共享的任务队列（首次调用时启动工作线程）"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+            _queue.start()
+        return _queue
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+进程内共享的标签字典
+
+省份、指标等标签在各数据集、各处理阶段中反复出现。标签字典给每个标签分配一个整数编码，
+同一个标签在进程内只保存一份字符串：长表中的标签列保存为以字典为类别的pandas Categorical
+（每行只占一两个字节的编码），宽表的行标签直接引用字典中的字符串对象。
+编码只增不改，先后生成的Categorical的类别互为前缀。
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+class LabelDictionary:
+    """标签 <-> 整数编码"""
+
+    def __init__(self):
+        self._labels = []
+        self._codes = {}
+        self._categories = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._labels)
+
+    def encode(self, labels):
+        """标签序列转为int32编码数组，新标签追加到字典"""
+        with self._lock:
+            codes = np.empty(len(labels), dtype=np.int32)
+            for i, label in enumerate(labels):
+                code = self._codes.get(label)
+                if code is None:
+                    code = self._codes[label] = len(self._labels)
+                    self._labels.append(label)
+                    self._categories = None
+                codes[i] = code
+            return codes
+
+    def intern(self, labels):
+        """标签序列转为字典中的字符串对象（相同标签共用一个对象）"""
+        codes = self.encode(labels)
+        with self._lock:
+            return [self._labels[code] for code in codes]
+
+    def categories(self):
+        """当前字典的全部标签（pandas Index，字典增长前重复调用返回同一个对象）"""
+        with self._lock:
+            if self._categories is None:
+                self._categories = pd.Index(self._labels, dtype=object)
+            return self._categories
+
+    def categorical(self, labels=None, codes=None):
+        """以字典为类别的Categorical，给出codes时直接使用已有编码"""
+        codes = self.encode(labels) if codes is None else codes
+        return pd.Categorical.from_codes(codes, categories=self.categories())
+
+
+PROVINCES = LabelDictionary()
+INDICATORS = LabelDictionary()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据层内存占用报告
+
+按数据集列出各处理阶段（原始表 -> 省份×年份宽表 -> 清理后 -> 长表 -> 模型输入）占用的字节数：
+其中与前面阶段共用的部分（视图）、内存映射文件上的部分（多个进程共用页缓存）不计入该阶段
+自身的占用。baseline_bytes是同样的数据按float64数值、object字符串标签存储时的字节数，
+用于对照紧凑表示节省的内存。另列出指标面板各指标的占用。
+
+    python memory_report.py [--json report.json]
+"""
+
+import mmap
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from app.models.labels import INDICATORS, PROVINCES
+from app.models.parquet_cache import list_source_workbooks, read_excel_cached
+from app.models.reshape import drop_empty, melt_province_year, to_province_year
+from app.models.result_cache import resolve_dataset
+from app.models.shared_data import mapped_ranges
+
+
+def _buffers(obj):
+    """对象持有的NumPy数据缓冲区（object列的字符串不在其中）"""
+    if isinstance(obj, np.ndarray):
+        return [obj]
+    arrays = []
+    for column in obj.columns:
+        values = obj[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            arrays.append(values.cat.codes.to_numpy())
+        elif values.dtype.kind in 'fiubM':
+            arrays.append(values.to_numpy())
+    return arrays
+
+
+def _is_mapped(array, ranges=()):
+    """数组的数据是否来自内存映射文件：np.memmap/mmap，或位于ranges内（映射的Arrow缓冲区）"""
+    address = array.__array_interface__['data'][0]
+    if any(start <= address < end for start, end in ranges):
+        return True
+    base = array
+    while base is not None:
+        if isinstance(base, (np.memmap, mmap.mmap)):
+            return True
+        base = getattr(base, 'base', None)
+    return False
+
+
+def total_bytes(obj):
+    """对象占用的字节数（DataFrame含索引和字符串）"""
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    return int(obj.memory_usage(index=True, deep=True).sum())
+
+
+def baseline_bytes(obj):
+    """按float64数值、int64整数、object字符串标签存储时的字节数"""
+    if isinstance(obj, np.ndarray):
+        return int(obj.size * 8) if obj.dtype.kind in 'fiu' else int(obj.nbytes)
+    dtypes = {}
+    for column in obj.columns:
+        dtype = obj[column].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            dtypes[column] = object
+        elif dtype.kind == 'f':
+            dtypes[column] = np.float64
+        elif dtype.kind in 'iu':
+            dtypes[column] = np.int64
+    return total_bytes(obj.astype(dtypes) if dtypes else obj)
+
+
+def stage_report(stages):
+    """
+    各阶段的内存占用：[{'stage', 'shape', 'dtypes', 'bytes', 'shared_bytes', 'mapped_bytes',
+    'own_bytes', 'baseline_bytes'}]，shared_bytes为与前面阶段共用的缓冲区字节数
+    """
+    report, earlier = [], []
+    ranges = mapped_ranges()
+    for name, obj in stages:
+        arrays = _buffers(obj)
+        mapped = [array for array in arrays if _is_mapped(array, ranges)]
+        shared = [array for array in arrays if not any(array is m for m in mapped)
+                  and any(np.shares_memory(array, other) for other in earlier)]
+        size = total_bytes(obj)
+        mapped_bytes = sum(array.nbytes for array in mapped)
+        shared_bytes = sum(array.nbytes for array in shared)
+        dtypes = [str(obj.dtype)] if isinstance(obj, np.ndarray) else sorted({str(dtype) for dtype in obj.dtypes})
+        report.append({
+            'stage': name,
+            'shape': list(obj.shape),
+            'dtypes': dtypes,
+            'bytes': size,
+            'shared_bytes': int(shared_bytes),
+            'mapped_bytes': int(mapped_bytes),
+            'own_bytes': int(max(size - shared_bytes - mapped_bytes, 0)),
+            'baseline_bytes': baseline_bytes(obj),
+        })
+        earlier.extend(arrays)
+    return report
+
+
+def pipeline_stages(df):
+    """一个数据集经过整理流程的各阶段：[(阶段名, 对象)]"""
+    wide = to_province_year(df)
+    cleaned = drop_empty(wide)
+    return [
+        ('raw', df),
+        ('wide', wide),
+        ('cleaned', cleaned),
+        ('long', melt_province_year(cleaned)),
+        ('model_input', cleaned.to_numpy()),
+    ]
+
+
+def dataset_report(dataset, sheet_name=0):
+    """单个数据集各处理阶段的内存占用"""
+    source = resolve_dataset(dataset)
+    stages = stage_report(pipeline_stages(read_excel_cached(source, sheet_name)))
+    return {
+        'dataset': os.path.basename(source),
+        'stages': stages,
+        'own_bytes': sum(stage['own_bytes'] for stage in stages),
+        'baseline_bytes': sum(stage['baseline_bytes'] for stage in stages),
+    }
+
+
+def panel_report(panel=None):
+    """指标面板的内存占用：各指标的字节数、数值类型，是否内存映射"""
+    if panel is None:
+        from app.models.panel import get_panel
+        panel = get_panel()
+    labels = sum(sys.getsizeof(label) for label in panel.provinces + panel.indicators)
+    per_indicator = panel.values[0].nbytes if len(panel.indicators) else 0
+    return {
+        'shape': list(panel.shape),
+        'dtype': str(panel.values.dtype),
+        'decimals': panel.decimals,
+        'mapped': _is_mapped(panel.values),
+        'bytes': int(panel.values.nbytes),
+        'baseline_bytes': int(panel.values.size * 8),
+        'label_bytes': int(labels),
+        'indicators': {key: int(per_indicator) for key in panel.indicators},
+    }
+
+
+def memory_report(datasets=None, panel=True):
+    """所有（或指定）数据集和面板的内存报告"""
+    if datasets is None:
+        datasets = [os.path.basename(source) for source in list_source_workbooks()]
+    report = {'shared_datasets': Config.SHARED_DATASETS, 'compact_floats': Config.COMPACT_FLOATS,
+              'datasets': [], 'errors': {}}
+    for dataset in datasets:
+        try:
+            report['datasets'].append(dataset_report(dataset))
+        except Exception as e:
+            report['errors'][dataset] = str(e)
+    if panel:
+        report['panel'] = panel_report()
+    report['labels'] = {'provinces': len(PROVINCES), 'indicators': len(INDICATORS)}
+    return report
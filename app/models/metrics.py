@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+性能埋点：计时器、计数器和Prometheus文本格式导出
+
+    with timer('excel_parse', dataset=name):
+        ...
+    count('result_cache_miss')
+
+计时结果同时累加到两个地方：进程级的直方图（/metrics导出），以及当前请求的
+分阶段耗时（由Flask中间件写入Server-Timing响应头）。不依赖任何外部服务或库。
+"""
+
+import contextvars
+import functools
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+# 直方图分桶（秒），覆盖毫秒级的缓存读取到分钟级的Spark作业
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_request_stages = contextvars.ContextVar('request_stages', default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted((str(k), str(v)) for k, v in labels.items() if v is not None))
+
+
+class MetricsRegistry:
+    """进程内的指标注册表"""
+
+    def __init__(self):
+        self._counters = defaultdict(float)
+        self._histograms = {}
+        self._help = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def inc(self, name, value=1, **labels):
+        """计数器加value"""
+        with self._lock:
+            self._counters[(name, _label_key(labels))] += value
+
+    def observe(self, name, seconds, **labels):
+        """记录一次耗时到直方图"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {'buckets': [0] * len(BUCKETS), 'count': 0, 'sum': 0.0}
+            histogram['count'] += 1
+            histogram['sum'] += seconds
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    histogram['buckets'][i] += 1
+
+    def register_collector(self, collector):
+        """
+        注册采集函数，导出时调用
+
+        collector() 返回 [(指标名, 类型, 说明, [(标签字典, 值), ...]), ...]，
+        用于导出结果缓存命中率等已由其他模块统计的数值
+        """
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def snapshot(self):
+        """计数器和直方图的副本（供测试和调试查看）"""
+        with self._lock:
+            return {
+                'counters': {(name, labels): value for (name, labels), value in self._counters.items()},
+                'histograms': {key: {'count': h['count'], 'sum': h['sum']} for key, h in self._histograms.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """导出Prometheus文本格式（0.0.4）"""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, {'buckets': list(h['buckets']), 'count': h['count'], 'sum': h['sum']})
+                                for key, h in self._histograms.items())
+            collectors = list(self._collectors)
+
+        declared = set()
+
+        def declare(name, kind, help_text=None):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# HELP {name} {help_text or self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            declare(name, 'counter')
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), histogram in histograms:
+            declare(name, 'histogram')
+            for bound, value in zip(BUCKETS, histogram['buckets']):
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', repr(float(bound))),))} {value}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                lines.append(f"# 采集失败 {getattr(collector, '__name__', collector)}: {str(e)}")
+                continue
+            for name, kind, help_text, samples in families:
+                declare(name, kind, help_text)
+                for labels, value in samples:
+                    if value is not None:
+                        lines.append(f"{name}{_format_labels(_label_key(labels))} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+registry = MetricsRegistry()
+registry.describe('stage_seconds', '各处理阶段耗时（秒）')
+registry.describe('stage_errors_total', '各处理阶段抛出异常的次数')
+registry.describe('http_request_duration_seconds', 'HTTP请求耗时（秒）')
+registry.describe('http_requests_total', 'HTTP请求数')
+
+
+def count(name, value=1, **labels):
+    """计数器加value"""
+    registry.inc(name, value, **labels)
+
+
+@contextmanager
+def timer(stage, **labels):
+    """
+    记录一个阶段的耗时
+
+    进程级耗时记入stage_seconds{stage=...}直方图；在请求中调用时还累加到该请求的分阶段耗时。
+    阶段抛出异常时另外记入stage_errors_total。
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        registry.inc('stage_errors_total', stage=stage, **labels)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe('stage_seconds', elapsed, stage=stage, **labels)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.0) + elapsed
+
+
+def timed(stage, **labels):
+    """timer的装饰器形式"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(stage, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def begin_request():
+    """开始记录当前请求的分阶段耗时，返回用于end_request的令牌"""
+    return _request_stages.set({})
+
+
+def end_request(token):
+    """结束记录，返回 {阶段: 秒}"""
+    stages = _request_stages.get() or {}
+    _request_stages.reset(token)
+    return stages
+
+
+def render_metrics():
+    return registry.render()
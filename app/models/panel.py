@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+统一的长格式指标面板
+
+把Config.DATA_MAP中的所有指标一次性加载到一个 (指标, 省份, 年份) 三维NumPy数组，
+标签到下标的映射用字典保存，按任意轴切片都是O(1)的视图操作。
+面板可以保存为单个文件并以内存映射方式重新加载；多进程部署（Config.SHARED_DATASETS）时
+各进程映射同一个面板文件。
+
+数值在能按数据自身的小数位数无损还原时以float32保存（Config.COMPACT_FLOATS），内存减半；
+对外提供的数值（as_float64、to_frame、to_long、feature_matrix）还原为float64并按该位数取整，
+与源数据一致。省份、指标标签来自共享的标签字典（labels.py）。
+"""
+
+import json
+import os
+import struct
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from app.models.labels import INDICATORS, PROVINCES
+from app.models.parquet_cache import dataset_version, find_source, read_excel_cached
+from app.models.reshape import to_province_year
+
+MAGIC = b'IPANEL01'
+ALIGNMENT = 64
+
+_panel = None
+_panel_lock = threading.Lock()
+
+
+def data_decimals(values, max_decimals=None):
+    """数值的小数位数：取整到该位数后不变的最小位数，超过max_decimals时返回None"""
+    max_decimals = Config.FLOAT32_MAX_DECIMALS if max_decimals is None else max_decimals
+    finite = np.asarray(values, dtype=float)
+    finite = finite[np.isfinite(finite)]
+    for decimals in range(max_decimals + 1):
+        if np.array_equal(np.round(finite, decimals), finite):
+            return decimals
+    return None
+
+
+def compact_floats(values):
+    """
+    能无损压缩时把数值转为float32，返回 (数组, 小数位数)
+
+    float32的值还原为float64并按数据自身的小数位数取整后与原值完全相同才压缩，
+    否则返回float64数组和None
+    """
+    values = np.asarray(values, dtype=float)
+    if not Config.COMPACT_FLOATS:
+        return values, None
+    decimals = data_decimals(values)
+    if decimals is None:
+        return values, None
+    narrow = values.astype(np.float32)
+    finite = np.isfinite(values)
+    if not np.array_equal(np.round(narrow[finite].astype(float), decimals), values[finite]):
+        return values, None
+    return narrow, decimals
+
+
+class IndicatorPanel:
+    """(指标, 省份, 年份) 面板，缺失值为NaN"""
+
+    def __init__(self, values, indicators, provinces, years, names=None, version=None, decimals=None):
+        self.values = values
+        self.indicators = INDICATORS.intern(list(indicators))
+        self.provinces = PROVINCES.intern(list(provinces))
+        self.years = [int(year) for year in years]
+        self.names = dict(names or {})
+        self.version = version
+        self.decimals = decimals
+        self._indicator_codes = INDICATORS.encode(self.indicators)
+        self._province_codes = PROVINCES.encode(self.provinces)
+        self._indicator_index = {key: i for i, key in enumerate(self.indicators)}
+        self._province_index = {name: i for i, name in enumerate(self.provinces)}
+        self._year_index = {year: i for i, year in enumerate(self.years)}
+
+    @classmethod
+    def from_frames(cls, frames, names=None, version=None):
+        """由 {指标: 行=省份、列=年份的DataFrame} 构建面板"""
+        provinces = []
+        seen = set()
+        for frame in frames.values():
+            for province in frame.index:
+                if province not in seen:
+                    seen.add(province)
+                    provinces.append(province)
+        years = sorted({int(year) for frame in frames.values() for year in frame.columns})
+
+        values = np.full((len(frames), len(provinces), len(years)), np.nan)
+        for i, frame in enumerate(frames.values()):
+            frame = frame[~frame.index.duplicated()]
+            values[i] = frame.reindex(index=provinces, columns=years).to_numpy(dtype=float)
+        values, decimals = compact_floats(values)
+        return cls(values, frames.keys(), provinces, years, names, version, decimals)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def _widen(self, values):
+        """float32数值还原为float64（按小数位数取整），float64原样返回"""
+        if self.values.dtype == np.float64:
+            return values
+        values = np.asarray(values, dtype=float)
+        return values if self.decimals is None else np.round(values, self.decimals)
+
+    def as_float64(self):
+        """float64的 (指标, 省份, 年份) 数组，用于计算（面板是float32时为还原后的副本）"""
+        return self._widen(self.values)
+
+    def indicator(self, key):
+        """某指标的 省份×年份 视图"""
+        return self.values[self._indicator_index[key]]
+
+    def province(self, name):
+        """某省份的 指标×年份 视图"""
+        return self.values[:, self._province_index[name], :]
+
+    def year(self, year):
+        """某年份的 指标×省份 视图"""
+        return self.values[:, :, self._year_index[int(year)]]
+
+    def get(self, indicator, province, year):
+        """取单个数值"""
+        return self._widen(self.values[self._indicator_index[indicator],
+                                       self._province_index[province],
+                                       self._year_index[int(year)]])
+
+    def select(self, indicators=None, provinces=None, years=None):
+        """按标签子集取子面板（返回新的IndicatorPanel）"""
+        indicators = self.indicators if indicators is None else list(indicators)
+        provinces = self.provinces if provinces is None else list(provinces)
+        years = self.years if years is None else [int(year) for year in years]
+        values = self.values[np.ix_([self._indicator_index[key] for key in indicators],
+                                    [self._province_index[name] for name in provinces],
+                                    [self._year_index[year] for year in years])]
+        names = {key: self.names.get(key, key) for key in indicators}
+        return IndicatorPanel(values, indicators, provinces, years, names, self.version, self.decimals)
+
+    def to_frame(self, indicator):
+        """某指标的 行=省份、列=年份 DataFrame"""
+        return pd.DataFrame(self._widen(self.indicator(indicator)), index=self.provinces, columns=self.years)
+
+    def to_long(self):
+        """展开成 (indicator, province, year, value) 长表，去掉缺失值；标签列为共享字典的Categorical"""
+        i, p, y = np.nonzero(~np.isnan(self.values))
+        return pd.DataFrame({
+            'indicator': INDICATORS.categorical(codes=self._indicator_codes[i]),
+            'province': PROVINCES.categorical(codes=self._province_codes[p]),
+            'year': np.asarray(self.years, dtype=np.int16)[y],
+            'value': self._widen(self.values[i, p, y]),
+        })
+
+    def feature_matrix(self, indicators=None, year=None):
+        """
+        构建聚类等多指标分析的特征矩阵：行=省份，列=指标
+
+        year为None时每个指标取最近一个有数据的年份。
+        """
+        indicators = self.indicators if indicators is None else list(indicators)
+        columns = {}
+        for key in indicators:
+            data = self.indicator(key)
+            if year is not None:
+                columns[key] = self._widen(data[:, self._year_index[int(year)]])
+                continue
+            has_data = np.flatnonzero(~np.isnan(data).all(axis=0))
+            latest = has_data[-1] if len(has_data) else len(self.years) - 1
+            columns[key] = self._widen(data[:, latest])
+        return pd.DataFrame(columns, index=self.provinces)
+
+    def save(self, path):
+        """保存为单个文件：魔数 + 头部长度 + JSON头部 + 按64字节对齐的原始数组"""
+        values = np.ascontiguousarray(self.values)
+        header = json.dumps({
+            'dtype': values.dtype.str,
+            'shape': list(values.shape),
+            'indicators': self.indicators,
+            'provinces': self.provinces,
+            'years': self.years,
+            'names': self.names,
+            'version': self.version,
+            'decimals': self.decimals,
+        }, ensure_ascii=False).encode('utf-8')
+        prefix = len(MAGIC) + 8
+        header += b' ' * (-(prefix + len(header)) % ALIGNMENT)
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<Q', len(header)))
+            f.write(header)
+            values.tofile(f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """从save()生成的文件加载，mmap为True时数据以只读内存映射方式共享"""
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"不是有效的面板文件: {path}")
+            (header_length,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_length).decode('utf-8'))
+        offset = len(MAGIC) + 8 + header_length
+        dtype = np.dtype(header['dtype'])
+        shape = tuple(header['shape'])
+        if mmap:
+            values = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+        else:
+            values = np.fromfile(path, dtype=dtype, offset=offset).reshape(shape)
+        return cls(values, header['indicators'], header['provinces'], header['years'],
+                   header['names'], header['version'], header.get('decimals'))
+
+
+def _indicator_sources(data_map, verbose=False):
+    """按DATA_MAP解析每个指标的本地数据文件，找不到的指标跳过"""
+    sources = {}
+    for key, name in data_map.items():
+        source = find_source(name)
+        if source is None:
+            if verbose:
+                print(f"未找到指标数据文件: {name}")
+            continue
+        sources[key] = source
+    return sources
+
+
+def panel_version(data_map=None):
+    """由各指标数据文件的内容哈希组合出面板版本号"""
+    sources = _indicator_sources(data_map or Config.DATA_MAP)
+    return '-'.join(dataset_version(source)[:12] for source in sources.values())
+
+
+def build_panel(data_map=None):
+    """读取DATA_MAP中的所有指标构建面板"""
+    data_map = data_map or Config.DATA_MAP
+    frames = {}
+    names = {}
+    for key, source in _indicator_sources(data_map, verbose=True).items():
+        try:
+            frame = to_province_year(read_excel_cached(source))
+        except Exception as e:
+            print(f"加载指标 {key} 失败: {str(e)}")
+            continue
+        if frame.empty:
+            print(f"指标 {key} 没有可识别的省份/年份数据，已跳过")
+            continue
+        frames[key] = frame
+        names[key] = data_map[key]
+    return IndicatorPanel.from_frames(frames, names, panel_version(data_map))
+
+
+def _shared_panel(version, refresh):
+    """多进程部署时各进程内存映射同一个面板文件，文件版本不对时重新构建并保存"""
+    if not refresh and os.path.exists(Config.PANEL_FILE):
+        try:
+            panel = IndicatorPanel.load(Config.PANEL_FILE)
+            if panel.version == version:
+                return panel
+        except (OSError, ValueError) as e:
+            print(f"读取面板文件失败，重新构建: {str(e)}")
+    build_panel().save(Config.PANEL_FILE)
+    return IndicatorPanel.load(Config.PANEL_FILE)
+
+
+def get_panel(refresh=False):
+    """返回进程内共享的面板，数据文件变化或refresh为True时重新构建"""
+    global _panel
+    with _panel_lock:
+        version = panel_version()
+        if refresh or _panel is None or _panel.version != version:
+            _panel = _shared_panel(version, refresh) if Config.SHARED_DATASETS else build_panel()
+        return _panel
+
+
+if __name__ == '__main__':
+    panel = get_panel()
+    print(f"面板形状 (指标, 省份, 年份): {panel.shape}")
+    panel.save(Config.PANEL_FILE)
+    print(f"已保存到: {Config.PANEL_FILE}")
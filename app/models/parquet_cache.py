@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Excel数据源的Parquet列式缓存
+
+每个工作簿按内容哈希只转换一次为Parquet，之后的读取直接使用Parquet副本，
+源文件变化（mtime/大小变化且哈希不同）时才重新转换。转换时默认用流式读取器
+（xlsx_reader.py）解析Excel，无法解析的文件退回pd.read_excel。
+多进程部署时读取改由shared_data.py的内存映射Arrow副本提供。
+清单的读取-修改-写入同时持有线程锁和清单旁的文件锁（fcntl.flock），
+serve.py派生的多个工作进程与driver同时转换时不会互相覆盖对方写入的条目。
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import pathlib
+import threading
+
+import pandas as pd
+
+from config import Config
+from app.models.metrics import timer
+from app.models.xlsx_reader import UnsupportedWorkbook, read_frame, sheet_names
+
+try:
+    import fcntl
+except ImportError:  # Windows上没有fcntl，只有进程内的线程锁
+    fcntl = None
+
+MANIFEST_NAME = '_manifest.json'
+EXCEL_EXTENSIONS = ('.xls', '.xlsx')
+
+_lock = threading.RLock()
+_lock_depth = 0
+
+
+def list_source_workbooks():
+    """列出DATA_DIR和项目根目录下的所有Excel文件（DATA_DIR优先）"""
+    sources = []
+    for directory in (Config.DATA_DIR, Config.BASE_DIR):
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            # 跳过Excel打开文件时产生的临时锁文件
+            if name.startswith('~$') or not name.lower().endswith(EXCEL_EXTENSIONS):
+                continue
+            if os.path.isfile(path):
+                sources.append(path)
+    return sources
+
+
+def find_source(name):
+    """根据文件名（可省略扩展名，也可以是HDFS路径）查找本地Excel文件"""
+    name = os.path.basename(str(name).rstrip('/'))
+    for path in list_source_workbooks():
+        base = os.path.basename(path)
+        if name in (base, os.path.splitext(base)[0]):
+            return path
+    return None
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """分块计算文件的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(source, entry=None):
+    """返回源文件的(sha256, mtime, size)，mtime和大小未变时直接复用清单中的哈希"""
+    stat = os.stat(source)
+    if entry and entry.get('mtime') == stat.st_mtime and entry.get('size') == stat.st_size:
+        return entry['sha256'], stat.st_mtime, stat.st_size
+    return file_sha256(source), stat.st_mtime, stat.st_size
+
+
+def _manifest_path():
+    return os.path.join(Config.PARQUET_CACHE_DIR, MANIFEST_NAME)
+
+
+@contextlib.contextmanager
+def _manifest_lock():
+    """清单的进程内和跨进程互斥锁，可重入（文件锁只在最外层获取）"""
+    global _lock_depth
+    with _lock:
+        if _lock_depth or fcntl is None:
+            _lock_depth += 1
+            try:
+                yield
+            finally:
+                _lock_depth -= 1
+            return
+        os.makedirs(Config.PARQUET_CACHE_DIR, exist_ok=True)
+        with open(f"{_manifest_path()}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            _lock_depth += 1
+            try:
+                yield
+            finally:
+                _lock_depth -= 1
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _load_manifest():
+    try:
+        with open(_manifest_path(), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest):
+    os.makedirs(Config.PARQUET_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{_manifest_path()}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, _manifest_path())
+
+
+def _sheet_tag(sheet_name):
+    """把工作表名转换成可用于文件名的标记"""
+    if isinstance(sheet_name, int):
+        return str(sheet_name)
+    return hashlib.md5(str(sheet_name).encode('utf-8')).hexdigest()[:8]
+
+
+def _remove_entry_files(entry):
+    """删除旧版本源文件对应的Parquet文件"""
+    if not entry:
+        return
+    for filename in entry.get('sheets', {}).values():
+        try:
+            os.remove(os.path.join(Config.PARQUET_CACHE_DIR, filename))
+        except OSError:
+            pass
+
+
+def _normalize_frame(df):
+    """整理DataFrame使其可以写入Parquet：列名转字符串，混合类型的对象列转为字符串"""
+    df.columns = [str(column) for column in df.columns]
+    for column in df.columns:
+        if df[column].dtype == object:
+            values = df[column]
+            df[column] = values.where(values.isna(), values.astype(str))
+    return df
+
+
+def parse_excel(source, sheet_name=0):
+    """解析Excel工作表（Config.EXCEL_READER为stream时用流式读取器）"""
+    with timer('excel_parse'):
+        if Config.EXCEL_READER == 'stream':
+            try:
+                return read_frame(source, sheet_name)
+            except UnsupportedWorkbook as e:
+                print(f"流式读取器无法解析 {os.path.basename(source)}，改用pd.read_excel: {str(e)}")
+        return pd.read_excel(source, sheet_name=sheet_name)
+
+
+def excel_sheet_names(source):
+    """工作簿中按顺序的工作表名称（与parse_excel使用同一个读取器）"""
+    if Config.EXCEL_READER == 'stream':
+        try:
+            return sheet_names(source)
+        except UnsupportedWorkbook as e:
+            print(f"流式读取器无法解析 {os.path.basename(source)}，改用pd.ExcelFile: {str(e)}")
+    with pd.ExcelFile(source) as workbook:
+        return list(workbook.sheet_names)
+
+
+def _convert(source, sheet_name, sha256):
+    """读取Excel并写入内容寻址的Parquet文件，返回Parquet路径"""
+    stem = os.path.splitext(os.path.basename(source))[0]
+    filename = f"{stem}-{sha256[:16]}-{_sheet_tag(sheet_name)}.parquet"
+    parquet_path = os.path.join(Config.PARQUET_CACHE_DIR, filename)
+
+    df = _normalize_frame(parse_excel(source, sheet_name))
+    os.makedirs(Config.PARQUET_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{parquet_path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False, row_group_size=Config.PARQUET_ROW_GROUP_SIZE)
+    os.replace(tmp_path, parquet_path)
+    print(f"已生成Parquet缓存: {os.path.basename(source)} -> {filename}")
+    return parquet_path
+
+
+def _fresh_entry(manifest, source):
+    """取得source的最新清单项，源文件内容变化时丢弃旧的Parquet文件，返回(entry, changed)"""
+    entry = manifest.get(source)
+    sha256, mtime, size = source_fingerprint(source, entry)
+    changed = entry is None or entry.get('mtime') != mtime or entry.get('size') != size
+    if entry is None or entry['sha256'] != sha256:
+        _remove_entry_files(entry)
+        entry = {'sha256': sha256, 'sheets': {}, 'hdfs': []}
+    entry['mtime'] = mtime
+    entry['size'] = size
+    manifest[source] = entry
+    return entry, changed
+
+
+def ensure_parquet(source, sheet_name=0):
+    """返回source指定工作表对应的最新Parquet文件路径，必要时重新转换"""
+    source = os.path.abspath(source)
+    with _manifest_lock():
+        manifest = _load_manifest()
+        entry, changed = _fresh_entry(manifest, source)
+        sheet_key = str(sheet_name)
+        filename = entry['sheets'].get(sheet_key)
+        if filename is None or not os.path.exists(os.path.join(Config.PARQUET_CACHE_DIR, filename)):
+            parquet_path = _convert(source, sheet_name, entry['sha256'])
+            entry['sheets'][sheet_key] = os.path.basename(parquet_path)
+            changed = True
+        if changed:
+            _save_manifest(manifest)
+        return os.path.join(Config.PARQUET_CACHE_DIR, entry['sheets'][sheet_key])
+
+
+def dataset_version(source):
+    """返回数据集版本号（源文件内容哈希），供其他缓存作为失效依据"""
+    source = os.path.abspath(source)
+    with _manifest_lock():
+        manifest = _load_manifest()
+        entry, changed = _fresh_entry(manifest, source)
+        if changed:
+            _save_manifest(manifest)
+        return entry['sha256']
+
+
+def read_excel_cached(source, sheet_name=0, columns=None):
+    """读取Excel数据，优先使用新鲜的Parquet副本，作为pd.read_excel的替代"""
+    try:
+        parquet_path = ensure_parquet(source, sheet_name)
+    except ImportError as e:
+        # 未安装pyarrow时退回直接解析Excel
+        print(f"Parquet缓存不可用，直接读取Excel: {str(e)}")
+        df = parse_excel(source, sheet_name)
+        return df[columns] if columns else df
+    if Config.SHARED_DATASETS:
+        from app.models.shared_data import read_frame as read_shared
+        return read_shared(parquet_path, columns)
+    with timer('parquet_read'):
+        return pd.read_parquet(parquet_path, columns=columns)
+
+
+def read_schema(source, sheet_name=0):
+    """数据集的列名及是否为数值列 {列名: bool}，只读取Parquet文件尾部的schema，不读取数据"""
+    try:
+        import pyarrow.parquet as pq
+        import pyarrow.types as pat
+        schema = pq.read_schema(ensure_parquet(source, sheet_name))
+    except ImportError:
+        df = read_excel_cached(source, sheet_name)
+        return {column: pd.api.types.is_numeric_dtype(df[column]) for column in df.columns}
+    return {field.name: pat.is_integer(field.type) or pat.is_floating(field.type) or pat.is_decimal(field.type)
+            for field in schema}
+
+
+def build_all():
+    """把所有源工作簿转换为Parquet（已是最新的跳过），返回成功转换的数量"""
+    count = 0
+    for source in list_source_workbooks():
+        try:
+            ensure_parquet(source)
+            count += 1
+        except Exception as e:
+            print(f"转换Parquet失败 {os.path.basename(source)}: {str(e)}")
+    return count
+
+
+def read_spark_cached(spark, name, sheet_name=None):
+    """
+    用Spark读取Excel数据集的Parquet副本
+
+    name可以是文件名或HDFS路径，按文件名匹配本地源文件；找不到本地源文件时返回None，
+    由调用方退回spark-excel读取。本地模式直接读取本地Parquet，集群模式读取
+    HDFS_PARQUET_PATH下以内容哈希命名的副本，副本不存在时先上传。
+    """
+    source = find_source(name)
+    if source is None:
+        return None
+
+    sheet_name = 0 if sheet_name is None else sheet_name
+    parquet_path = ensure_parquet(source, sheet_name)
+    if Config.SPARK_MASTER.startswith('local'):
+        return spark.read.parquet(pathlib.Path(parquet_path).as_uri())
+
+    filename = os.path.basename(parquet_path)
+    hdfs_path = f"{Config.HDFS_PARQUET_PATH}/{filename}"
+    with _manifest_lock():
+        manifest = _load_manifest()
+        entry = manifest.get(os.path.abspath(source), {})
+        uploaded = filename in entry.get('hdfs', [])
+    if uploaded:
+        try:
+            return spark.read.parquet(hdfs_path)
+        except Exception as e:
+            print(f"HDFS上的Parquet副本不可用，重新上传: {str(e)}")
+
+    from app.models.arrow_bridge import to_spark
+    to_spark(spark, pd.read_parquet(parquet_path)).write.mode('overwrite').parquet(hdfs_path)
+    with _manifest_lock():
+        manifest = _load_manifest()
+        entry = manifest.get(os.path.abspath(source))
+        if entry is not None and filename not in entry.setdefault('hdfs', []):
+            entry['hdfs'].append(filename)
+            _save_manifest(manifest)
+    print(f"已上传Parquet副本到HDFS: {hdfs_path}")
+    return spark.read.parquet(hdfs_path)
+
+
+if __name__ == '__main__':
+    print(f"开始转换Excel数据源到Parquet缓存: {Config.PARQUET_CACHE_DIR}")
+    total = build_all()
+    print(f"完成，共 {total} 个工作簿的Parquet缓存已是最新")
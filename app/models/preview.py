@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+流式、分页的数据预览
+
+本地数据集按Parquet行组读取：翻页时只读取游标所在的行组，流式输出时逐批读取；
+多进程部署（Config.SHARED_DATASETS）时改为切片进程间共享的内存映射Arrow表（见shared_data.py）。
+统计信息在同一遍扫描中按批合并（计数、均值、二阶矩、最值，见stats_index），driver内存与文件大小无关。
+只在Spark中存在的数据用toLocalIterator逐分区拉取，不再collect整个DataFrame。
+"""
+
+import base64
+import json
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from app.models.metrics import timed
+from app.models.parquet_cache import dataset_version, ensure_parquet, read_excel_cached
+from app.models.result_cache import resolve_dataset
+from app.models.stats_index import add_values, finalize, new_moments
+
+
+class StaleCursor(ValueError):
+    """游标对应的数据集版本已经变化"""
+
+
+def encode_cursor(version, offset):
+    """生成不透明的分页游标（包含数据集版本和行偏移）"""
+    raw = json.dumps({'v': version[:16], 'o': int(offset)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, version):
+    """解析游标，返回行偏移；游标无效时抛出ValueError，数据集已更新时抛出StaleCursor"""
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        state = json.loads(raw.decode('utf-8'))
+        offset = int(state['o'])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+    if state.get('v') != version[:16]:
+        raise StaleCursor('数据集已更新，请从第一页重新开始')
+    if offset < 0:
+        raise ValueError(f"无效的分页游标: {cursor}")
+    return offset
+
+
+def _json_rows(df):
+    """DataFrame转为行列表，NaN/NaT转为None，时间转为ISO字符串"""
+    df = df.astype(object).where(df.notna(), None)
+    return [[value.isoformat() if hasattr(value, 'isoformat') else
+             value.item() if isinstance(value, np.generic) else value for value in row]
+            for row in df.itertuples(index=False, name=None)]
+
+
+def _parquet_file(source, sheet_name=0):
+    """返回数据集的pyarrow ParquetFile，未安装pyarrow时返回None"""
+    try:
+        import pyarrow.parquet as pq
+        return pq.ParquetFile(ensure_parquet(source, sheet_name))
+    except ImportError:
+        return None
+
+
+@timed('preview_page')
+def read_page(dataset, cursor=None, limit=None, sheet_name=0):
+    """
+    读取一页数据
+
+    返回 {'columns', 'rows', 'offset', 'total_rows', 'next_cursor', 'version'}，
+    最后一页的next_cursor为None
+    """
+    source = resolve_dataset(dataset)
+    version = dataset_version(source)
+    limit = max(1, min(int(limit or Config.PREVIEW_PAGE_SIZE), Config.PREVIEW_MAX_PAGE_SIZE))
+    offset = decode_cursor(cursor, version)
+
+    parquet = None if Config.SHARED_DATASETS else _parquet_file(source, sheet_name)
+    if Config.SHARED_DATASETS:
+        # 多进程部署时直接切片内存映射的Arrow表，不需要解码行组
+        from app.models.shared_data import open_table
+        table = open_table(ensure_parquet(source, sheet_name))
+        total_rows, columns = table.num_rows, list(table.column_names)
+        page = table.slice(offset, limit).to_pandas()
+    elif parquet is None:
+        df = read_excel_cached(source, sheet_name)
+        total_rows, columns = len(df), [str(column) for column in df.columns]
+        page = df.iloc[offset:offset + limit]
+    else:
+        total_rows = parquet.metadata.num_rows
+        columns = list(parquet.schema_arrow.names)
+        page = _read_parquet_range(parquet, offset, limit)
+
+    end = offset + len(page)
+    return {
+        'columns': columns,
+        'rows': _json_rows(page),
+        'offset': offset,
+        'total_rows': total_rows,
+        'next_cursor': encode_cursor(version, end) if end < total_rows else None,
+        'version': version[:16],
+    }
+
+
+def _read_parquet_range(parquet, offset, limit):
+    """按行组元数据跳到offset所在的行组，只读取覆盖[offset, offset+limit)的行组"""
+    import pyarrow as pa
+
+    tables, start = [], 0
+    for i in range(parquet.num_row_groups):
+        rows = parquet.metadata.row_group(i).num_rows
+        if start + rows > offset:
+            table = parquet.read_row_group(i)
+            skip = max(offset - start, 0)
+            tables.append(table.slice(skip, limit - sum(t.num_rows for t in tables)))
+            if sum(t.num_rows for t in tables) >= limit:
+                break
+        start += rows
+    if not tables:
+        return pd.DataFrame(columns=parquet.schema_arrow.names)
+    return pa.concat_tables(tables).to_pandas()
+
+
+def iter_chunks(dataset, chunk_rows=None, sheet_name=0):
+    """逐块产生数据行（每块为行列表），同一时间只有一块数据在内存中"""
+    source = resolve_dataset(dataset)
+    chunk_rows = chunk_rows or Config.PREVIEW_CHUNK_ROWS
+    parquet = _parquet_file(source, sheet_name)
+    if parquet is None:
+        df = read_excel_cached(source, sheet_name)
+        for start in range(0, len(df), chunk_rows):
+            yield _json_rows(df.iloc[start:start + chunk_rows])
+        return
+    for batch in parquet.iter_batches(batch_size=chunk_rows):
+        yield _json_rows(batch.to_pandas())
+
+
+def iter_spark_chunks(sdf, chunk_rows=None):
+    """逐分区把Spark DataFrame拉回driver，driver上最多保留一个分区，不受maxResultSize限制"""
+    chunk_rows = chunk_rows or Config.PREVIEW_CHUNK_ROWS
+    chunk = []
+    for row in sdf.toLocalIterator():
+        chunk.append(list(row))
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def spark_page(sdf, offset=0, limit=None):
+    """Spark DataFrame的一页数据，只把该页的行传回driver"""
+    limit = max(1, min(int(limit or Config.PREVIEW_PAGE_SIZE), Config.PREVIEW_MAX_PAGE_SIZE))
+    end = offset + limit
+    rows = sdf.rdd.zipWithIndex() \
+        .filter(lambda pair: offset <= pair[1] < end) \
+        .map(lambda pair: list(pair[0])) \
+        .collect()
+    return {'columns': sdf.columns, 'rows': rows, 'offset': offset}
+
+
+@timed('preview_stats')
+def streaming_stats(dataset, columns=None, sheet_name=0, chunk_rows=None):
+    """
+    一遍扫描计算基本统计信息，结果结构与PandasEngine.describe一致
+
+    columns为空时统计全部数值列
+    """
+    source = resolve_dataset(dataset)
+    chunk_rows = chunk_rows or Config.PREVIEW_CHUNK_ROWS
+    parquet = _parquet_file(source, sheet_name)
+    if parquet is None:
+        df = read_excel_cached(source, sheet_name)
+        df.columns = [str(column) for column in df.columns]
+        names, numeric = list(df.columns), list(df.select_dtypes('number').columns)
+    else:
+        import pyarrow.types as pat
+        names = list(parquet.schema_arrow.names)
+        numeric = [field.name for field in parquet.schema_arrow
+                   if pat.is_integer(field.type) or pat.is_floating(field.type)]
+
+    columns = [str(column) for column in columns] if columns else numeric
+    missing = [column for column in columns if column not in names]
+    if missing:
+        raise KeyError(', '.join(missing))
+    if parquet is None:
+        batches = (df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows))
+    else:
+        batches = (batch.to_pandas() for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns))
+
+    accs = {column: new_moments() for column in columns}
+    for batch in batches:
+        for column in columns:
+            add_values(accs[column], pd.to_numeric(batch[column], errors='coerce').to_numpy(dtype=float))
+
+    stats = {column: finalize(acc) for column, acc in accs.items()}
+    rows = len(df) if parquet is None else parquet.metadata.num_rows
+    return {'engine': 'stream', 'rows': rows, 'columns': stats}
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量报告导出
+
+把DATA_MAP中每个指标的全部图表类型（CHART_TYPES），以及按省份的K-means聚类摘要和趋势回归摘要
+导出到一个ZIP文件。需要生成的项目分发到进程池中并行渲染/计算，每完成一项就写入ZIP
+（直接写磁盘文件，不在内存中拼装整个报告），最后写入记录每一项耗时的manifest.json。
+
+图表沿用chart_service的内容地址（数据集版本 + 图表参数），摘要按数据集版本和参数保存在结果缓存中：
+数据没有变化的项目直接复用上一次导出（或页面上已经生成过）的结果，只有变化的数据集重新生成。
+数据集版本和图表的列都在工作进程中确定，某个指标的数据有问题时只有它的项目失败（记录在清单中），
+不影响其他指标的导出。
+
+    python export_report.py [--output report.zip] [--workers 4]
+"""
+
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from config import Config
+from app.models.chart_service import (CHART_TYPES, chart_columns, chart_key, chart_path, init_worker,
+                                      render_chart, render_inputs, select_chart_frame)
+from app.models.metrics import timer
+from app.models.parquet_cache import find_source, read_excel_cached
+from app.models.reshape import drop_empty, to_province_year
+from app.models.result_cache import dataset_fingerprint, get_result_cache, make_key, resolve_dataset
+
+CHART_LABELS = {'bar': '柱状图', 'line': '折线图', 'scatter': '散点图', 'pie': '饼图', 'heatmap': '热力图'}
+MANIFEST_NAME = 'manifest.json'
+
+
+def _indicator_frame(dataset):
+    """指标数据整理成的 省份×年份 宽表"""
+    return drop_empty(to_province_year(read_excel_cached(resolve_dataset(dataset))))
+
+
+def kmeans_summary(dataset, k):
+    """按各年份的数值对省份聚类：每个省份一行，包含所属类别和参与聚类的各年份数值"""
+    from app.models.engines import PandasEngine
+
+    wide = _indicator_frame(dataset)
+    features = [year for year in wide.columns if wide[year].notna().all()]
+    if not features or len(wide) < 2:
+        raise ValueError(f"没有所有省份都有数据的年份，无法聚类: {dataset}")
+    result = PandasEngine().kmeans(wide, features, k=min(k, len(wide)))
+    table = wide.loc[result['index'], features].copy()
+    table.insert(0, 'cluster', result['labels'])
+    table.index.name = 'province'
+    return table.reset_index()
+
+
+def trend_summary(dataset, name, degree, horizon):
+    """各省份的趋势回归：系数、R²、RMSE和之后几年的预测值"""
+    from app.models.batch_regression import trend_regression
+    from app.models.panel import IndicatorPanel
+
+    panel = IndicatorPanel.from_frames({dataset: _indicator_frame(dataset)}, {dataset: name})
+    return trend_regression(panel, degree, horizon).drop(columns=['indicator'])
+
+
+def _summary_params(kind):
+    if kind == 'kmeans':
+        return {'k': Config.EXPORT_KMEANS_K}
+    return {'degree': Config.EXPORT_TREND_DEGREE, 'horizon': Config.EXPORT_TREND_HORIZON}
+
+
+SUMMARY_KINDS = ('kmeans', 'regression')
+
+
+def validate_selection(indicators=None, chart_types=None, data_map=None):
+    """检查要导出的指标和图表类型，返回 (指标列表, 图表类型列表)，为空时取全部；无效时抛出ValueError"""
+    data_map = data_map or Config.DATA_MAP
+    for name, values in (('indicators', indicators), ('chart_types', chart_types)):
+        if values and (not isinstance(values, (list, tuple)) or not all(isinstance(v, str) for v in values)):
+            raise ValueError(f"参数{name}必须是字符串列表")
+    indicators = list(indicators or data_map)
+    chart_types = list(chart_types or CHART_TYPES)
+    unknown = [key for key in indicators if key not in data_map]
+    if unknown:
+        raise ValueError(f"未知的指标: {', '.join(unknown)}")
+    unknown = [chart_type for chart_type in chart_types if chart_type not in CHART_TYPES]
+    if unknown:
+        raise ValueError(f"不支持的图表类型: {', '.join(unknown)}")
+    return indicators, chart_types
+
+
+def plan(indicators=None, chart_types=None, data_map=None):
+    """
+    导出的全部项目，返回 (项目列表, 找不到数据文件的指标)；不读取数据，数据集版本在工作进程中确定
+
+    每个项目是一个dict：path（ZIP中的路径）、kind（chart/kmeans/regression）、indicator、name（指标名称）、
+    dataset，图表另有chart_type和title，摘要另有params
+    """
+    data_map = data_map or Config.DATA_MAP
+    indicators, chart_types = validate_selection(indicators, chart_types, data_map)
+
+    items, missing = [], []
+    for indicator in indicators:
+        source = find_source(data_map[indicator])
+        if source is None:
+            missing.append(indicator)
+            continue
+        base = {'indicator': indicator, 'name': data_map[indicator], 'dataset': os.path.basename(source)}
+        for chart_type in chart_types:
+            items.append(dict(base, path=f"{indicator}/{chart_type}.png", kind='chart', chart_type=chart_type,
+                              title=f"{data_map[indicator]} {CHART_LABELS[chart_type]}"))
+        for kind in SUMMARY_KINDS:
+            items.append(dict(base, path=f"{indicator}/{kind}.csv", kind=kind, params=_summary_params(kind)))
+    return items, missing
+
+
+def _generate(item, version):
+    """生成一个项目，返回 (结果, 缓存键, 是否复用)：图表为PNG路径，摘要为结果表"""
+    dataset = item['dataset']
+    if item['kind'] == 'chart':
+        x, y = chart_columns(dataset)
+        key = chart_key(version, item['chart_type'], x, y, item['title'])
+        path = chart_path(key)
+        if os.path.exists(path):
+            return path, key, True
+        df = None if item['chart_type'] == 'heatmap' else select_chart_frame(dataset, x, y)[0]
+        data, x, y = render_inputs(dataset, df, item['chart_type'], x, y)
+        return render_chart(path, item['chart_type'], data, x, y, item['title']), key, False
+
+    key = make_key(f"export_{item['kind']}", version, item['params'])
+    hit, value = get_result_cache().get(dataset, version, key)
+    if hit:
+        return value, key, True
+    if item['kind'] == 'kmeans':
+        return kmeans_summary(dataset, **item['params']), key, False
+    return trend_summary(dataset, item['name'], **item['params']), key, False
+
+
+def _run_item(item):
+    """
+    在导出进程中生成一个项目，返回 {'value', 'version', 'key', 'reused', 'seconds', 'error'}
+
+    上一次导出已生成且数据没有变化时直接复用；出错时不抛出异常，错误信息放在error中
+    """
+    start = time.perf_counter()
+    try:
+        version = dataset_fingerprint(item['dataset'])
+        value, key, reused = _generate(item, version)
+    except Exception as e:
+        return {'value': None, 'version': None, 'key': None, 'reused': False,
+                'seconds': time.perf_counter() - start, 'error': str(e) or type(e).__name__}
+    return {'value': value, 'version': version, 'key': key, 'reused': reused,
+            'seconds': 0.0 if reused else time.perf_counter() - start, 'error': None}
+
+
+def _write(archive, item, value):
+    """把一个项目写入ZIP，返回写入的字节数"""
+    if item['kind'] == 'chart':
+        # PNG本身已压缩，不再压缩
+        archive.write(value, item['path'], compress_type=zipfile.ZIP_STORED)
+        return os.path.getsize(value)
+    data = value.to_csv(index=False).encode('utf-8-sig')
+    archive.writestr(item['path'], data, compress_type=zipfile.ZIP_DEFLATED)
+    return len(data)
+
+
+def export_report(output, indicators=None, chart_types=None, workers=None, progress=None):
+    """
+    导出报告ZIP到output，返回清单：
+
+        {'output', 'workers', 'seconds', 'reused', 'generated', 'failed', 'missing', 'items': [...]}
+
+    items中每一项记录ZIP中的路径、类型、耗时（秒，复用的项目为0）、是否复用、大小和错误信息。
+    progress(完成比例, 说明)为进度回调，回调抛出的异常（如任务被取消）会中止导出。
+    """
+    start = time.perf_counter()
+    items, missing = plan(indicators, chart_types)
+    workers = max(int(workers or Config.EXPORT_WORKERS or os.cpu_count() or 1), 1)
+    entries = []
+
+    def finish(archive, item, value=None, seconds=0.0, reused=False, error=None):
+        entry = {key: item.get(key) for key in ('path', 'kind', 'indicator', 'dataset', 'chart_type')}
+        entry.update({'seconds': round(seconds, 4), 'reused': reused, 'bytes': 0, 'error': error})
+        if error is None:
+            entry['bytes'] = _write(archive, item, value)
+        entries.append(entry)
+        if progress is not None:
+            progress(len(entries) / len(items), f"已导出 {len(entries)}/{len(items)}: {item['path']}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    os.makedirs(Config.CHART_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{output}.{os.getpid()}.tmp"
+    executor = None
+    try:
+        with timer('report_export'), zipfile.ZipFile(tmp_path, 'w') as archive:
+            if items:
+                executor = ProcessPoolExecutor(max_workers=min(workers, len(items)), initializer=init_worker)
+                futures = {executor.submit(_run_item, item): item for item in items}
+                for future in as_completed(futures):
+                    item = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # 工作进程意外退出等，项目本身的错误已在_run_item中捕获
+                        result = {'error': str(e) or type(e).__name__}
+                    if result['error'] is not None:
+                        print(f"导出失败 {item['path']}: {result['error']}")
+                        finish(archive, item, error=result['error'])
+                        continue
+                    if item['kind'] != 'chart' and not result['reused']:
+                        get_result_cache().put(item['dataset'], result['version'], result['key'], result['value'])
+                    finish(archive, item, result['value'], result['seconds'], result['reused'])
+
+            manifest = {
+                'output': os.path.abspath(output),
+                'workers': workers,
+                'seconds': round(time.perf_counter() - start, 4),
+                'reused': sum(entry['reused'] for entry in entries),
+                'generated': sum(not entry['reused'] and entry['error'] is None for entry in entries),
+                'failed': sum(entry['error'] is not None for entry in entries),
+                'missing': missing,
+                'items': entries,
+            }
+            archive.writestr(MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2),
+                             compress_type=zipfile.ZIP_DEFLATED)
+        os.replace(tmp_path, output)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    return manifest
+
+
+def export_path(job_id):
+    """后台任务导出的ZIP文件路径"""
+    return os.path.join(Config.EXPORT_DIR, f"{job_id}.zip")
+
+
+def prune_exports(keep=None):
+    """只保留EXPORT_DIR中最近的keep个导出文件，返回删除的文件数"""
+    keep = Config.EXPORT_KEEP if keep is None else keep
+    try:
+        paths = [os.path.join(Config.EXPORT_DIR, name) for name in os.listdir(Config.EXPORT_DIR)
+                 if name.endswith('.zip')]
+    except OSError:
+        return 0
+    removed = 0
+    for path in sorted(paths, key=os.path.getmtime, reverse=True)[keep:]:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分省年度数据的形状整理
+
+工作簿有两种方向：行是省份、列是年份，或者行是年份、列是省份（即test.py中
+set_index("地区").T 转置后的结果）。这里统一整理成 行=省份、列=年份 的宽表，
+或者进一步展开成 (省份, 年份, 数值) 的长表。
+
+整理过程尽量不复制数据：转置、选取年份列、排序合并成一次按位置取子集，已经是数值的列
+不再转换，没有需要去掉的行列时drop_empty直接返回原表。省份标签来自共享的标签字典
+（labels.py），长表的省份列是Categorical，年份列是int16。
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+from app.models.labels import PROVINCES
+
+YEAR_PATTERN = re.compile(r'^\s*(\d{4})\s*年?\s*$')
+KEY_COLUMNS = ('地区', '时间')
+
+
+def parse_year(label):
+    """解析"2022年"、"2022"或2022形式的年份标签，无法解析时返回None"""
+    if isinstance(label, (int, float)) and not pd.isna(label) and float(label).is_integer():
+        label = int(label)
+    match = YEAR_PATTERN.match(str(label))
+    return int(match.group(1)) if match else None
+
+
+def key_column(df):
+    """返回工作簿的标签列（地区/时间），没有时取第一列"""
+    for column in KEY_COLUMNS:
+        if column in df.columns:
+            return column
+    return df.columns[0]
+
+
+def to_province_year(df):
+    """整理成 行=省份、列=年份（int，升序）的数值宽表，无法识别的行列会被丢弃"""
+    key = key_column(df)
+    labels = df[key].dropna()
+    frame = df.set_index(key)
+    # 标签列大多是年份时说明行是年份，需要转置
+    if len(labels) and sum(parse_year(label) is not None for label in labels) > len(labels) / 2:
+        frame = frame.T
+
+    years = [parse_year(column) for column in frame.columns]
+    order = sorted((year, i) for i, year in enumerate(years) if year is not None)
+    rows = np.flatnonzero(frame.index.notna())
+    # 行、列的筛选和年份排序合并为一次按位置取子集
+    frame = frame.iloc[rows if len(rows) < len(frame) else slice(None), [i for _, i in order]]
+    frame.columns = [year for year, _ in order]
+    frame.index = PROVINCES.intern([str(label).strip() for label in frame.index])
+    # 已经是数值的表（绝大多数情况）不再逐列转换
+    if any(dtype.kind not in 'fiub' for dtype in frame.dtypes):
+        frame = frame.apply(pd.to_numeric, errors='coerce')
+    return frame
+
+
+def drop_empty(frame):
+    """去掉整行、整列缺失的省份和年份，没有需要去掉的时返回原表（不复制）"""
+    present = frame.notna().to_numpy()
+    rows, columns = present.any(axis=1), present.any(axis=0)
+    if rows.all() and columns.all():
+        return frame
+    return frame.iloc[np.flatnonzero(rows), np.flatnonzero(columns)]
+
+
+def melt_province_year(frame, value_name='value'):
+    """把to_province_year的宽表展开成 (province, year, value) 长表，去掉缺失值"""
+    values = frame.to_numpy(dtype=float)
+    # 按年份在外层、省份在内层的顺序展开
+    y, p = np.nonzero(~np.isnan(values.T))
+    provinces = PROVINCES.encode(list(frame.index))
+    return pd.DataFrame({
+        'province': PROVINCES.categorical(codes=provinces[p]),
+        'year': np.asarray(frame.columns, dtype=np.int16)[y],
+        value_name: values[p, y],
+    })
+
+
+def wide_to_long(df, value_name='value'):
+    """展开成 (province, year, value) 长表，去掉缺失值"""
+    return melt_province_year(to_province_year(df), value_name)
+
+
+GROWTH_SCHEMA = 'province string, year long, value double, growth double'
+
+
+def year_over_year(group):
+    """单个省份的同比增长率（按年份排序，与上一年相比），可用作按省份分组的pandas UDF"""
+    group = group.sort_values('year')
+    result = group[['province', 'year', 'value']].copy()
+    result['value'] = result['value'].astype(float)
+    result['growth'] = result['value'].pct_change()
+    # 年份不连续时不计算增长率
+    result.loc[result['year'].diff() != 1, 'growth'] = np.nan
+    return result
@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+分析结果缓存
+
+K-means、线性回归等分析结果按 (分析类型, 数据集版本, 规范化后的参数) 缓存，
+分两级：进程内存中的LRU，以及Config.RESULT_CACHE_DIR下按总大小淘汰的磁盘缓存。
+数据集版本由工作簿内容哈希和HDFS副本校验和组成，数据变化后旧结果自然失效，
+并在下一次计算时被清理。调用方传入的数据可能经过筛选或变换，参数中同时带上
+所用数据的指纹（frame_fingerprint），同一数据集上不同的数据不会共用结果。
+
+磁盘条目用pickle协议5序列化，结果中的大块数组作为带外缓冲区按64字节对齐存放在文件末尾，
+读取时以只读内存映射的方式引用，多个工作进程读取同一条结果时共用页缓存中的一份数据。
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import pickle
+import struct
+import threading
+from collections import Counter, OrderedDict
+
+import pandas as pd
+
+from config import Config
+from app.models.parquet_cache import dataset_version, find_source
+
+MAGIC = b'RCACHE05'
+ALIGNMENT = 64
+
+
+def _normalize(value):
+    """规范化参数：字典按键排序并去掉None，整数值的浮点数转为int，字符串去掉首尾空白"""
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))
+                if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def make_key(kind, version, params):
+    """由分析类型、数据集版本和参数生成缓存键"""
+    normalized = json.dumps(_normalize(params or {}), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(f"{kind}|{version}|{normalized}".encode('utf-8')).hexdigest()
+
+
+def frame_fingerprint(df, columns=None):
+    """DataFrame（或其中columns列）内容的指纹：列名、行索引和各行的值"""
+    if columns is not None:
+        df = df[list(columns)]
+    digest = hashlib.sha256(json.dumps([str(column) for column in df.columns], ensure_ascii=False).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _hdfs_checksums(source):
+    """从HDFS同步清单中取出该文件副本的校验和（不访问网络）"""
+    try:
+        with open(Config.HDFS_SYNC_MANIFEST, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return ''
+    source = os.path.abspath(source)
+    checksums = [json.dumps(entry.get('hdfs_checksum'), sort_keys=True)
+                 for _, entry in sorted(manifest.items()) if entry.get('local_path') == source]
+    return hashlib.md5(''.join(checksums).encode('utf-8')).hexdigest()[:12] if checksums else ''
+
+
+def _aligned(offset):
+    return offset + (-offset % ALIGNMENT)
+
+
+def dump_value(value, f):
+    """写入磁盘条目：魔数 + pickle长度 + 缓冲区个数和长度 + pickle数据 + 对齐的带外缓冲区"""
+    buffers = []
+    data = pickle.dumps(value, protocol=5, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+    f.write(MAGIC)
+    f.write(struct.pack(f'<QI{len(raws)}Q', len(data), len(raws), *(raw.nbytes for raw in raws)))
+    f.write(data)
+    for raw in raws:
+        f.write(b'\0' * (-f.tell() % ALIGNMENT))
+        f.write(raw)
+
+
+def load_value(f):
+    """读取dump_value写入的条目，带外缓冲区引用只读内存映射；兼容旧的整文件pickle格式"""
+    if f.read(len(MAGIC)) != MAGIC:
+        f.seek(0)
+        return pickle.load(f)
+    length, count = struct.unpack('<QI', f.read(12))
+    sizes = struct.unpack(f'<{count}Q', f.read(8 * count))
+    if not count:
+        return pickle.loads(f.read(length))
+    view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    start = len(MAGIC) + 12 + 8 * count
+    offset, buffers = start + length, []
+    for size in sizes:
+        offset = _aligned(offset)
+        buffers.append(view[offset:offset + size])
+        offset += size
+    return pickle.loads(view[start:start + length], buffers=buffers)
+
+
+def resolve_dataset(dataset):
+    """把数据集名称或路径解析为本地源文件路径，不存在时抛出FileNotFoundError"""
+    source = dataset if os.path.isfile(str(dataset)) else find_source(dataset)
+    if source is None:
+        raise FileNotFoundError(f"数据集不存在: {dataset}")
+    return source
+
+
+def dataset_fingerprint(dataset):
+    """数据集版本：工作簿内容哈希（Parquet副本由它派生）加上HDFS副本的校验和"""
+    source = resolve_dataset(dataset)
+    version = dataset_version(source)[:16]
+    hdfs = _hdfs_checksums(source)
+    return f"{version}-{hdfs}" if hdfs else version
+
+
+class ResultCache:
+    """两级结果缓存：内存LRU + 磁盘"""
+
+    def __init__(self, cache_dir=None, max_entries=None, max_disk_bytes=None):
+        self.cache_dir = cache_dir or Config.RESULT_CACHE_DIR
+        self.max_entries = max_entries or Config.RESULT_CACHE_MAX_ENTRIES
+        self.max_disk_bytes = max_disk_bytes or Config.RESULT_CACHE_MAX_BYTES
+        self._memory = OrderedDict()
+        self._counters = Counter()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _tag(dataset):
+        return hashlib.md5(os.path.basename(str(dataset)).encode('utf-8')).hexdigest()[:8]
+
+    def _path(self, dataset, version, key):
+        # 文件名包含数据集标记和版本，便于按数据集清理旧版本
+        return os.path.join(self.cache_dir, f"{self._tag(dataset)}-{version[:12]}-{key}.pkl")
+
+    def get(self, dataset, version, key):
+        """查找缓存，返回(是否命中, 结果)"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return True, self._memory[key][2]
+
+        path = self._path(dataset, version, key)
+        try:
+            with open(path, 'rb') as f:
+                value = load_value(f)
+            os.utime(path)  # 记录访问时间，供LRU淘汰使用
+        except (OSError, pickle.PickleError, EOFError, struct.error, ValueError):
+            with self._lock:
+                self._counters['misses'] += 1
+            return False, None
+
+        with self._lock:
+            self._counters['disk_hits'] += 1
+            self._remember(dataset, version, key, value)
+        return True, value
+
+    def put(self, dataset, version, key, value):
+        """写入内存和磁盘两级缓存"""
+        with self._lock:
+            self._remember(dataset, version, key, value)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(dataset, version, key)
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            dump_value(value, f)
+        try:
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Windows上被其他进程映射中的文件不能替换，内存中已有结果，放弃这次写盘
+            print(f"写入结果缓存失败: {str(e)}")
+            os.remove(tmp_path)
+        self._evict_disk()
+
+    def _remember(self, dataset, version, key, value):
+        self._memory[key] = (self._tag(dataset), version, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters['memory_evictions'] += 1
+
+    def _disk_entries(self):
+        try:
+            names = [name for name in os.listdir(self.cache_dir) if name.endswith('.pkl')]
+        except OSError:
+            return []
+        entries = []
+        for name in names:
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict_disk(self):
+        """磁盘缓存超过总大小上限时，删除最久未访问的条目"""
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                with self._lock:
+                    self._counters['disk_evictions'] += 1
+            except OSError:
+                pass
+
+    def invalidate(self, dataset, keep_version=None):
+        """删除某数据集的缓存结果（keep_version指定的版本除外），返回删除的磁盘条目数"""
+        prefix = self._tag(dataset) + '-'
+        keep = f"{prefix}{keep_version[:12]}-" if keep_version else None
+        removed = 0
+        for _, _, path in self._disk_entries():
+            name = os.path.basename(path)
+            if name.startswith(prefix) and not (keep and name.startswith(keep)):
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        with self._lock:
+            tag = self._tag(dataset)
+            for key, (entry_tag, version, _) in list(self._memory.items()):
+                if entry_tag == tag and version != keep_version:
+                    del self._memory[key]
+            self._counters['invalidations'] += removed
+        return removed
+
+    def get_or_compute(self, kind, dataset, params, compute):
+        """命中缓存时直接返回结果，否则调用compute()计算并缓存"""
+        source = resolve_dataset(dataset)
+        dataset = os.path.basename(source)
+        version = dataset_fingerprint(source)
+        key = make_key(kind, version, params)
+        hit, value = self.get(dataset, version, key)
+        if hit:
+            return value
+        # 缓存未命中可能是数据集已更新，顺便清理该数据集的旧版本结果
+        self.invalidate(dataset, keep_version=version)
+        value = compute()
+        self.put(dataset, version, key, value)
+        return value
+
+    def stats(self):
+        """命中/未命中计数和命中率"""
+        with self._lock:
+            counters = dict(self._counters)
+            memory_entries = len(self._memory)
+        hits = counters.get('memory_hits', 0) + counters.get('disk_hits', 0)
+        lookups = hits + counters.get('misses', 0)
+        entries = self._disk_entries()
+        return {
+            'memory_hits': counters.get('memory_hits', 0),
+            'disk_hits': counters.get('disk_hits', 0),
+            'misses': counters.get('misses', 0),
+            'hit_rate': round(hits / lookups, 4) if lookups else None,
+            'memory_entries': memory_entries,
+            'memory_evictions': counters.get('memory_evictions', 0),
+            'disk_entries': len(entries),
+            'disk_bytes': sum(size for _, size, _ in entries),
+            'disk_evictions': counters.get('disk_evictions', 0),
+            'invalidations': counters.get('invalidations', 0),
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """返回进程内共享的结果缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
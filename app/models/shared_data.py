@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+进程间共享的只读数据集
+
+多进程部署（serve.py）时，每个数据集的Parquet副本再导出一份未压缩的Arrow IPC文件，
+各工作进程以内存映射方式打开：数值列直接引用映射的页面（零拷贝），多个进程读取同一个
+数据集时共用操作系统页缓存中的一份数据，而不是每个进程各解码一份DataFrame。
+
+Arrow文件名沿用Parquet副本的名称（含内容哈希），数据集更新后自然生成新文件，
+旧文件由prune()清理。浮点列中的缺失值保存为NaN而不是Arrow的null，转换回pandas时不需要复制。
+"""
+
+import os
+import threading
+
+import pandas as pd
+
+from config import Config
+from app.models.metrics import timer
+
+_tables = {}
+_lock = threading.Lock()
+
+
+def arrow_path(parquet_path):
+    """Parquet副本对应的Arrow IPC文件路径"""
+    stem = os.path.splitext(os.path.basename(parquet_path))[0]
+    return os.path.join(Config.SHARED_DATA_DIR, stem + '.arrow')
+
+
+def _arrow_table(df):
+    import pyarrow as pa
+
+    arrays = []
+    for column in df.columns:
+        values = df[column]
+        if values.dtype.kind in 'fiub':
+            # 数值列按原样保存，NaN不转为null，读取时可以零拷贝
+            arrays.append(pa.array(values.to_numpy(), from_pandas=False))
+        else:
+            arrays.append(pa.array(values, from_pandas=True))
+    return pa.Table.from_arrays(arrays, names=[str(column) for column in df.columns])
+
+
+def export(parquet_path):
+    """把Parquet副本导出为Arrow IPC文件（已存在时跳过），返回文件路径"""
+    import pyarrow as pa
+
+    path = arrow_path(parquet_path)
+    if os.path.exists(path):
+        return path
+    with timer('shared_export'):
+        table = _arrow_table(pd.read_parquet(parquet_path))
+        os.makedirs(Config.SHARED_DATA_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+    return path
+
+
+def open_table(parquet_path):
+    """以内存映射方式打开数据集的Arrow表（每个进程每个文件只打开一次）"""
+    import pyarrow as pa
+
+    path = arrow_path(parquet_path)
+    with _lock:
+        table = _tables.get(path)
+        if table is not None:
+            return table
+    path = export(parquet_path)
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    with _lock:
+        return _tables.setdefault(path, table)
+
+
+def to_frame(table, columns=None):
+    """Arrow表转为DataFrame，数值列是映射页面上的只读视图"""
+    if columns:
+        table = table.select([str(column) for column in columns])
+    return table.to_pandas(split_blocks=True)
+
+
+def read_frame(parquet_path, columns=None):
+    """读取共享的数据集，作为pd.read_parquet的替代"""
+    with timer('shared_read'):
+        return to_frame(open_table(parquet_path), columns)
+
+
+def mapped_ranges():
+    """本进程已映射的数据集缓冲区地址范围：[(起始地址, 结束地址)]"""
+    with _lock:
+        tables = list(_tables.values())
+    ranges = []
+    for table in tables:
+        for column in table.columns:
+            for chunk in column.chunks:
+                ranges += [(buffer.address, buffer.address + buffer.size)
+                           for buffer in chunk.buffers() if buffer is not None]
+    return ranges
+
+
+def prune():
+    """删除Parquet副本已不存在的Arrow文件，返回删除的文件数"""
+    try:
+        names = [name for name in os.listdir(Config.SHARED_DATA_DIR) if name.endswith('.arrow')]
+    except OSError:
+        return 0
+    removed = 0
+    for name in names:
+        parquet_path = os.path.join(Config.PARQUET_CACHE_DIR, name[:-len('.arrow')] + '.parquet')
+        if os.path.exists(parquet_path):
+            continue
+        try:
+            os.remove(os.path.join(Config.SHARED_DATA_DIR, name))
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
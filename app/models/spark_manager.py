@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Spark会话管理器
+
+在后台线程中预热Spark会话，Web应用启动时无需等待JVM和JAR加载；
+作业通过job()提交到FAIR调度池，并受全局和调度池两级并发上限约束，
+长时间的回归作业不会阻塞其他用户的数据预览；每个作业按配置档案和输入数据量
+设置shuffle分区等SQL配置。
+后台任务（见jobs.py）用job_group()指定作业组，任务取消时按作业组取消正在运行的Spark作业。
+
+多进程部署（serve.py）时只有驱动进程（Config.SPARK_ROLE为driver）创建Spark会话，
+并把会话状态发布到Config.SPARK_STATUS_FILE；Web工作进程（client）不创建会话，
+状态从该文件读取，Spark作业通过后台任务交给驱动进程执行。
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from config import Config
+from app.models.metrics import registry, timer
+from app.models.spark_profiles import runtime_conf
+
+_job_group = contextvars.ContextVar('spark_job_group', default=None)
+
+
+@contextmanager
+def job_group(group_id):
+    """在此范围内通过SparkSessionManager.job()提交的作业都归入group_id作业组"""
+    token = _job_group.set(group_id)
+    try:
+        yield group_id
+    finally:
+        _job_group.reset(token)
+
+
+class SparkNotReady(RuntimeError):
+    """Spark会话尚未就绪或初始化失败"""
+
+
+class SparkBusy(RuntimeError):
+    """等待并发名额超时"""
+
+
+class SparkSessionManager:
+    """Spark会话管理器"""
+
+    COLD = 'cold'
+    WARMING = 'warming'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    def __init__(self, max_concurrent=None, pool_limits=None):
+        self.max_concurrent = max_concurrent or Config.SPARK_MAX_CONCURRENT_JOBS
+        self.pool_limits = dict(pool_limits or Config.SPARK_POOL_LIMITS)
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._pool_slots = {pool: threading.BoundedSemaphore(limit)
+                            for pool, limit in self.pool_limits.items()}
+        self._active = {}
+        self._profiled = {}
+        self._spark = None
+        self._state = self.COLD
+        self._error = None
+        self._warmup_seconds = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        return self._state
+
+    def start_warmup(self):
+        """在后台线程中初始化Spark会话（重复调用无副作用，Web工作进程中不执行）"""
+        if Config.SPARK_ROLE == 'client':
+            return
+        with self._lock:
+            if self._state in (self.WARMING, self.READY):
+                return
+            self._state = self.WARMING
+            self._error = None
+            self._ready.clear()
+        self._publish()
+        threading.Thread(target=self._warmup, name='spark-warmup', daemon=True).start()
+
+    def _warmup(self):
+        start = time.time()
+        try:
+            # 延迟导入，避免应用启动时加载PySpark
+            from app.models.spark_utils import init_spark_session
+
+            spark = init_spark_session()
+            if spark is None:
+                raise SparkNotReady("Spark会话初始化失败")
+            # 执行一个极小的作业，让executor和Python worker提前启动
+            spark.range(1).count()
+        except Exception as e:
+            with self._lock:
+                self._state = self.FAILED
+                self._error = str(e)
+            print(f"Spark预热失败: {str(e)}")
+        else:
+            with self._lock:
+                self._spark = spark
+                self._state = self.READY
+                self._warmup_seconds = round(time.time() - start, 3)
+            print(f"Spark会话预热完成，耗时 {self._warmup_seconds} 秒")
+        finally:
+            self._ready.set()
+            self._publish()
+
+    def get_session(self, timeout=None):
+        """返回就绪的Spark会话，必要时触发预热并等待至多timeout秒"""
+        if Config.SPARK_ROLE == 'client':
+            raise SparkNotReady("Web工作进程不创建Spark会话，Spark作业请通过后台任务（/jobs）提交给驱动进程")
+        if self._state in (self.COLD, self.FAILED):
+            self.start_warmup()
+        timeout = Config.SPARK_JOB_WAIT_TIMEOUT if timeout is None else timeout
+        if not self._ready.wait(timeout):
+            raise SparkNotReady("Spark会话仍在预热中，请稍后重试")
+        if self._state != self.READY:
+            raise SparkNotReady(f"Spark会话不可用: {self._error}")
+        return self._spark
+
+    def profiled_session(self, spark, profile, input_bytes=None):
+        """
+        返回应用了配置档案运行时配置的会话
+
+        SQL配置是会话级的，直接修改共享会话会影响并发作业，所以为每组配置派生一个
+        共用SparkContext的子会话（newSession），并缓存复用。
+        """
+        conf = runtime_conf(profile, input_bytes)
+        key = tuple(sorted(conf.items()))
+        with self._lock:
+            session = self._profiled.get(key)
+            if session is None:
+                session = spark.newSession()
+                for name, value in conf.items():
+                    session.conf.set(name, value)
+                self._profiled[key] = session
+            return session
+
+    @contextmanager
+    def job(self, pool='default', description=None, timeout=None, profile=None, input_bytes=None):
+        """
+        在指定的FAIR调度池中运行Spark作业
+
+        用法:
+            with manager.job('regression', '线性回归', input_bytes=n) as spark:
+                ...
+        先占用调度池名额再占用全局名额，避免排队中的长作业占着全局名额。
+        profile默认取Config.SPARK_POOL_PROFILES中该调度池的档案，shuffle分区数按input_bytes计算。
+        """
+        timeout = Config.SPARK_JOB_WAIT_TIMEOUT if timeout is None else timeout
+        wait_start = time.perf_counter()
+        spark = self.get_session(timeout)
+        profile = profile or Config.SPARK_POOL_PROFILES.get(pool)
+        if profile:
+            spark = self.profiled_session(spark, profile, input_bytes)
+        pool_slot = self._pool_slots.get(pool)
+        if pool_slot is not None and not pool_slot.acquire(timeout=timeout):
+            raise SparkBusy(f"调度池 {pool} 的并发作业已满")
+        if not self._slots.acquire(timeout=timeout):
+            if pool_slot is not None:
+                pool_slot.release()
+            raise SparkBusy("Spark并发作业数已达上限")
+
+        registry.observe('spark_wait_seconds', time.perf_counter() - wait_start, pool=pool)
+        with self._lock:
+            self._active[pool] = self._active.get(pool, 0) + 1
+        self._publish()
+        sc = spark.sparkContext
+        group_id = _job_group.get() or f"{pool}-{uuid.uuid4().hex[:12]}"
+        try:
+            sc.setLocalProperty('spark.scheduler.pool', pool)
+            sc.setJobGroup(group_id, description or pool, interruptOnCancel=True)
+            with timer('spark_job', pool=pool):
+                yield spark
+        finally:
+            sc.setLocalProperty('spark.scheduler.pool', None)
+            with self._lock:
+                self._active[pool] -= 1
+            self._slots.release()
+            if pool_slot is not None:
+                pool_slot.release()
+            self._publish()
+
+    def cancel_group(self, group_id):
+        """取消作业组中正在运行的Spark作业，会话未就绪时返回False"""
+        spark = self._spark
+        if spark is None:
+            return False
+        spark.sparkContext.cancelJobGroup(group_id)
+        return True
+
+    def group_progress(self, group_id):
+        """作业组中正在运行的阶段的任务进度 {'jobs', 'tasks_completed', 'tasks_total'}，没有作业时返回None"""
+        spark = self._spark
+        if spark is None:
+            return None
+        tracker = spark.sparkContext.statusTracker()
+        job_ids = tracker.getJobIdsForGroup(group_id)
+        if not job_ids:
+            return None
+        completed = total = 0
+        for job_id in job_ids:
+            job = tracker.getJobInfo(job_id)
+            for stage_id in (job.stageIds if job else []):
+                stage = tracker.getStageInfo(stage_id)
+                if stage is not None:
+                    completed += stage.numCompletedTasks
+                    total += stage.numTasks
+        return {'jobs': len(job_ids), 'tasks_completed': completed, 'tasks_total': total}
+
+    def status(self):
+        """返回会话状态和各调度池的并发情况，供健康检查使用（Web工作进程返回驱动进程发布的状态）"""
+        if Config.SPARK_ROLE == 'client':
+            return self._published()
+        with self._lock:
+            return {
+                'state': self._state,
+                'error': self._error,
+                'warmup_seconds': self._warmup_seconds,
+                'max_concurrent_jobs': self.max_concurrent,
+                'pool_limits': dict(self.pool_limits),
+                'profile': Config.SPARK_PROFILE,
+                'pool_profiles': dict(Config.SPARK_POOL_PROFILES),
+                'active_jobs': dict(self._active),
+            }
+
+    def _publish(self):
+        """驱动进程把会话状态写入Config.SPARK_STATUS_FILE"""
+        if Config.SPARK_ROLE != 'driver':
+            return
+        status = dict(self.status(), pid=os.getpid(), updated=time.time())
+        path = Config.SPARK_STATUS_FILE
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(status, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"发布Spark会话状态失败: {str(e)}")
+
+    def _published(self):
+        try:
+            with open(Config.SPARK_STATUS_FILE, 'r', encoding='utf-8') as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            status = {'state': self.COLD, 'error': '驱动进程尚未发布Spark会话状态', 'warmup_seconds': None,
+                      'max_concurrent_jobs': self.max_concurrent, 'pool_limits': dict(self.pool_limits),
+                      'profile': Config.SPARK_PROFILE, 'pool_profiles': dict(Config.SPARK_POOL_PROFILES),
+                      'active_jobs': {}}
+        status['role'] = Config.SPARK_ROLE
+        return status
+
+    def stop(self):
+        """关闭Spark会话"""
+        with self._lock:
+            spark = self._spark
+            self._spark = None
+            self._profiled.clear()
+            self._state = self.COLD
+            self._ready.clear()
+        self._publish()
+        if spark is not None:
+            spark.stop()
+            print("Spark会话已关闭")
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_spark_manager():
+    """返回进程内共享的Spark会话管理器"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = SparkSessionManager()
+        return _manager
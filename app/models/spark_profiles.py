@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+自适应的Spark配置档案
+
+按主机的CPU核数、内存和作业的输入数据量计算Spark配置，代替写死的2g内存和
+默认200个shuffle分区。提供三个命名档案：
+    interactive  交互式请求，小数据、低延迟（默认）
+    batch        批量分析，内存和并行度都放开
+    low_memory   内存紧张的机器，限制内存、核数和Arrow批大小
+
+会话级配置（内存、master核数）在创建会话时生效；SQL运行时配置（shuffle分区、
+广播阈值、Arrow）可以按作业设置，由SparkSessionManager为每种配置派生子会话。
+"""
+
+import math
+import os
+
+from config import Config
+
+MB = 1024 * 1024
+
+PROFILES = {
+    'interactive': {
+        'description': '交互式请求：小数据、低延迟',
+        'memory_fraction': 0.25,      # 驱动程序内存占主机内存的比例
+        'min_memory_mb': 1024,
+        'max_memory_mb': 4096,
+        'max_cores': None,            # None表示使用全部核心
+        'partition_bytes': 32 * MB,   # 每个shuffle分区的目标数据量
+        'partitions_per_core': 1,     # shuffle分区数上限 = 核数 × 该值
+        'broadcast_mb': 32,
+        'arrow': True,
+        'arrow_batch_records': 10000,
+    },
+    'batch': {
+        'description': '批量分析：放开内存和并行度',
+        'memory_fraction': 0.5,
+        'min_memory_mb': 2048,
+        'max_memory_mb': 16384,
+        'max_cores': None,
+        'partition_bytes': 128 * MB,
+        'partitions_per_core': 4,
+        'broadcast_mb': 64,
+        'arrow': True,
+        'arrow_batch_records': 10000,
+    },
+    'low_memory': {
+        'description': '低内存机器：限制内存、核数和Arrow批大小',
+        'memory_fraction': 0.15,
+        'min_memory_mb': 512,
+        'max_memory_mb': 1024,
+        'max_cores': 2,
+        'partition_bytes': 16 * MB,
+        'partitions_per_core': 2,
+        'broadcast_mb': 4,
+        'arrow': True,
+        'arrow_batch_records': 1000,
+    },
+}
+
+# 可以按作业修改的SQL运行时配置项
+RUNTIME_KEYS = (
+    'spark.sql.shuffle.partitions',
+    'spark.sql.autoBroadcastJoinThreshold',
+    'spark.sql.execution.arrow.pyspark.enabled',
+    'spark.sql.execution.arrow.pyspark.fallback.enabled',
+    'spark.sql.execution.arrow.maxRecordsPerBatch',
+    'spark.sql.adaptive.enabled',
+    'spark.sql.adaptive.coalescePartitions.enabled',
+)
+
+_host = None
+
+
+def _total_memory_mb():
+    """主机物理内存（MB），无法获取时返回None"""
+    try:
+        import psutil
+        return psutil.virtual_memory().total // MB
+    except ImportError:
+        pass
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // MB
+    except (AttributeError, ValueError, OSError):
+        pass
+    if os.name == 'nt':
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong),
+                        ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                        ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                        ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                        ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys // MB
+    return None
+
+
+def host_resources():
+    """主机的CPU核数和内存（MB），取不到内存时按8GB估计"""
+    global _host
+    if _host is None:
+        _host = {'cores': os.cpu_count() or 1, 'memory_mb': _total_memory_mb() or 8192}
+    return dict(_host)
+
+
+def get_profile(name=None):
+    """按名称返回配置档案，未指定时使用Config.SPARK_PROFILE"""
+    name = name or Config.SPARK_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"未知的Spark配置档案: {name}（可选: {', '.join(PROFILES)}）")
+    return name, PROFILES[name]
+
+
+def profile_cores(profile=None, host=None):
+    """档案可使用的核数"""
+    _, settings = get_profile(profile)
+    cores = (host or host_resources())['cores']
+    return max(1, min(cores, settings['max_cores'] or cores))
+
+
+def shuffle_partitions(profile=None, input_bytes=None, host=None):
+    """
+    按输入数据量计算shuffle分区数
+
+    每个分区处理约partition_bytes的数据，至少1个，至多 核数×partitions_per_core；
+    不知道输入大小时取核数。31行的省份表只需要1个分区，而不是默认的200个。
+    """
+    _, settings = get_profile(profile)
+    cores = profile_cores(profile, host)
+    if input_bytes is None:
+        return cores
+    wanted = math.ceil(max(input_bytes, 1) / settings['partition_bytes'])
+    return max(1, min(wanted, cores * settings['partitions_per_core']))
+
+
+def _memory_string(mb):
+    return f"{mb // 1024}g" if mb % 1024 == 0 else f"{mb}m"
+
+
+def session_conf(profile=None, host=None):
+    """
+    创建会话时使用的配置，返回(master, 配置字典)
+
+    集群模式（master不是local）时不修改master，只调整内存和SQL配置。
+    """
+    name, settings = get_profile(profile)
+    host = host or host_resources()
+    cores = profile_cores(name, host)
+    memory_mb = int(host['memory_mb'] * settings['memory_fraction'])
+    memory_mb = max(settings['min_memory_mb'], min(memory_mb, settings['max_memory_mb']))
+    memory_mb = memory_mb // 256 * 256
+
+    master = Config.SPARK_MASTER
+    if master.startswith('local'):
+        master = f"local[{cores}]"
+    conf = {
+        'spark.driver.memory': _memory_string(memory_mb),
+        'spark.executor.memory': _memory_string(memory_mb),
+        'spark.driver.maxResultSize': _memory_string(max(256, memory_mb // 2 // 256 * 256)),
+        'spark.python.worker.memory': _memory_string(max(256, memory_mb // 4 // 256 * 256)),
+        'spark.default.parallelism': str(cores),
+    }
+    conf.update(runtime_conf(name, host=host))
+    return master, conf
+
+
+def runtime_conf(profile=None, input_bytes=None, host=None):
+    """可以按作业设置的SQL运行时配置"""
+    _, settings = get_profile(profile)
+    return {
+        'spark.sql.shuffle.partitions': str(shuffle_partitions(profile, input_bytes, host)),
+        'spark.sql.autoBroadcastJoinThreshold': str(settings['broadcast_mb'] * MB),
+        'spark.sql.execution.arrow.pyspark.enabled': str(settings['arrow']).lower(),
+        'spark.sql.execution.arrow.pyspark.fallback.enabled': 'true',
+        'spark.sql.execution.arrow.maxRecordsPerBatch': str(settings['arrow_batch_records']),
+        'spark.sql.adaptive.enabled': 'true',
+        'spark.sql.adaptive.coalescePartitions.enabled': 'true',
+    }
+
+
+def estimate_bytes(df):
+    """估计作业输入的数据量（字节），pandas DataFrame按内存占用计算，其他返回None"""
+    memory_usage = getattr(df, 'memory_usage', None)
+    if callable(memory_usage):
+        return int(memory_usage(index=True).sum())
+    return None
+
+
+def describe_profiles(host=None):
+    """列出各档案在当前主机上的会话配置，供命令行和健康检查查看"""
+    host = host or host_resources()
+    result = {}
+    for name, settings in PROFILES.items():
+        master, conf = session_conf(name, host)
+        result[name] = {'description': settings['description'], 'master': master, 'conf': conf}
+    return {'host': host, 'default': Config.SPARK_PROFILE, 'profiles': result}
+
+
+if __name__ == '__main__':
+    import json
+
+    print(json.dumps(describe_profiles(), ensure_ascii=False, indent=2))
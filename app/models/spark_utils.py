@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Spark工具：会话初始化和Excel读取
+
+Excel数据优先读取Parquet副本；没有本地源文件时用流式读取器在driver上解析（指标工作簿只有几十行），
+再以Arrow批量转为Spark DataFrame，解析失败或Config.EXCEL_READER不是stream时才用spark-excel（POI）。
+"""
+
+import os
+import shutil
+import tempfile
+from urllib.parse import urlparse
+
+from pyspark.sql import SparkSession
+
+from config import Config
+from app.models.jar_provisioner import spark_jars
+from app.models.parquet_cache import read_spark_cached
+from app.models.spark_profiles import session_conf
+
+
+def init_spark_session(profile=None, excel=True):
+    """
+    初始化Spark会话，加载读取Excel所需的JAR文件，失败时返回None
+
+    profile为配置档案名称（默认Config.SPARK_PROFILE），excel=False时不加载spark-excel
+    """
+    try:
+        master, conf = Config.SPARK_MASTER, dict(Config.SPARK_CONF)
+        profile = profile or Config.SPARK_PROFILE
+        if profile:
+            master, profile_conf = session_conf(profile)
+            conf.update(profile_conf)
+            print(f"使用Spark配置档案: {profile} ({master}, 内存 {conf['spark.driver.memory']}, "
+                  f"shuffle分区 {conf['spark.sql.shuffle.partitions']})")
+        builder = SparkSession.builder \
+            .master(master) \
+            .appName(Config.SPARK_APP_NAME)
+        for key, value in conf.items():
+            builder = builder.config(key, value)
+
+        if excel:
+            # 使用本地缓存的JAR，启动时不做Ivy依赖解析
+            jars = spark_jars()
+            if jars:
+                builder = builder.config('spark.jars', ','.join(jars))
+            else:
+                print("spark-excel依赖JAR未准备好，请先运行 python download_jars.py；"
+                      "本次启动不加载spark-excel，Excel通过Parquet缓存读取")
+
+        spark = builder.getOrCreate()
+        spark.sparkContext.setLogLevel('WARN')
+        print("Spark会话初始化成功")
+        return spark
+    except Exception as e:
+        print(f"Spark会话初始化失败: {str(e)}")
+        return None
+
+
+def read_excel_with_poi(spark, hdfs_path, sheet_name=None):
+    """通过spark-excel（Apache POI）直接解析HDFS上的Excel文件"""
+    reader = spark.read.format('com.crealytics.spark.excel') \
+        .option('header', 'true') \
+        .option('inferSchema', 'true')
+    if sheet_name:
+        reader = reader.option('dataAddress', f"'{sheet_name}'!A1")
+    return reader.load(hdfs_path)
+
+
+def read_excel_streaming(spark, path, sheet_name=None):
+    """用流式读取器解析Excel文件（本地路径或HDFS路径，HDFS上的文件先通过WebHDFS下载）"""
+    from app.models.arrow_bridge import to_spark
+    from app.models.parquet_cache import _normalize_frame
+    from app.models.xlsx_reader import read_frame
+
+    sheet_name = 0 if sheet_name is None else sheet_name
+    parsed = urlparse(str(path))
+    if parsed.scheme in ('', 'file') and os.path.exists(parsed.path or path):
+        return to_spark(spark, _normalize_frame(read_frame(parsed.path or path, sheet_name)))
+
+    from app.models.hdfs_sync import create_client
+    directory = tempfile.mkdtemp(prefix='excel-')
+    try:
+        local_path = os.path.join(directory, os.path.basename(parsed.path))
+        create_client().download(parsed.path, local_path, overwrite=True)
+        return to_spark(spark, _normalize_frame(read_frame(local_path, sheet_name)))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def read_excel_from_hdfs(spark, hdfs_path, sheet_name=None, use_cache=True):
+    """从HDFS读取Excel文件，优先使用新鲜的Parquet副本，其次用流式读取器，最后才用POI解析"""
+    if use_cache:
+        df = read_spark_cached(spark, hdfs_path, sheet_name)
+        if df is not None:
+            return df
+    if Config.EXCEL_READER == 'stream':
+        try:
+            return read_excel_streaming(spark, hdfs_path, sheet_name)
+        except Exception as e:
+            print(f"流式读取Excel失败，改用spark-excel: {str(e)}")
+    return read_excel_with_poi(spark, hdfs_path, sheet_name)
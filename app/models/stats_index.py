@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据集统计索引
+
+每个数据集（工作表）在Config.STATS_INDEX_DIR下有一个JSON索引文件，包含:
+    columns: 各数值列的基本统计（count, missing, mean, std, min, max）
+    years:   整理成 省份×年份 后各年份的汇总（省份数、合计、均值等）和各省份的同比增长率
+
+列统计按Config.STATS_INDEX_CHUNK_ROWS行分块保存可合并的矩（计数、均值、二阶矩、最值）
+及每块的内容哈希，年份汇总按年份列保存矩和哈希，索引同时记录行数、分块大小和省份。
+数据集更新后重新哈希全部块和年份（哈希比计算矩便宜得多），只有哈希与上一版相同的块、
+本年和上一年都没有变化的年份沿用，其余（追加、修订的部分）重新计算后合并。
+数据集版本未变时直接返回内存或磁盘上的索引，不读取数据；版本按源文件的修改时间和大小缓存。
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from app.models.metrics import count, timed
+from app.models.parquet_cache import read_excel_cached
+from app.models.reshape import to_province_year
+from app.models.result_cache import dataset_fingerprint, resolve_dataset
+
+INDEX_FORMAT = 2
+_NAME_PATTERN = re.compile(r'[^0-9A-Za-z_.一-鿿-]')
+
+
+def new_moments():
+    return {'count': 0, 'missing': 0, 'mean': 0.0, 'm2': 0.0, 'min': float('inf'), 'max': float('-inf')}
+
+
+def add_values(acc, values):
+    """把一批数值合并进累计矩（Chan等人的并行方差算法），NaN计为缺失"""
+    values = np.asarray(values, dtype=float)
+    valid = values[~np.isnan(values)]
+    batch = new_moments()
+    batch['missing'] = int(len(values) - len(valid))
+    if len(valid):
+        batch['count'] = int(len(valid))
+        batch['mean'] = float(valid.mean())
+        batch['m2'] = float(((valid - batch['mean']) ** 2).sum())
+        batch['min'] = float(valid.min())
+        batch['max'] = float(valid.max())
+    combine(acc, batch)
+
+
+def combine(acc, other):
+    """把另一组累计矩合并进acc"""
+    acc['missing'] += other['missing']
+    n = other['count']
+    if n == 0:
+        return acc
+    total = acc['count'] + n
+    delta = other['mean'] - acc['mean']
+    acc['mean'] += delta * n / total
+    acc['m2'] += other['m2'] + delta ** 2 * acc['count'] * n / total
+    acc['count'] = total
+    acc['min'] = min(acc['min'], other['min'])
+    acc['max'] = max(acc['max'], other['max'])
+    return acc
+
+
+def finalize(acc):
+    """累计矩转换为 {count, missing, mean, std, min, max}（与PandasEngine.describe相同）"""
+    n = acc['count']
+    return {
+        'count': n,
+        'missing': acc['missing'],
+        'mean': acc['mean'] if n else None,
+        'std': float(np.sqrt(acc['m2'] / (n - 1))) if n > 1 else None,
+        'min': acc['min'] if n else None,
+        'max': acc['max'] if n else None,
+    }
+
+
+def _digest(values, labels=None):
+    """一组数值（及其行标签）的内容哈希"""
+    digest = hashlib.md5(np.ascontiguousarray(pd.util.hash_array(np.asarray(values))).tobytes())
+    if labels is not None:
+        digest.update(np.ascontiguousarray(pd.util.hash_array(np.asarray(labels, dtype=object))).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def _json_number(value):
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _signature(path):
+    """文件的 (修改时间, 大小)，不存在时为None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class StatsIndex:
+    """按数据集维护的统计索引"""
+
+    def __init__(self, index_dir=None, chunk_rows=None):
+        self.index_dir = index_dir or Config.STATS_INDEX_DIR
+        self.chunk_rows = chunk_rows or Config.STATS_INDEX_CHUNK_ROWS
+        self._memory = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._dataset_locks = {}
+
+    def _path(self, dataset, sheet_name):
+        name = _NAME_PATTERN.sub('_', f"{os.path.splitext(dataset)[0]}-{sheet_name}")
+        return os.path.join(self.index_dir, f"{name}.json")
+
+    def _dataset_lock(self, key):
+        with self._lock:
+            return self._dataset_locks.setdefault(key, threading.Lock())
+
+    def _load(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return index if index.get('format') == INDEX_FORMAT else None
+
+    def _save(self, path, index):
+        os.makedirs(self.index_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _version(self, source):
+        """数据集版本；源文件和HDFS同步清单的修改时间、大小都没变时沿用上次的结果，不读取清单"""
+        signature = (_signature(source), _signature(Config.HDFS_SYNC_MANIFEST))
+        with self._lock:
+            cached = self._versions.get(source)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        version = dataset_fingerprint(source)
+        with self._lock:
+            self._versions[source] = (signature, version)
+        return version
+
+    def get(self, dataset, sheet_name=0):
+        """返回数据集的索引，数据集版本变化时先增量刷新"""
+        source = resolve_dataset(dataset)
+        dataset = os.path.basename(source)
+        version = self._version(source)
+        key = (dataset, str(sheet_name))
+        with self._lock:
+            index = self._memory.get(key)
+        if index is not None and index['version'] == version:
+            return index
+
+        with self._dataset_lock(key):
+            path = self._path(dataset, sheet_name)
+            index = self._load(path)
+            if index is None or index['version'] != version:
+                index = self._refresh(source, sheet_name, version, index)
+                self._save(path, index)
+            with self._lock:
+                self._memory[key] = index
+            return index
+
+    def _column_chunks(self, values, previous, column):
+        """
+        一个数值列的分块矩，返回 (块列表, 重新计算的块数, 沿用的块数)
+
+        每块都重新哈希，与上一版同一位置的块哈希相同时沿用其矩，否则重新计算
+        （上一版没装满的最后一块追加了行后哈希不同，也会重新计算）
+        """
+        old_chunks = previous['columns'].get(column, {}).get('chunks', []) if previous else []
+        chunks, reused = [], 0
+        for i, start in enumerate(range(0, len(values), self.chunk_rows)):
+            chunk = values[start:start + self.chunk_rows]
+            digest = _digest(chunk)
+            if i < len(old_chunks) and old_chunks[i]['hash'] == digest:
+                chunks.append(old_chunks[i])
+                reused += 1
+                continue
+            acc = new_moments()
+            add_values(acc, chunk)
+            chunks.append({'hash': digest, 'moments': acc})
+        return chunks, len(chunks) - reused, reused
+
+    @staticmethod
+    def _year_entry(frame, year, digest):
+        """一个年份的汇总矩、合计和各省份相对上一年的增长率"""
+        values = frame[year].to_numpy(dtype=float)
+        acc = new_moments()
+        add_values(acc, values)
+        growth = {}
+        if year - 1 in frame.columns:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rates = values / frame[year - 1].to_numpy(dtype=float) - 1
+            growth = {province: _json_number(rate) for province, rate in zip(frame.index, rates)
+                      if not np.isnan(rate)}
+        return {
+            'hash': digest,
+            'moments': acc,
+            'total': _json_number(np.nansum(values)) if acc['count'] else None,
+            'growth': growth,
+        }
+
+    @staticmethod
+    def _reusable_years(hashes, previous):
+        """
+        上一版中可以直接沿用的年份
+
+        哈希包含省份标签和数值；本年的哈希相同、上一年也没有变化（增长率相同）时沿用
+        """
+        old = previous['years'] if previous else {}
+
+        def unchanged(year):
+            entry = old.get(str(year))
+            return entry['hash'] == hashes[year] if year in hashes else entry is None
+
+        return {str(year): old[str(year)] for year in hashes
+                if str(year) in old and unchanged(year) and unchanged(year - 1)}
+
+    @timed('stats_index_refresh')
+    def _refresh(self, source, sheet_name, version, previous):
+        """由上一版索引增量生成新索引，只计算追加的行和年份"""
+        dataset = os.path.basename(source)
+        df = read_excel_cached(source, sheet_name)
+        df.columns = [str(column) for column in df.columns]
+        if previous and previous.get('chunk_rows') != self.chunk_rows:
+            previous = None
+        work = {'computed': 0, 'reused': 0}
+
+        columns = {}
+        for column in df.select_dtypes('number').columns:
+            chunks, computed, reused = self._column_chunks(df[column].to_numpy(dtype=float), previous, column)
+            work['computed'] += computed
+            work['reused'] += reused
+            total = new_moments()
+            for chunk in chunks:
+                combine(total, chunk['moments'])
+            columns[column] = {'chunks': chunks, 'moments': total}
+
+        frame = to_province_year(df) if len(df.columns) > 1 else pd.DataFrame()
+        hashes = {year: _digest(frame[year].to_numpy(dtype=float), frame.index) for year in frame.columns}
+        years = self._reusable_years(hashes, previous)
+        work['reused'] += len(years)
+        for year in frame.columns:
+            if str(year) not in years:
+                years[str(year)] = self._year_entry(frame, year, hashes[year])
+                work['computed'] += 1
+
+        count('stats_index_chunks_total', work['computed'], result='computed')
+        count('stats_index_chunks_total', work['reused'], result='reused')
+        print(f"统计索引 {dataset}: 重新计算 {work['computed']} 块，沿用 {work['reused']} 块")
+        return {'format': INDEX_FORMAT, 'dataset': dataset, 'sheet': str(sheet_name), 'version': version,
+                'rows': int(len(df)), 'chunk_rows': self.chunk_rows,
+                'provinces': [str(province) for province in frame.index], 'columns': columns,
+                'years': {key: years[key] for key in sorted(years, key=int)}, 'refresh': work}
+
+    def describe(self, dataset, columns=None, sheet_name=0):
+        """基本统计信息，结构与PandasEngine.describe一致；columns中有不存在的列时抛出KeyError"""
+        index = self.get(dataset, sheet_name)
+        columns = [str(column) for column in columns] if columns else list(index['columns'])
+        missing = [column for column in columns if column not in index['columns']]
+        if missing:
+            raise KeyError(', '.join(missing))
+        return {'engine': 'index', 'rows': index['rows'],
+                'columns': {column: finalize(index['columns'][column]['moments']) for column in columns}}
+
+    def year_summary(self, dataset, sheet_name=0):
+        """各年份的汇总：{年份: {count, missing, mean, std, min, max, total}}"""
+        index = self.get(dataset, sheet_name)
+        return {int(year): dict(finalize(entry['moments']), total=entry['total'])
+                for year, entry in sorted(index['years'].items())}
+
+    def growth(self, dataset, sheet_name=0):
+        """各省份各年份的同比增长率：{年份: {省份: 增长率}}"""
+        index = self.get(dataset, sheet_name)
+        return {int(year): entry['growth'] for year, entry in sorted(index['years'].items()) if entry['growth']}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_stats_index():
+    """返回进程内共享的统计索引"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = StatsIndex()
+        return _index
@@ -0,0 +1,391 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+上传文件的流式接收和后台处理
+
+上传内容按块写入暂存目录（边写边计算SHA-256，超过MAX_CONTENT_LENGTH立即中止），
+请求随即返回任务编号。校验、宽表转长表、缺失值清理和推送HDFS在后台线程池中
+依次执行，前端轮询任务状态；大文件或多工作表的工作簿不会占住Flask工作线程。
+与已有数据集同名的上传默认拒绝（UploadConflict），指定replace时才覆盖原数据集。
+任务状态同时写入Config.UPLOAD_STATUS_DIR，多进程部署时轮询请求落到其他工作进程也能查到。
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from app.models.metrics import registry
+from app.models.parquet_cache import ensure_parquet, excel_sheet_names, find_source, parse_excel
+from app.models.stats_index import get_stats_index
+from app.models.reshape import drop_empty, melt_province_year, to_province_year
+
+
+class UploadError(ValueError):
+    """上传文件不符合要求"""
+
+
+class UploadTooLarge(UploadError):
+    """上传文件超过大小上限"""
+
+
+class UploadConflict(UploadError):
+    """已有同名数据集，且没有指定覆盖"""
+
+
+def clean_filename(filename):
+    """保留中文的文件名清理：去掉路径部分和控制字符，并检查扩展名"""
+    name = os.path.basename(str(filename or '').replace('\\', '/')).strip()
+    name = ''.join(ch for ch in name if ch.isprintable() and ch not in '<>:"|?*')
+    if not name or name.startswith('.') or name.startswith('~$'):
+        raise UploadError(f"无效的文件名: {filename}")
+    extension = name.rsplit('.', 1)[-1].lower() if '.' in name else ''
+    if extension not in Config.ALLOWED_EXTENSIONS:
+        raise UploadError(f"不支持的文件类型: {extension or '无扩展名'}，"
+                          f"只允许 {', '.join(sorted(Config.ALLOWED_EXTENSIONS))}")
+    return name
+
+
+def save_stream(stream, job_id, max_bytes=None, chunk_size=None, extension=''):
+    """把上传流按块写入暂存文件，返回(暂存路径, 字节数, SHA-256)；extension保留原扩展名，读取器按它选择解析方式"""
+    max_bytes = max_bytes or Config.MAX_CONTENT_LENGTH
+    chunk_size = chunk_size or Config.UPLOAD_CHUNK_SIZE
+    os.makedirs(Config.UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(Config.UPLOAD_DIR, f"{job_id}.part{extension}")
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, 'wb') as f:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"文件超过大小上限 {max_bytes // (1024 * 1024)}MB")
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        _remove(path)
+        raise
+    if size == 0:
+        _remove(path)
+        raise UploadError('上传的文件为空')
+    return path, size, digest.hexdigest()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _place(path, target, replace=False):
+    """
+    把暂存文件放到target；不覆盖时用硬链接，target已存在（包括其他进程刚放入的）时抛出UploadConflict
+
+    覆盖已有文件时先把原文件链接（不支持时复制）为备份，返回备份路径，否则返回None
+    """
+    if replace:
+        backup = None
+        if os.path.exists(target):
+            backup = f"{target}.{os.getpid()}-{threading.get_ident()}.bak"
+            try:
+                os.link(target, backup)
+            except OSError:
+                shutil.copy2(target, backup)
+        os.replace(path, target)
+        return backup
+    try:
+        os.link(path, target)
+    except FileExistsError:
+        raise UploadConflict(f"数据集已存在: {os.path.basename(target)}")
+    except OSError:
+        # 文件系统不支持硬链接时退回先检查再移动
+        if os.path.exists(target):
+            raise UploadConflict(f"数据集已存在: {os.path.basename(target)}")
+        os.replace(path, target)
+        return None
+    _remove(path)
+    return None
+
+
+def _unplace(target, backup):
+    """撤销_place：有备份时恢复原文件，否则删除放入的文件"""
+    if backup is not None:
+        os.replace(backup, target)
+    else:
+        _remove(target)
+
+
+def _write_table(df, path):
+    """写入Parquet，未安装pyarrow时写CSV，返回实际路径"""
+    try:
+        df.to_parquet(path, index=False)
+        return path
+    except ImportError:
+        path = os.path.splitext(path)[0] + '.csv'
+        df.to_csv(path, index=False, encoding='utf-8-sig')
+        return path
+
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadJobQueue:
+    """上传处理任务队列"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(self, workers=None, syncer=None):
+        self.workers = workers or Config.UPLOAD_WORKERS
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='upload')
+        self._jobs = OrderedDict()
+        self._started = {}
+        self._lock = threading.Lock()
+        self._syncer = syncer
+
+    def submit(self, stream, filename, replace=False):
+        """
+        接收上传流并排队处理，返回任务信息；文件不合格时抛出UploadError，
+        已有同名数据集且replace为False时抛出UploadConflict
+        """
+        filename = clean_filename(filename)
+        if not replace and find_source(filename) is not None:
+            raise UploadConflict(f"数据集已存在: {filename}，如需覆盖请指定replace")
+        job_id = uuid.uuid4().hex
+        path, size, sha256 = save_stream(stream, job_id, extension=os.path.splitext(filename)[1].lower())
+        job = {
+            'id': job_id,
+            'filename': filename,
+            'replace': bool(replace),
+            'size': size,
+            'sha256': sha256,
+            'state': self.QUEUED,
+            'stage': None,
+            'stages': {},
+            'timings': {},
+            'error': None,
+            'result': None,
+            'created': time.time(),
+            'updated': time.time(),
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > Config.UPLOAD_JOB_HISTORY:
+                self._jobs.popitem(last=False)
+        self._save(job_id)
+        self._prune_saved()
+        self._executor.submit(self._run, job_id, path)
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """返回任务状态的副本，不存在时返回None（本进程没有时读取其他进程保存的状态）"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return self._copy(job)
+        return self._load(job_id)
+
+    def list(self):
+        with self._lock:
+            jobs = {job['id']: self._copy(job) for job in self._jobs.values()}
+        for name in self._saved_names():
+            job_id = name[:-len('.json')]
+            if job_id not in jobs:
+                job = self._load(job_id)
+                if job is not None:
+                    jobs[job_id] = job
+        return sorted(jobs.values(), key=lambda job: job['created'], reverse=True)
+
+    @staticmethod
+    def _saved_names():
+        try:
+            return [name for name in os.listdir(Config.UPLOAD_STATUS_DIR) if name.endswith('.json')]
+        except OSError:
+            return []
+
+    def _save(self, job_id):
+        """把任务状态写入状态文件"""
+        job = self.get(job_id)
+        if job is None:
+            return
+        path = os.path.join(Config.UPLOAD_STATUS_DIR, f"{job_id}.json")
+        tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(Config.UPLOAD_STATUS_DIR, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(job, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"保存上传任务状态失败 {job_id}: {str(e)}")
+
+    @staticmethod
+    def _load(job_id):
+        if not JOB_ID_PATTERN.match(str(job_id)):
+            return None
+        try:
+            with open(os.path.join(Config.UPLOAD_STATUS_DIR, f"{job_id}.json"), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _prune_saved(self):
+        """只保留最近Config.UPLOAD_JOB_HISTORY个状态文件"""
+        paths = [os.path.join(Config.UPLOAD_STATUS_DIR, name) for name in self._saved_names()]
+        if len(paths) <= Config.UPLOAD_JOB_HISTORY:
+            return
+        paths.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+        for path in paths[:len(paths) - Config.UPLOAD_JOB_HISTORY]:
+            _remove(path)
+
+    @staticmethod
+    def _copy(job):
+        return {**job, 'stages': dict(job['stages']), 'timings': dict(job['timings'])}
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+                job['updated'] = time.time()
+        self._save(job_id)
+
+    def _stage(self, job_id, stage, detail=None):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                if detail is None:
+                    job['stage'] = stage
+                    job['stages'][stage] = 'running'
+                    self._started[(job_id, stage)] = time.perf_counter()
+                else:
+                    job['stages'][stage] = detail
+                    elapsed = time.perf_counter() - self._started.pop((job_id, stage))
+                    job['timings'][stage] = round(elapsed, 3)
+                    registry.observe('stage_seconds', elapsed, stage=f'upload_{stage}')
+                job['updated'] = time.time()
+        self._save(job_id)
+
+    def _run(self, job_id, path):
+        self._update(job_id, state=self.RUNNING)
+        try:
+            result = self._process(job_id, path)
+        except Exception as e:
+            self._update(job_id, state=self.FAILED, error=str(e))
+            print(f"处理上传文件失败 {job_id}: {str(e)}")
+        else:
+            self._update(job_id, state=self.DONE, stage=None, result=result)
+        finally:
+            _remove(path)
+
+    def _process(self, job_id, path):
+        job = self.get(job_id)
+        filename = job['filename']
+
+        # 1. 校验：能否打开、每个工作表是否能识别出 省份×年份 的数值表
+        self._stage(job_id, 'validate')
+        # 与数据集的Parquet转换使用同一个读取器（流式读取器，无法解析时退回pd.read_excel）
+        sheets = {name: parse_excel(path, name) for name in excel_sheet_names(path)}
+        frames = {}
+        for name, df in sheets.items():
+            if df.empty:
+                continue
+            frame = to_province_year(df)
+            if frame.empty or frame.notna().sum().sum() == 0:
+                continue
+            frames[name] = (df, frame)
+        if not frames:
+            raise UploadError('工作簿中没有可识别的 省份×年份 数据表')
+        self._stage(job_id, 'validate', {'sheets': list(frames), 'skipped': len(sheets) - len(frames)})
+
+        # 校验通过后放入数据目录，成为可用的数据集；之后任何一步失败都撤销，
+        # 不留下处理失败的数据集（覆盖时恢复原数据集），重新上传不会因同名而冲突
+        target = os.path.join(Config.DATA_DIR, filename)
+        os.makedirs(Config.DATA_DIR, exist_ok=True)
+        backup = _place(path, target, job.get('replace', False))
+        try:
+            result = self._ingest(job_id, target, sheets, frames)
+        except BaseException:
+            _unplace(target, backup)
+            raise
+        if backup is not None:
+            _remove(backup)
+        return result
+
+    def _ingest(self, job_id, target, sheets, frames):
+        """已放入数据目录的数据集：生成Parquet缓存和统计索引，转长表、清理并推送HDFS"""
+        filename = os.path.basename(target)
+        stem = os.path.splitext(filename)[0]
+        first_sheet = next(iter(sheets))
+        for name in frames:
+            ensure_parquet(target, 0 if name == first_sheet else name)
+        # 指定覆盖已有数据集（如追加了年份）时，统计索引只重新计算变化的部分
+        if first_sheet in frames:
+            get_stats_index().get(filename)
+
+        # 2. 宽表转长表
+        self._stage(job_id, 'reshape')
+        longs = {name: melt_province_year(frame) for name, (_, frame) in frames.items()}
+        self._stage(job_id, 'reshape', {name: len(long) for name, long in longs.items()})
+
+        # 3. 缺失值清理：去掉整行/整列缺失的省份和年份，统计剩余缺失单元格
+        self._stage(job_id, 'clean')
+        os.makedirs(Config.PROCESSED_DIR, exist_ok=True)
+        outputs, cleaning = [], {}
+        for i, (name, (_, frame)) in enumerate(frames.items()):
+            cleaned = drop_empty(frame)
+            cleaning[name] = {
+                'dropped_provinces': int(len(frame) - len(cleaned)),
+                'dropped_years': int(frame.shape[1] - cleaned.shape[1]),
+                'missing_cells': int(cleaned.isna().sum().sum()),
+            }
+            suffix = f"-{i}" if len(frames) > 1 else ''
+            output = os.path.join(Config.PROCESSED_DIR, f"{stem}{suffix}-long.parquet")
+            outputs.append(_write_table(longs[name], output))
+        self._stage(job_id, 'clean', cleaning)
+
+        # 4. 推送HDFS（HDFS不可用时跳过，不影响本地使用）
+        self._stage(job_id, 'hdfs')
+        self._stage(job_id, 'hdfs', self._push(target))
+
+        return {'dataset': filename, 'outputs': [os.path.basename(output) for output in outputs]}
+
+    def _push(self, target):
+        try:
+            if self._syncer is None:
+                from app.models.hdfs_sync import HdfsSync
+                self._syncer = HdfsSync()
+            if not self._syncer.is_available():
+                return 'skipped: HDFS不可用'
+            return self._syncer.upload_file(target, f"{Config.HDFS_BASE_PATH}/{os.path.basename(target)}")
+        except Exception as e:
+            return f"failed: {str(e)}"
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_upload_queue():
+    """返回进程内共享的上传任务队列"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = UploadJobQueue()
+        return _queue
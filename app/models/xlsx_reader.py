@@ -0,0 +1,455 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+流式Excel读取器
+
+指标工作簿都是简单的网格：第一行是表头（年份或省份），第一列是标签（地区/时间），其余是数值。
+这里不构建工作簿对象模型，直接从XLSX压缩包中逐行解析工作表XML（iterparse，处理完的行立即清空），
+共享字符串表同样增量解析，省份/年份等标签字符串全部intern，多个工作簿之间共用同一个对象。
+结果直接是各列的NumPy数组（read_columns / read_frame），或按行数分批的Arrow record batch（iter_batches）。
+旧的.xls文件用xlrd逐行读取，输出相同。
+
+与pd.read_excel(header=0)的约定一致：第一个非空行为表头（空表头为"Unnamed: i"，
+重复的加".1"等后缀），中间的空行保留为缺失、末尾的空行去掉，整数值的数值列为int64，有缺失或小数的为float64，含文本的列为object，
+日期格式的单元格转为datetime64，错误值（#N/A等）和pandas默认的缺失标记文本按缺失处理。
+无法解析的文件（加密、xlsb等）抛出UnsupportedWorkbook，调用方可退回pd.read_excel。
+"""
+
+import os
+import re
+import sys
+import zipfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+_REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+_PACKAGE_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# pd.read_excel默认按缺失处理的文本
+NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+# 内置数字格式中的日期/时间格式编号（含中文区域的格式）
+_BUILTIN_DATE_FORMATS = frozenset(list(range(14, 23)) + list(range(27, 37)) + list(range(45, 48)) +
+                                  list(range(50, 59)))
+_FORMAT_LITERALS = re.compile(r'"[^"]*"|\\.|\[[^\]]*\]')
+_DATE_TOKENS = re.compile(r'[dmyhs]', re.IGNORECASE)
+_CELL_REF = re.compile(r'([A-Z]+)')
+_EXCEL_EPOCH = np.datetime64('1899-12-30', 'ns')
+
+
+class UnsupportedWorkbook(ValueError):
+    """无法用流式读取器解析的工作簿"""
+
+
+def _local(tag):
+    """去掉命名空间的标签名（同时兼容transitional和strict两种命名空间）"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def column_index(ref):
+    """单元格引用中的列号（从0开始），如 'B7' -> 1"""
+    index = 0
+    for char in _CELL_REF.match(ref).group(1):
+        index = index * 26 + ord(char) - 64
+    return index - 1
+
+
+def _excel_date(serial):
+    """Excel日期序列号转datetime64，按毫秒取整（消除浮点误差，与openpyxl一致）"""
+    return _EXCEL_EPOCH + np.timedelta64(int(round(serial * 86400000)), 'ms')
+
+
+# ---- XLSX ----
+
+def _resolve_target(target):
+    """工作簿关系中的目标路径转换为压缩包内路径"""
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return target if target.startswith('xl/') else 'xl/' + target
+
+
+def _sheets(archive):
+    """工作簿中按顺序的 (工作表名称, 关系ID) 列表"""
+    workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+    return [(sheet.get('name'), sheet.get(_REL_NS + 'id')) for sheet in workbook.iter()
+            if _local(sheet.tag) == 'sheet']
+
+
+def _sheet_path(archive, sheet_name):
+    """按工作表序号或名称找到工作表XML在压缩包中的路径"""
+    sheets = _sheets(archive)
+    if isinstance(sheet_name, int):
+        if not 0 <= sheet_name < len(sheets):
+            raise ValueError(f"工作表序号超出范围: {sheet_name}（共 {len(sheets)} 个）")
+        rel_id = sheets[sheet_name][1]
+    else:
+        matches = [rel for name, rel in sheets if name == str(sheet_name)]
+        if not matches:
+            raise ValueError(f"工作表不存在: {sheet_name}")
+        rel_id = matches[0]
+    rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    for rel in rels.iter(_PACKAGE_REL_NS + 'Relationship'):
+        if rel.get('Id') == rel_id:
+            return _resolve_target(rel.get('Target'))
+    raise UnsupportedWorkbook(f"找不到工作表 {sheet_name} 对应的XML")
+
+
+def _shared_strings(archive):
+    """增量解析共享字符串表，返回intern后的字符串列表（不含拼音注释）"""
+    if 'xl/sharedStrings.xml' not in archive.namelist():
+        return []
+    strings = []
+    with archive.open('xl/sharedStrings.xml') as f:
+        for _, element in ET.iterparse(f):
+            if _local(element.tag) != 'si':
+                continue
+            parts = []
+            for child in element:
+                name = _local(child.tag)
+                if name == 't':
+                    parts.append(child.text or '')
+                elif name == 'r':
+                    parts.extend(t.text or '' for t in child if _local(t.tag) == 't')
+            strings.append(sys.intern(''.join(parts)))
+            element.clear()
+    return strings
+
+
+def _date_styles(archive):
+    """日期格式的单元格样式序号集合"""
+    if 'xl/styles.xml' not in archive.namelist():
+        return frozenset()
+    styles = ET.fromstring(archive.read('xl/styles.xml'))
+    custom = {}
+    cell_formats = []
+    for element in styles:
+        name = _local(element.tag)
+        if name == 'numFmts':
+            for fmt in element:
+                code = _FORMAT_LITERALS.sub('', fmt.get('formatCode', ''))
+                custom[int(fmt.get('numFmtId'))] = bool(_DATE_TOKENS.search(code))
+        elif name == 'cellXfs':
+            cell_formats = [int(xf.get('numFmtId', 0)) for xf in element]
+    return frozenset(i for i, fmt in enumerate(cell_formats)
+                     if custom.get(fmt, fmt in _BUILTIN_DATE_FORMATS))
+
+
+def _inline_text(cell):
+    return sys.intern(''.join(t.text or '' for t in cell.iter() if _local(t.tag) == 't'))
+
+
+def _iter_xlsx_rows(path, sheet_name):
+    """逐行产出单元格值列表（缺少的单元格为None），每行处理完立即清空"""
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as e:
+        raise UnsupportedWorkbook(f"不是有效的XLSX文件（可能已加密）: {os.path.basename(path)}") from e
+    with archive:
+        try:
+            sheet_path = _sheet_path(archive, sheet_name)
+        except KeyError as e:
+            raise UnsupportedWorkbook(f"缺少工作簿结构: {str(e)}") from e
+        strings = _shared_strings(archive)
+        dates = _date_styles(archive)
+        columns = {}  # 单元格引用中的列字母 -> 列号
+        row_tag = v_tag = None
+        next_row = 1
+        with archive.open(sheet_path) as f:
+            # 只处理end事件：每个单元格只经过一次Python循环
+            for _, element in ET.iterparse(f):
+                tag = element.tag
+                if row_tag is None:
+                    namespace = tag[:tag.rfind('}') + 1]
+                    row_tag, v_tag = namespace + 'row', namespace + 'v'
+                if tag != row_tag:
+                    continue
+                # 没有任何单元格的行在XML中省略，按行号补上空行
+                number = int(element.get('r', next_row))
+                for _ in range(number - next_row):
+                    yield []
+                next_row = number + 1
+                values = []
+                for cell in element:
+                    ref = cell.get('r')
+                    if ref is not None:
+                        letters = ref.rstrip('0123456789')
+                        index = columns.get(letters)
+                        if index is None:
+                            index = columns[letters] = column_index(letters)
+                        if index > len(values):
+                            values.extend([None] * (index - len(values)))
+                    kind = cell.get('t', 'n')
+                    text = cell.findtext(v_tag)
+                    if kind == 'n':
+                        if text is None:
+                            value = None
+                        else:
+                            value = float(text)
+                            if dates and int(cell.get('s', 0)) in dates:
+                                value = _excel_date(value)
+                    elif kind == 's':
+                        value = None if text is None else strings[int(text)]
+                    elif kind == 'inlineStr':
+                        value = _inline_text(cell)
+                    elif text is None:
+                        value = None
+                    elif kind == 'str':
+                        value = sys.intern(text)
+                    elif kind == 'b':
+                        value = text == '1'
+                    elif kind == 'd':
+                        value = np.datetime64(text, 'ns')
+                    else:  # 'e' 错误值
+                        value = None
+                    values.append(value)
+                element.clear()
+                yield values
+
+
+# ---- XLS ----
+
+def _iter_xls_rows(path, sheet_name):
+    """用xlrd逐行读取旧的.xls文件，产出与XLSX相同的单元格值列表"""
+    try:
+        import xlrd
+    except ImportError as e:
+        raise UnsupportedWorkbook('读取.xls文件需要安装xlrd') from e
+    try:
+        book = xlrd.open_workbook(path, on_demand=True)
+    except xlrd.XLRDError as e:
+        raise UnsupportedWorkbook(f"无法解析.xls文件: {str(e)}") from e
+    try:
+        if isinstance(sheet_name, int):
+            if not 0 <= sheet_name < book.nsheets:
+                raise ValueError(f"工作表序号超出范围: {sheet_name}（共 {book.nsheets} 个）")
+            sheet = book.sheet_by_index(sheet_name)
+        else:
+            try:
+                sheet = book.sheet_by_name(str(sheet_name))
+            except xlrd.XLRDError:
+                raise ValueError(f"工作表不存在: {sheet_name}")
+        for r in range(sheet.nrows):
+            values = []
+            for kind, value in zip(sheet.row_types(r), sheet.row_values(r)):
+                if kind == xlrd.XL_CELL_NUMBER:
+                    values.append(float(value))
+                elif kind == xlrd.XL_CELL_TEXT:
+                    values.append(sys.intern(value))
+                elif kind == xlrd.XL_CELL_DATE:
+                    values.append(np.datetime64(xlrd.xldate_as_datetime(value, book.datemode), 'ns'))
+                elif kind == xlrd.XL_CELL_BOOLEAN:
+                    values.append(bool(value))
+                else:  # 空单元格、错误值
+                    values.append(None)
+            yield values
+    finally:
+        book.release_resources()
+
+
+def sheet_names(path):
+    """工作簿中按顺序的工作表名称，无法解析时抛出UnsupportedWorkbook"""
+    if str(path).lower().endswith('.xls'):
+        try:
+            import xlrd
+        except ImportError as e:
+            raise UnsupportedWorkbook('读取.xls文件需要安装xlrd') from e
+        try:
+            book = xlrd.open_workbook(path, on_demand=True)
+        except xlrd.XLRDError as e:
+            raise UnsupportedWorkbook(f"无法解析.xls文件: {str(e)}") from e
+        try:
+            return book.sheet_names()
+        finally:
+            book.release_resources()
+    try:
+        with zipfile.ZipFile(path) as archive:
+            return [name for name, _ in _sheets(archive)]
+    except zipfile.BadZipFile as e:
+        raise UnsupportedWorkbook(f"不是有效的XLSX文件（可能已加密）: {os.path.basename(path)}") from e
+    except KeyError as e:
+        raise UnsupportedWorkbook(f"缺少工作簿结构: {str(e)}") from e
+
+
+def iter_rows(path, sheet_name=0):
+    """逐行产出工作表的单元格值列表（按扩展名选择XLSX或XLS解析）"""
+    if str(path).lower().endswith('.xls'):
+        return _iter_xls_rows(path, sheet_name)
+    return _iter_xlsx_rows(path, sheet_name)
+
+
+# ---- 列组装 ----
+
+def _is_blank(values):
+    return all(value is None or value == '' for value in values)
+
+
+def _header_labels(values, width):
+    """表头单元格转换为列名：整数值的数字转为int，空表头为Unnamed: i，重复的加后缀"""
+    labels, seen = [], {}
+    for i in range(width):
+        value = values[i] if i < len(values) else None
+        if value is None or value == '':
+            label = f'Unnamed: {i}'
+        elif isinstance(value, float) and value.is_integer():
+            label = int(value)
+        elif isinstance(value, np.datetime64):
+            label = pd.Timestamp(value)
+        else:
+            label = sys.intern(value) if isinstance(value, str) else value
+        if label in seen:
+            seen[label] += 1
+            label = f'{label}.{seen[label]}'
+        else:
+            seen[label] = 0
+        labels.append(label)
+    return labels
+
+
+def _is_na(value):
+    """空单元格或缺失标记字符串（与pd.read_excel默认的na_values相同）"""
+    return value is None or (isinstance(value, str) and value in NA_STRINGS)
+
+
+def to_array(values, narrow=True):
+    """
+    一列单元格值转换为NumPy数组
+
+    只有数值时为float64（narrow=True且全部为整数、没有缺失时为int64），只有日期时为datetime64，
+    只有布尔值且没有缺失时为bool，否则为object（缺失为NaN）
+    """
+    kinds = set()
+    missing = False
+    for value in values:
+        if _is_na(value):
+            missing = True
+        else:
+            kinds.add(type(value))
+    if not kinds or kinds == {float}:
+        # 缺失标记（空字符串、NA等）与None一样转为NaN
+        array = np.array([np.nan if _is_na(value) else value for value in values], dtype=float)
+        if narrow and kinds and not missing and np.all(np.mod(array, 1) == 0) and \
+                np.all(np.abs(array) < 2 ** 53):
+            return array.astype(np.int64)
+        return array
+    if kinds == {np.datetime64}:
+        return np.array([np.datetime64('NaT') if _is_na(value) else value for value in values],
+                        dtype='datetime64[ns]')
+    if kinds == {bool} and not missing:
+        return np.array(values, dtype=bool)
+    array = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        if _is_na(value):
+            array[i] = np.nan
+        elif isinstance(value, float) and value.is_integer():
+            array[i] = int(value)
+        else:
+            array[i] = value
+    return array
+
+
+def _data_rows(rows):
+    """中间的空行保留（全部为缺失），末尾的空行去掉"""
+    blank = 0
+    for values in rows:
+        if _is_blank(values):
+            blank += 1
+            continue
+        for _ in range(blank):
+            yield []
+        blank = 0
+        yield values
+
+
+def _rows(path, sheet_name):
+    """返回 (表头, 数据行迭代器)：表头为第一个非空行，工作表为空时表头为None"""
+    rows = iter(iter_rows(path, sheet_name))
+    header = next((values for values in rows if not _is_blank(values)), None)
+    return header, _data_rows(rows)
+
+
+def read_columns(path, sheet_name=0):
+    """读取工作表，返回 (列名列表, NumPy数组列表)"""
+    header, rows = _rows(path, sheet_name)
+    if header is None:
+        return [], []
+    columns = [[] for _ in header]
+    n = 0
+    for values in rows:
+        if len(values) > len(columns):
+            columns.extend([None] * n for _ in range(len(values) - len(columns)))
+        for column, value in zip(columns, values):
+            column.append(value)
+        for column in columns[len(values):]:
+            column.append(None)
+        n += 1
+    return _header_labels(header, len(columns)), [to_array(column) for column in columns]
+
+
+def read_frame(path, sheet_name=0):
+    """读取工作表为DataFrame，作为pd.read_excel(path, sheet_name)的替代"""
+    names, arrays = read_columns(path, sheet_name)
+    return pd.DataFrame({i: array for i, array in enumerate(arrays)}).set_axis(names, axis=1) \
+        if names else pd.DataFrame()
+
+
+def iter_batches(path, sheet_name=0, batch_rows=None):
+    """
+    逐批产出Arrow record batch，每批最多batch_rows行（默认Config.XLSX_BATCH_ROWS）
+
+    各列类型由第一批确定（数值列统一为float64）：之后的批次中数值列出现的文本按缺失处理，
+    文本列出现的数值转为字符串。
+    """
+    import pyarrow as pa
+
+    batch_rows = batch_rows or Config.XLSX_BATCH_ROWS
+    header, rows = _rows(path, sheet_name)
+    if header is None:
+        return
+    width = len(header)
+    schema = None
+    pending = []
+
+    def flush():
+        nonlocal schema
+        columns = [[row[i] if i < len(row) else None for row in pending] for i in range(width)]
+        if schema is None:
+            arrays = [pa.array(to_array(column, narrow=False), from_pandas=True) for column in columns]
+            names = [str(label) for label in _header_labels(header, width)]
+            schema = pa.schema([pa.field(name, array.type) for name, array in zip(names, arrays)])
+        else:
+            arrays = [_cast(column, field.type) for column, field in zip(columns, schema)]
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    for values in rows:
+        # 表头之外出现的列不属于网格，忽略
+        pending.append(values[:width])
+        if len(pending) >= batch_rows:
+            yield flush()
+            pending = []
+    if pending or schema is None:
+        yield flush()
+
+
+def _cast(values, arrow_type):
+    """按第一批确定的类型转换一列"""
+    import pyarrow as pa
+
+    if pa.types.is_floating(arrow_type):
+        values = [value if isinstance(value, float) else None for value in values]
+    elif pa.types.is_string(arrow_type) or pa.types.is_null(arrow_type):
+        values = [None if value is None or (isinstance(value, str) and value in NA_STRINGS) else
+                  str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+                  for value in values]
+        if pa.types.is_null(arrow_type) and any(value is not None for value in values):
+            values = [None] * len(values)
+    else:
+        values = list(to_array(values, narrow=False))
+    return pa.array(values, type=arrow_type, from_pandas=True)
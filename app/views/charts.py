@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+图表接口：渲染图表并以内容地址提供PNG（支持ETag/304），
+以及供前端交互式绘制的JSON图表数据（降采样、gzip、ETag/304）
+"""
+
+import gzip
+import json
+import os
+import re
+
+from flask import abort, jsonify, make_response, request, send_file, url_for
+
+from config import Config
+
+KEY_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+def _chart_params():
+    """从查询参数或JSON请求体中读取图表参数"""
+    params = request.get_json(silent=True) or request.args
+    y = params.getlist('y') if hasattr(params, 'getlist') else params.get('y')
+    return {
+        'dataset': params.get('dataset'),
+        'chart_type': params.get('type', 'bar'),
+        'x': params.get('x') or None,
+        'y': y or None,
+        'title': params.get('title', ''),
+        'xlabel': params.get('xlabel', ''),
+        'ylabel': params.get('ylabel', ''),
+        'max_points': params.get('max_points'),
+    }
+
+
+def _max_points(value):
+    """JSON图表数据的最多点数，缺省时取配置值，不是整数或小于3时抛出ValueError"""
+    if value is None or value == '':
+        return Config.CHART_MAX_POINTS
+    max_points = int(value)
+    if max_points < 3:
+        raise ValueError('max_points不能小于3')
+    return max_points
+
+
+def register_chart_routes(app):
+    """注册图表路由"""
+
+    @app.route('/charts/render', methods=['GET', 'POST'])
+    def render_chart():
+        """渲染（或复用已缓存的）图表，返回图片地址"""
+        from app.models.chart_service import get_chart_renderer
+        params = _chart_params()
+        params.pop('max_points')
+        if not params['dataset']:
+            return jsonify({'error': '缺少dataset参数'}), 400
+        try:
+            key = get_chart_renderer().render(**params)
+        except FileNotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+        except (KeyError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'key': key, 'url': url_for('chart_image', key=key)})
+
+    @app.route('/charts/data', methods=['GET', 'POST'])
+    def chart_data():
+        """返回已聚合/降采样的图表数据，数据集版本不变时客户端可用If-None-Match得到304"""
+        from app.models.chart_service import CHART_TYPES, chart_columns, chart_key, chart_payload, select_chart_frame
+        from app.models.result_cache import dataset_fingerprint
+        params = _chart_params()
+        if not params['dataset']:
+            return jsonify({'error': '缺少dataset参数'}), 400
+        if params['chart_type'] not in CHART_TYPES:
+            return jsonify({'error': f"不支持的图表类型: {params['chart_type']}"}), 400
+        try:
+            max_points = _max_points(params['max_points'])
+            x, y = chart_columns(params['dataset'], params['x'], params['y'])
+            version = dataset_fingerprint(params['dataset'])
+        except FileNotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+
+        etag = chart_key(version, f"json:{params['chart_type']}:{max_points}", x, y)
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            corr = None
+            if params['chart_type'] == 'heatmap':
+                from app.models.correlation import get_correlation_engine
+                try:
+                    corr = get_correlation_engine().dataset_matrix(params['dataset'], y)
+                except KeyError as e:
+                    return jsonify({'error': f"热力图只支持数值列: {e}"}), 400
+            try:
+                df = select_chart_frame(params['dataset'], x, y)[0]
+                payload = chart_payload(df, params['chart_type'], x, y, max_points=max_points, corr=corr)
+            except (KeyError, TypeError, ValueError) as e:
+                return jsonify({'error': str(e)}), 400
+            payload['version'] = version
+            body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            response = make_response(body)
+            response.mimetype = 'application/json'
+            if len(body) >= Config.CHART_GZIP_MIN_BYTES and 'gzip' in request.accept_encodings:
+                response.set_data(gzip.compress(body, compresslevel=6))
+                response.headers['Content-Encoding'] = 'gzip'
+        # 同一内容的gzip与未压缩版本共用一个弱ETag
+        response.set_etag(etag, weak=True)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.cache_control.no_cache = True
+        return response
+
+    @app.route('/charts/<key>.png')
+    def chart_image(key):
+        """按内容地址返回图表，内容不会变化，ETag即为内容地址"""
+        from app.models.chart_service import chart_path
+
+        if not KEY_PATTERN.match(key):
+            abort(404)
+        path = chart_path(key)
+        if not os.path.exists(path):
+            abort(404)
+        response = send_file(path, mimetype='image/png', conditional=True, etag=key,
+                             max_age=365 * 24 * 3600)
+        response.cache_control.immutable = True
+        return response
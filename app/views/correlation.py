@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+指标相关系数接口：全国/分省份相关矩阵、滑动窗口相关系数、相关性最强的指标对、数据集列相关矩阵
+"""
+
+from flask import jsonify, request
+
+
+def _engine():
+    # 相关系数引擎依赖numpy/pandas，处理请求时才导入
+    from app.models.correlation import get_correlation_engine
+    return get_correlation_engine()
+
+
+def _nan_to_none(frame):
+    return [[None if value != value else float(value) for value in row] for row in frame.to_numpy()]
+
+
+def _matrix_json(frame, **extra):
+    return jsonify({'labels': [str(label) for label in frame.columns], 'matrix': _nan_to_none(frame), **extra})
+
+
+def _indicators():
+    indicators = request.args.getlist('indicator')
+    if len(indicators) == 1 and ',' in indicators[0]:
+        indicators = indicators[0].split(',')
+    return indicators or None
+
+
+def register_correlation_routes(app):
+    """注册相关系数路由"""
+
+    @app.route('/correlation')
+    def correlation_matrix():
+        """
+        指标×指标 相关矩阵
+
+        参数: method=pearson|spearman, province（缺省为全国）, indicator（可重复或逗号分隔）,
+        window（滑动窗口年数）, end（窗口结束年，缺省为最后一个窗口）
+        """
+        method = request.args.get('method', 'pearson')
+        province = request.args.get('province') or None
+        window = request.args.get('window', type=int)
+        end = request.args.get('end', type=int)
+        try:
+            frame = _engine().indicator_matrix(method, province, _indicators(), window, end)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except (KeyError, FileNotFoundError) as e:
+            return jsonify({'error': f"不存在: {e}"}), 404
+        return _matrix_json(frame, method=method, province=province, window=window, end=end)
+
+    @app.route('/correlation/pairs')
+    def correlation_pairs():
+        """相关性最强的指标对，参数: method, province, limit"""
+        method = request.args.get('method', 'pearson')
+        province = request.args.get('province') or None
+        limit = request.args.get('limit', 10, type=int)
+        try:
+            pairs = _engine().top_pairs(method, province, limit)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except (KeyError, FileNotFoundError) as e:
+            return jsonify({'error': f"不存在: {e}"}), 404
+        return jsonify([{'a': a, 'b': b, 'r': r} for a, b, r in pairs])
+
+    @app.route('/correlation/rolling')
+    def correlation_rolling():
+        """两个指标的滑动窗口相关系数序列，参数: a, b, method, window（默认5）, province"""
+        a, b = request.args.get('a'), request.args.get('b')
+        if not a or not b:
+            return jsonify({'error': '缺少参数 a 或 b'}), 400
+        method = request.args.get('method', 'pearson')
+        window = request.args.get('window', 5, type=int)
+        province = request.args.get('province') or None
+        try:
+            series = _engine().rolling_pair(a, b, method, window, province)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except (KeyError, FileNotFoundError) as e:
+            return jsonify({'error': f"不存在: {e}"}), 404
+        return jsonify({'a': a, 'b': b, 'method': method, 'window': window, 'province': province,
+                        'series': [{'end': end, 'r': r} for end, r in series.items()]})
+
+    @app.route('/correlation/dataset/<path:dataset>')
+    def correlation_dataset(dataset):
+        """数据集各数值列的相关矩阵，参数: column（可重复或逗号分隔）, method"""
+        columns = request.args.getlist('column')
+        if len(columns) == 1 and ',' in columns[0]:
+            columns = columns[0].split(',')
+        method = request.args.get('method', 'pearson')
+        try:
+            frame = _engine().dataset_matrix(dataset, columns or None, method)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except (KeyError, FileNotFoundError) as e:
+            return jsonify({'error': f"不存在: {e}"}), 404
+        return _matrix_json(frame, dataset=dataset, method=method)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量报告导出接口：作为后台任务提交导出，完成后下载ZIP
+"""
+
+import os
+
+from flask import jsonify, request, send_file, url_for
+
+EXPORT_KIND = 'report_export'
+
+
+def _queue():
+    from app.models.jobs import get_job_queue
+    return get_job_queue()
+
+
+def _with_urls(job):
+    job['status_url'] = url_for('job_status', job_id=job['id'])
+    job['download_url'] = url_for('download_export', job_id=job['id'])
+    return job
+
+
+def register_export_routes(app):
+    """注册报告导出路由"""
+
+    @app.route('/export', methods=['POST'])
+    def submit_export():
+        """
+        提交导出任务，返回202、任务状态地址和下载地址
+
+        请求体（可选）: {"indicators": ["province3", ...], "chart_types": ["bar", "line"]}，默认全部；
+        未知的指标或图表类型在排队前返回400
+        """
+        from app.models.report_export import validate_selection
+
+        body = request.get_json(silent=True) or {}
+        if not isinstance(body, dict):
+            return jsonify({'error': '请求体必须是JSON对象'}), 400
+        params = {key: body[key] for key in ('indicators', 'chart_types') if body.get(key)}
+        try:
+            validate_selection(params.get('indicators'), params.get('chart_types'))
+            job = _queue().submit(EXPORT_KIND, params=params)
+        except ValueError as e:  # 包括JobError
+            return jsonify({'error': str(e)}), 400
+        return jsonify(_with_urls(job)), 202
+
+    @app.route('/export/<job_id>.zip')
+    def download_export(job_id):
+        """
+        下载导出的ZIP
+
+        未完成时返回202和任务状态，失败或已取消返回409，文件已被清理返回410
+        """
+        from app.models.report_export import export_path
+
+        queue = _queue()
+        job = queue.get(job_id)
+        if job is None or job['kind'] != EXPORT_KIND:
+            return jsonify({'error': f"导出任务不存在: {job_id}"}), 404
+        if job['state'] not in queue.FINISHED:
+            return jsonify(_with_urls(job)), 202
+        if job['state'] != queue.DONE:
+            return jsonify(_with_urls(job)), 409
+        path = export_path(job_id)
+        if not os.path.exists(path):
+            return jsonify({'error': '导出文件已被清理，请重新提交'}), 410
+        return send_file(path, mimetype='application/zip', as_attachment=True,
+                         download_name=f"report-{job_id[:8]}.zip")
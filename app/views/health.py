@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+健康检查和就绪检查接口
+"""
+
+from flask import jsonify, request
+
+from app.models.spark_manager import SparkSessionManager, get_spark_manager
+
+
+def register_health_routes(app):
+    """注册健康检查路由"""
+
+    @app.route('/health')
+    def health():
+        """存活检查：进程能响应请求即可"""
+        return jsonify({'status': 'ok'})
+
+    @app.route('/ready')
+    def ready():
+        """就绪检查：Spark会话预热完成后返回200，否则返回503"""
+        status = get_spark_manager().status()
+        code = 200 if status['state'] == SparkSessionManager.READY else 503
+        return jsonify(status), code
+
+    @app.route('/health/cache')
+    def cache_stats():
+        """分析结果缓存的命中率统计"""
+        from app.models.result_cache import get_result_cache
+        return jsonify(get_result_cache().stats())
+
+    @app.route('/health/memory')
+    def memory_stats():
+        """各数据集各处理阶段和指标面板的内存占用"""
+        from app.models.memory import memory_report
+        datasets = request.args.getlist('dataset') or None
+        return jsonify(memory_report(datasets, panel=request.args.get('panel', '1') != '0'))
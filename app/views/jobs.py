@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+后台分析任务接口：提交任务，轮询状态，取消，读取结果
+"""
+
+from flask import jsonify, request, url_for
+
+
+def _queue():
+    # 任务模块依赖pandas，处理请求时才导入
+    from app.models.jobs import get_job_queue
+    return get_job_queue()
+
+
+def _with_urls(job):
+    job['status_url'] = url_for('job_status', job_id=job['id'])
+    job['result_url'] = url_for('job_result', job_id=job['id'])
+    return job
+
+
+def register_job_routes(app):
+    """注册后台任务路由"""
+
+    @app.route('/jobs', methods=['POST'])
+    def submit_job():
+        """
+        提交任务，返回202和任务状态地址
+
+        请求体: {"kind": "kmeans", "dataset": "xxx.xlsx", "params": {"features": [...], "k": 3}}
+        """
+        from app.models.jobs import JobError
+
+        body = request.get_json(silent=True) or {}
+        try:
+            job = _queue().submit(body.get('kind'), body.get('dataset'), body.get('params'))
+        except JobError as e:
+            return jsonify({'error': str(e)}), 400
+        except FileNotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+        return jsonify(_with_urls(job)), 202
+
+    @app.route('/jobs')
+    def list_jobs():
+        """最近的任务"""
+        limit = request.args.get('limit', 50, type=int)
+        return jsonify([_with_urls(job) for job in _queue().list(limit)])
+
+    @app.route('/jobs/<job_id>')
+    def job_status(job_id):
+        """任务状态"""
+        job = _queue().get(job_id)
+        if job is None:
+            return jsonify({'error': f"任务不存在: {job_id}"}), 404
+        return jsonify(_with_urls(job))
+
+    @app.route('/jobs/<job_id>/cancel', methods=['POST'])
+    def cancel_job(job_id):
+        """取消任务"""
+        job = _queue().cancel(job_id)
+        if job is None:
+            return jsonify({'error': f"任务不存在: {job_id}"}), 404
+        return jsonify(_with_urls(job))
+
+    @app.route('/jobs/<job_id>/result')
+    def job_result(job_id):
+        """
+        任务结果
+
+        未完成时返回202和任务状态，失败或已取消返回409，结果已从缓存中淘汰返回410
+        """
+        queue = _queue()
+        job = queue.get(job_id)
+        if job is None:
+            return jsonify({'error': f"任务不存在: {job_id}"}), 404
+        if job['state'] not in queue.FINISHED:
+            return jsonify(_with_urls(job)), 202
+        if job['state'] != queue.DONE:
+            return jsonify(_with_urls(job)), 409
+        found, result = queue.result(job_id)
+        if not found:
+            return jsonify({'error': '任务结果已过期，请重新提交'}), 410
+        return jsonify({'id': job_id, 'kind': job['kind'], 'result': result})
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+请求计时中间件、/metrics接口和按请求开启的性能剖析
+
+每个响应带Server-Timing头，列出该请求各阶段（Excel读取、Spark作业、模型训练、
+图表渲染……）的耗时，浏览器开发者工具的Timing面板可以直接查看。
+Config.PROFILING_ENABLED为True时，请求带 ?_profile=cprofile 或 ?_profile=pyspy
+（也可用X-Profile请求头）会为该请求生成剖析文件，路径写在X-Profile-File响应头中。
+"""
+
+import cProfile
+import os
+import re
+import shutil
+import signal
+import subprocess
+import time
+
+from flask import Response, g, request
+
+from config import Config
+from app.models.metrics import begin_request, count, end_request, registry, render_metrics
+
+_TOKEN_PATTERN = re.compile(r'[^0-9A-Za-z_]')
+
+
+def _collect_runtime():
+    """导出由其他模块维护的统计：结果缓存、Spark会话状态、Arrow转换路径"""
+    from app.models.arrow_bridge import transfer_stats
+    from app.models.result_cache import get_result_cache
+    from app.models.spark_manager import SparkSessionManager, get_spark_manager
+
+    cache = get_result_cache().stats()
+    spark = get_spark_manager().status()
+    return [
+        ('result_cache_lookups_total', 'counter', '结果缓存查找次数',
+         [({'result': 'memory_hit'}, cache['memory_hits']),
+          ({'result': 'disk_hit'}, cache['disk_hits']),
+          ({'result': 'miss'}, cache['misses'])]),
+        ('result_cache_disk_bytes', 'gauge', '结果缓存磁盘占用（字节）', [({}, cache['disk_bytes'])]),
+        ('spark_session_ready', 'gauge', 'Spark会话是否就绪',
+         [({}, 1 if spark['state'] == SparkSessionManager.READY else 0)]),
+        ('spark_active_jobs', 'gauge', '各调度池正在运行的Spark作业数',
+         [({'pool': pool}, active) for pool, active in spark['active_jobs'].items()]),
+        ('arrow_transfers_total', 'counter', 'Spark与pandas之间的数据转换次数',
+         [({'operation': key.split('.')[0], 'path': key.split('.')[1]}, value)
+          for key, value in transfer_stats().items()]),
+    ]
+
+
+def _start_profile(mode):
+    os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{_TOKEN_PATTERN.sub('_', request.endpoint or 'request')}"
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return mode, profiler, os.path.join(Config.PROFILE_DIR, name + '.prof')
+    if mode == 'pyspy':
+        executable = shutil.which('py-spy')
+        if executable is None:
+            return None
+        path = os.path.join(Config.PROFILE_DIR, name + '.svg')
+        process = subprocess.Popen([executable, 'record', '--pid', str(os.getpid()), '--output', path,
+                                    '--rate', '200', '--idle', '--nonblocking'],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        time.sleep(0.2)  # 等待py-spy附加到进程
+        return mode, process, path
+    return None
+
+
+def _stop_profile(profile):
+    mode, handle, path = profile
+    if mode == 'cprofile':
+        handle.disable()
+        handle.dump_stats(path)
+        return path
+    # py-spy收到SIGINT后写出火焰图
+    handle.send_signal(signal.SIGINT)
+    try:
+        handle.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        handle.kill()
+    return path if os.path.exists(path) else None
+
+
+def register_metrics(app):
+    """注册计时中间件和/metrics路由"""
+    registry.register_collector(_collect_runtime)
+
+    @app.before_request
+    def start_timing():
+        g._timing_start = time.perf_counter()
+        g._timing_token = begin_request()
+        g._profile = None
+        mode = request.args.get('_profile') or request.headers.get('X-Profile')
+        if mode and Config.PROFILING_ENABLED:
+            g._profile = _start_profile(mode.lower())
+
+    @app.after_request
+    def finish_timing(response):
+        token = g.pop('_timing_token', None)
+        if token is None:
+            return response
+        stages = end_request(token)
+        elapsed = time.perf_counter() - g.pop('_timing_start')
+        profile = g.pop('_profile', None)
+        if profile is not None:
+            path = _stop_profile(profile)
+            if path:
+                response.headers['X-Profile-File'] = os.path.relpath(path, Config.BASE_DIR)
+
+        endpoint = request.endpoint or 'unknown'
+        registry.observe('http_request_duration_seconds', elapsed, endpoint=endpoint, method=request.method)
+        count('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+
+        timings = [f"{_TOKEN_PATTERN.sub('_', stage)};dur={seconds * 1000:.1f}" for stage, seconds in stages.items()]
+        timings.append(f"total;dur={elapsed * 1000:.1f}")
+        response.headers['Server-Timing'] = ', '.join(timings)
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus文本格式的指标"""
+        return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据预览接口：游标分页、NDJSON流式输出，以及从统计索引读取的统计信息和年份汇总
+"""
+
+import json
+
+from flask import Response, jsonify, request, stream_with_context
+
+
+def _sheet():
+    sheet = request.args.get('sheet', '0')
+    return int(sheet) if sheet.isdigit() else sheet
+
+
+def register_preview_routes(app):
+    """注册数据预览路由"""
+
+    @app.route('/preview/<dataset>')
+    def preview_page(dataset):
+        """返回一页数据，响应中的next_cursor用于请求下一页"""
+        from app.models.preview import StaleCursor, read_page
+        try:
+            page = read_page(dataset, cursor=request.args.get('cursor'),
+                             limit=request.args.get('limit'), sheet_name=_sheet())
+        except FileNotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+        except StaleCursor as e:
+            return jsonify({'error': str(e)}), 409
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify(page)
+
+    @app.route('/preview/<dataset>/stream')
+    def preview_stream(dataset):
+        """以NDJSON逐块输出全部数据：第一行为列名，之后每行一个数据块"""
+        from app.models.preview import iter_chunks, read_page
+        try:
+            page = read_page(dataset, limit=1, sheet_name=_sheet())
+        except FileNotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+        chunk_rows = request.args.get('chunk', type=int)
+
+        def generate():
+            yield json.dumps({'columns': page['columns'], 'total_rows': page['total_rows'],
+                              'version': page['version']}, ensure_ascii=False) + '\n'
+            for rows in iter_chunks(dataset, chunk_rows=chunk_rows, sheet_name=_sheet()):
+                yield json.dumps({'rows': rows}, ensure_ascii=False) + '\n'
+
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+    @app.route('/preview/<dataset>/stats')
+    def preview_stats(dataset):
+        """基本统计信息（读取统计索引，数据集更新后增量刷新）"""
+        from app.models.stats_index import get_stats_index
+        columns = request.args.getlist('column') or None
+        try:
+            stats = get_stats_index().describe(dataset, columns=columns, sheet_name=_sheet())
+        except FileNotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+        except KeyError as e:
+            return jsonify({'error': f"数据集中不存在列: {e}"}), 400
+        return jsonify(stats)
+
+    @app.route('/preview/<dataset>/years')
+    def preview_years(dataset):
+        """各年份的汇总和各省份的同比增长率（读取统计索引）"""
+        from app.models.stats_index import get_stats_index
+        index = get_stats_index()
+        try:
+            summary = index.year_summary(dataset, sheet_name=_sheet())
+            growth = index.growth(dataset, sheet_name=_sheet())
+        except FileNotFoundError as e:
+            return jsonify({'error': str(e)}), 404
+        return jsonify({'years': {str(year): stats for year, stats in summary.items()},
+                        'growth': {str(year): rates for year, rates in growth.items()}})
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+上传接口：流式接收文件，后台处理，轮询任务状态
+
+数据层模块（pandas等）在处理请求时才导入，不影响应用启动时间。
+"""
+
+from flask import jsonify, request, url_for
+
+
+def register_upload_routes(app):
+    """注册上传路由"""
+
+    @app.route('/upload', methods=['POST'])
+    def upload():
+        """
+        接收上传文件，返回202和任务状态地址
+
+        支持multipart表单（字段名file），也支持直接以请求体上传原始文件
+        （文件名放在filename查询参数或X-Filename请求头中），后者不经过表单解析，完全流式写盘。
+        已有同名数据集时返回409，replace参数为1/true时覆盖。
+        """
+        from app.models.upload_jobs import UploadConflict, UploadError, UploadTooLarge, get_upload_queue
+
+        if request.mimetype == 'multipart/form-data':
+            upload_file = request.files.get('file')
+            if upload_file is None or not upload_file.filename:
+                return jsonify({'error': '没有选择文件'}), 400
+            stream, filename = upload_file.stream, upload_file.filename
+            replace = request.form.get('replace') or request.args.get('replace')
+        else:
+            stream = request.stream
+            filename = request.args.get('filename') or request.headers.get('X-Filename')
+            replace = request.args.get('replace')
+        replace = str(replace or '').lower() in ('1', 'true', 'yes')
+        try:
+            job = get_upload_queue().submit(stream, filename, replace=replace)
+        except UploadTooLarge as e:
+            return jsonify({'error': str(e)}), 413
+        except UploadConflict as e:
+            return jsonify({'error': str(e)}), 409
+        except UploadError as e:
+            return jsonify({'error': str(e)}), 400
+        job['status_url'] = url_for('upload_status', job_id=job['id'])
+        return jsonify(job), 202
+
+    @app.route('/upload/jobs')
+    def upload_jobs():
+        """最近的上传任务"""
+        from app.models.upload_jobs import get_upload_queue
+        return jsonify(get_upload_queue().list())
+
+    @app.route('/upload/jobs/<job_id>')
+    def upload_status(job_id):
+        """上传任务状态"""
+        from app.models.upload_jobs import get_upload_queue
+        job = get_upload_queue().get(job_id)
+        if job is None:
+            return jsonify({'error': f"任务不存在: {job_id}"}), 404
+        return jsonify(job)
@@ -0,0 +1,319 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+端到端基准测试（离线运行，不需要HDFS）
+
+对自带的 分省年度数据-*.xlsx 工作簿和按比例放大的合成面板（更多省份、年份和指标），
+分别测量Excel解析（应用使用的读取器，以及作为对照的pd.read_excel）、Parquet读取、
+数据预览、K-means、线性回归和图表渲染的耗时；K-means和回归对每个执行引擎（pandas、Spark）
+分别测量。结果追加到历史文件 benchmarks/history.jsonl 和 benchmarks/history.csv，
+并与上一次运行对比，耗时超过上次 --threshold 倍的项目报告为性能退化。
+
+某个数据集生成或测量失败时记录错误并继续测量其余数据集，运行结束后以非0状态退出。
+
+用法:
+    python benchmark.py [--engines pandas spark] [--scales 1 4 16] [--repeat 3]
+                        [--label v1.2] [--threshold 1.25] [--fail-on-regression]
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+HISTORY_DIR = os.path.join(Config.BASE_DIR, 'benchmarks')
+CSV_FIELDS = ['run_id', 'timestamp', 'label', 'commit', 'dataset', 'task', 'engine', 'rows', 'ms']
+BASE_PROVINCES, BASE_YEARS, BASE_INDICATORS = 31, 25, 14
+
+
+def measure(func, repeat, setup=None):
+    """重复执行func（每次之前调用setup），返回耗时中位数（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=Config.BASE_DIR,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                              universal_newlines=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def real_workbooks():
+    """自带的分省年度数据工作簿"""
+    from app.models.parquet_cache import list_source_workbooks
+    return [path for path in list_source_workbooks() if os.path.basename(path).startswith('分省年度数据-')]
+
+
+def make_synthetic_workbooks(directory, scale):
+    """
+    生成与真实工作簿格式相同（地区 + "XXXX年"列）的合成数据
+
+    scale=s 时省份数 ×s，年份数和指标数 ×ceil(√s)
+    """
+    grow = math.ceil(math.sqrt(scale))
+    provinces = [f'省份{i:04d}' for i in range(BASE_PROVINCES * scale)]
+    years = [f'{2022 - i}年' for i in range(BASE_YEARS * grow)]
+    rng = np.random.RandomState(scale)
+    paths = []
+    for indicator in range(BASE_INDICATORS * grow):
+        base = rng.lognormal(mean=7, sigma=1, size=(len(provinces), 1))
+        trend = np.cumprod(1 + rng.normal(0.05, 0.03, size=(len(provinces), len(years))), axis=1)[:, ::-1]
+        values = np.round(base * trend, 2)
+        values[rng.random_sample(values.shape) < 0.02] = np.nan
+        frame = pd.DataFrame(values, columns=years)
+        frame.insert(0, '地区', provinces)
+        path = os.path.join(directory, f'分省年度数据-合成指标{indicator:02d}.xlsx')
+        frame.to_excel(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def feature_table(paths):
+    """各工作簿最近一年的数据拼成 省份×指标 宽表，缺失值用列均值填充"""
+    from app.models.parquet_cache import read_excel_cached
+    from app.models.reshape import to_province_year
+
+    columns = {}
+    for path in paths:
+        frame = to_province_year(read_excel_cached(path))
+        if frame.shape[1]:
+            columns[os.path.splitext(os.path.basename(path))[0]] = frame[frame.columns.max()]
+    wide = pd.DataFrame(columns)
+    wide = wide.dropna(axis=1, thresh=int(len(wide) * 0.8))
+    return wide.fillna(wide.mean())
+
+
+class Benchmark:
+    """一次基准测试运行"""
+
+    def __init__(self, engines, repeat, work_dir):
+        self.engines = engines
+        self.repeat = repeat
+        self.work_dir = work_dir
+        self.results = []
+        self.failures = []
+        self._spark = None
+
+    def record(self, dataset, task, engine, rows, ms):
+        self.results.append({'dataset': dataset, 'task': task, 'engine': engine, 'rows': int(rows),
+                             'ms': round(ms, 3)})
+        print(f"  {task:<14}{engine:<8}{rows:>9}{ms:>12.1f} ms")
+
+    def fail(self, dataset, error):
+        """记录数据集的失败，已测得的项目保留"""
+        self.failures.append({'dataset': dataset, 'error': f"{type(error).__name__}: {error}"})
+        print(f"  [{dataset}] 失败: {type(error).__name__}: {error}")
+
+    def engine(self, name):
+        from app.models.engines import PandasEngine, SparkEngine
+        if name == 'pandas':
+            return PandasEngine()
+        if self._spark is None:
+            from app.models.spark_utils import init_spark_session
+            # 只读本地数据，不依赖HDFS
+            Config.SPARK_CONF = dict(Config.SPARK_CONF, **{'spark.hadoop.fs.defaultFS': 'file:///'})
+            self._spark = init_spark_session(excel=False)
+            if self._spark is None:
+                raise RuntimeError('Spark会话初始化失败')
+        return SparkEngine(self._spark)
+
+    def run_dataset(self, name, paths):
+        """测量一个数据集；失败时记录错误，不中断整个运行"""
+        try:
+            self._run_dataset(name, paths)
+        except Exception as e:
+            self.fail(name, e)
+
+    def _run_dataset(self, name, paths):
+        from app.models.chart_service import ChartRenderer, chart_path, chart_payload, select_chart_frame
+        from app.models.parquet_cache import ensure_parquet, parse_excel, read_excel_cached
+        from app.models.preview import read_page, streaming_stats
+
+        print(f"\n[{name}] {len(paths)} 个工作簿")
+        sample = paths[0]
+        sample_rows = len(parse_excel(sample))
+        self.record(name, 'excel_parse', '-', sample_rows,
+                    measure(lambda: [parse_excel(path) for path in paths], self.repeat))
+        self.record(name, 'excel_pandas', '-', sample_rows,
+                    measure(lambda: [pd.read_excel(path) for path in paths], self.repeat))
+        for path in paths:
+            ensure_parquet(path)
+        self.record(name, 'parquet_load', '-', sample_rows,
+                    measure(lambda: [read_excel_cached(path) for path in paths], self.repeat))
+        self.record(name, 'preview', '-', sample_rows,
+                    measure(lambda: (read_page(sample), streaming_stats(sample)), self.repeat))
+
+        features = feature_table(paths)
+        columns = list(features.columns)
+        for engine_name in self.engines:
+            try:
+                engine = self.engine(engine_name)
+            except Exception as e:
+                print(f"  跳过引擎 {engine_name}: {str(e)}")
+                continue
+            engine.kmeans(features, columns, k=3)  # 预热
+            self.record(name, 'kmeans', engine_name, len(features),
+                        measure(lambda: engine.kmeans(features, columns, k=3), self.repeat))
+            self.record(name, 'regression', engine_name, len(features),
+                        measure(lambda: engine.linear_regression(features, columns[:-1], columns[-1]), self.repeat))
+
+        df, x, y = select_chart_frame(sample)
+        self.record(name, 'chart_json', '-', len(df), measure(lambda: chart_payload(df, 'line', x, y), self.repeat))
+        renderer = ChartRenderer(workers=1)
+        try:
+            renderer.warm()
+            key = renderer.render(sample, 'line')
+
+            def clear():
+                if os.path.exists(chart_path(key)):
+                    os.remove(chart_path(key))
+
+            self.record(name, 'chart_png', '-', len(df),
+                        measure(lambda: renderer.render(sample, 'line'), self.repeat, setup=clear))
+        finally:
+            renderer.shutdown()
+
+    def close(self):
+        if self._spark is not None:
+            self._spark.stop()
+
+
+def load_history(path):
+    runs = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    runs.append(json.loads(line))
+    except OSError:
+        pass
+    return runs
+
+
+def append_history(run, history_dir):
+    """追加到JSON Lines和CSV历史文件"""
+    os.makedirs(history_dir, exist_ok=True)
+    with open(os.path.join(history_dir, 'history.jsonl'), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(run, ensure_ascii=False) + '\n')
+    csv_path = os.path.join(history_dir, 'history.csv')
+    new_file = not os.path.exists(csv_path)
+    with open(csv_path, 'a', encoding='utf-8-sig' if new_file else 'utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        if new_file:
+            writer.writeheader()
+        for result in run['results']:
+            writer.writerow({'run_id': run['run_id'], 'timestamp': run['timestamp'], 'label': run['label'],
+                             'commit': run['commit'], **result})
+
+
+def compare(previous, current, threshold):
+    """与上一次运行对比，返回耗时超过threshold倍的项目"""
+    before = {(r['dataset'], r['task'], r['engine']): r['ms'] for r in previous['results']}
+    regressions = []
+    for result in current['results']:
+        old = before.get((result['dataset'], result['task'], result['engine']))
+        if old and result['ms'] > old * threshold:
+            regressions.append({**result, 'previous_ms': old, 'ratio': round(result['ms'] / old, 2)})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端基准测试')
+    parser.add_argument('--engines', nargs='+', default=['pandas', 'spark'], choices=['pandas', 'spark'])
+    parser.add_argument('--scales', nargs='+', type=int, default=[4, 16],
+                        help='合成面板的放大倍数（省份×s，年份和指标×√s）')
+    parser.add_argument('--no-real', action='store_true', help='不测试自带的真实工作簿')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数（取中位数）')
+    parser.add_argument('--label', default='', help='本次运行的标签，如版本号')
+    parser.add_argument('--history-dir', default=HISTORY_DIR)
+    parser.add_argument('--threshold', type=float, default=1.25, help='判定为性能退化的耗时倍数')
+    parser.add_argument('--fail-on-regression', action='store_true', help='发现性能退化时以非0状态退出')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # 所有缓存放在临时目录，每次运行都从冷缓存开始
+        Config.PARQUET_CACHE_DIR = os.path.join(work_dir, 'parquet_cache')
+        Config.RESULT_CACHE_DIR = os.path.join(work_dir, 'result_cache')
+        Config.CHART_CACHE_DIR = os.path.join(work_dir, 'charts')
+
+        benchmark = Benchmark(args.engines, args.repeat, work_dir)
+        try:
+            if not args.no_real:
+                paths = real_workbooks()
+                if paths:
+                    benchmark.run_dataset('real', paths)
+                else:
+                    print('未找到自带的分省年度数据工作簿')
+            for scale in args.scales:
+                name = f'synthetic_x{scale}'
+                directory = os.path.join(work_dir, name)
+                os.makedirs(directory)
+                try:
+                    paths = make_synthetic_workbooks(directory, scale)
+                except Exception as e:
+                    benchmark.fail(name, e)
+                    continue
+                benchmark.run_dataset(name, paths)
+        finally:
+            benchmark.close()
+
+    run = {
+        'run_id': time.strftime('%Y%m%d-%H%M%S'),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'label': args.label,
+        'commit': git_commit(),
+        'host': {'platform': platform.platform(), 'python': platform.python_version(),
+                 'cores': os.cpu_count()},
+        'repeat': args.repeat,
+        'results': benchmark.results,
+        'failures': benchmark.failures,
+    }
+    history = load_history(os.path.join(args.history_dir, 'history.jsonl'))
+    append_history(run, args.history_dir)
+    print(f"\n结果已写入 {args.history_dir}/history.jsonl 和 history.csv")
+
+    regressions = []
+    if history:
+        regressions = compare(history[-1], run, args.threshold)
+        previous = history[-1]
+        print(f"与上一次运行对比（{previous['run_id']} {previous.get('label') or ''} "
+              f"{previous.get('commit') or ''}）:")
+        if not regressions:
+            print(f"  没有超过 {args.threshold}x 的退化")
+        for item in regressions:
+            print(f"  {item['dataset']:<16}{item['task']:<14}{item['engine']:<8}"
+                  f"{item['previous_ms']:>10.1f} -> {item['ms']:>10.1f} ms ({item['ratio']}x)")
+
+    if benchmark.failures:
+        print('失败的数据集:')
+        for failure in benchmark.failures:
+            print(f"  {failure['dataset']:<16}{failure['error']}")
+        sys.exit(1)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
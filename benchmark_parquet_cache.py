@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+基准测试：冷启动解析XLSX与读取Parquet缓存的耗时对比
+
+用法:
+    python benchmark_parquet_cache.py [--repeat 5] [--spark]
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from config import Config
+from app.models import parquet_cache
+
+
+def measure(func, repeat):
+    """重复执行func，返回每次耗时（毫秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def bench_pandas(sources, repeat):
+    """对比pandas直接解析Excel与读取Parquet缓存"""
+    print(f"{'文件':<40}{'XLSX(ms)':>12}{'转换(ms)':>12}{'Parquet(ms)':>14}{'加速比':>10}")
+    total_excel = total_parquet = 0.0
+    for source in sources:
+        excel_ms = statistics.median(measure(lambda: pd.read_excel(source), repeat))
+        build_ms = measure(lambda: parquet_cache.ensure_parquet(source), 1)[0]
+        parquet_ms = statistics.median(measure(lambda: parquet_cache.read_excel_cached(source), repeat))
+        total_excel += excel_ms
+        total_parquet += parquet_ms
+        print(f"{os.path.basename(source):<40}{excel_ms:>12.2f}{build_ms:>12.2f}"
+              f"{parquet_ms:>14.2f}{excel_ms / parquet_ms:>9.1f}x")
+    print(f"{'合计':<40}{total_excel:>12.2f}{'':>12}{total_parquet:>14.2f}"
+          f"{total_excel / total_parquet:>9.1f}x")
+
+
+def bench_spark(sources, repeat):
+    """对比spark-excel（POI）解析与Spark读取Parquet缓存"""
+    from app.models.spark_utils import init_spark_session, read_excel_with_poi
+
+    spark = init_spark_session()
+    if not spark:
+        print("Spark会话初始化失败，跳过Spark基准测试")
+        return
+    try:
+        print(f"\n{'文件':<40}{'POI(ms)':>12}{'Parquet(ms)':>14}{'加速比':>10}")
+        for source in sources:
+            uri = 'file:///' + os.path.abspath(source).replace('\\', '/').lstrip('/')
+            poi_ms = statistics.median(measure(
+                lambda: read_excel_with_poi(spark, uri).count(), repeat))
+            parquet_ms = statistics.median(measure(
+                lambda: parquet_cache.read_spark_cached(spark, source).count(), repeat))
+            print(f"{os.path.basename(source):<40}{poi_ms:>12.2f}{parquet_ms:>14.2f}"
+                  f"{poi_ms / parquet_ms:>9.1f}x")
+    finally:
+        spark.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parquet缓存基准测试')
+    parser.add_argument('--repeat', type=int, default=5, help='每项测试重复次数')
+    parser.add_argument('--spark', action='store_true', help='同时测试Spark读取路径')
+    args = parser.parse_args()
+
+    sources = parquet_cache.list_source_workbooks()
+    if not sources:
+        print("未找到Excel数据文件")
+        return
+
+    # 使用临时缓存目录，保证转换耗时是冷启动的真实值
+    with tempfile.TemporaryDirectory() as cache_dir:
+        Config.PARQUET_CACHE_DIR = cache_dir
+        print(f"共 {len(sources)} 个工作簿，每项重复 {args.repeat} 次（取中位数）\n")
+        bench_pandas(sources, args.repeat)
+        if args.spark:
+            bench_spark(sources, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
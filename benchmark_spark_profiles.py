@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+基准测试：不同Spark配置档案对分析作业耗时的影响
+
+每个档案在独立的子进程中启动Spark（内存等会话级配置只在JVM启动时生效），
+对真实的分省数据和按--scale放大的合成数据分别运行统计、聚合、K-means和线性回归。
+"static"为原来的固定配置（Config.SPARK_CONF，默认200个shuffle分区）。
+
+用法:
+    python benchmark_spark_profiles.py [--profiles static interactive batch low_memory]
+                                       [--repeat 3] [--scale 200]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+RESULT_PREFIX = 'BENCHMARK_RESULT '
+
+
+def load_long_table():
+    """所有分省数据工作簿合并成 (province, year, indicator, value) 长表"""
+    from app.models.parquet_cache import list_source_workbooks, read_excel_cached
+    from app.models.reshape import wide_to_long
+
+    frames = []
+    for source in list_source_workbooks():
+        try:
+            long = wide_to_long(read_excel_cached(source))
+        except Exception as e:
+            print(f"跳过 {os.path.basename(source)}: {str(e)}", file=sys.stderr)
+            continue
+        if len(long):
+            long['indicator'] = os.path.splitext(os.path.basename(source))[0]
+            frames.append(long)
+    if not frames:
+        raise SystemExit('没有可用的分省数据工作簿')
+    return pd.concat(frames, ignore_index=True)
+
+
+def scale_long_table(long, scale):
+    """把省份复制scale份（省份名加后缀），数值加少量噪声"""
+    if scale <= 1:
+        return long
+    rng = np.random.RandomState(0)
+    copies = []
+    for i in range(scale):
+        copy = long.copy()
+        copy['province'] = copy['province'] + f'#{i}'
+        copy['value'] = copy['value'] * (1 + rng.normal(scale=0.01, size=len(copy)))
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def to_wide(long):
+    """长表转成 省份×指标（最近一年）的宽表，供聚类和回归使用"""
+    latest = long[long['year'] == long.groupby('indicator')['year'].transform('max')]
+    wide = latest.pivot_table(index='province', columns='indicator', values='value')
+    return wide.dropna(axis=1, thresh=int(len(wide) * 0.8)).fillna(wide.mean())
+
+
+def measure(func, repeat):
+    """先预热一次，再重复执行func，返回耗时中位数（毫秒）"""
+    func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run_worker(profile, repeat, scale):
+    """子进程：用指定档案启动Spark并测量各作业耗时"""
+    from app.models.engines import SparkEngine
+    from app.models.spark_profiles import estimate_bytes, runtime_conf
+    from app.models.spark_utils import init_spark_session
+
+    # 基准测试只使用本地数据，不依赖HDFS
+    Config.SPARK_CONF = dict(Config.SPARK_CONF, **{'spark.hadoop.fs.defaultFS': 'file:///'})
+    if profile == 'static':
+        Config.SPARK_PROFILE = None
+    start = time.perf_counter()
+    spark = init_spark_session(None if profile == 'static' else profile, excel=False)
+    if spark is None:
+        raise SystemExit('Spark会话初始化失败')
+    startup_ms = (time.perf_counter() - start) * 1000
+
+    results = {'startup_ms': startup_ms, 'datasets': {}}
+    try:
+        long = load_long_table()
+        for label, table in (('real', long), (f'x{scale}', scale_long_table(long, scale))):
+            wide = to_wide(table)
+            features = list(wide.columns[:-1])
+            target = wide.columns[-1]
+            if profile != 'static':
+                for key, value in runtime_conf(profile, estimate_bytes(table)).items():
+                    spark.conf.set(key, value)
+            engine = SparkEngine(spark)
+            sdf = spark.createDataFrame(table).cache()
+            sdf.count()
+
+            def aggregate():
+                sdf.groupBy('indicator', 'year').agg({'value': 'mean'}).toPandas()
+
+            timings = {
+                'rows': len(table),
+                'shuffle_partitions': spark.conf.get('spark.sql.shuffle.partitions'),
+                'aggregate': measure(aggregate, repeat),
+                'describe': measure(lambda: engine.describe(wide), repeat),
+                'kmeans': measure(lambda: engine.kmeans(wide, features, k=3), repeat),
+                'regression': measure(lambda: engine.linear_regression(wide, features, target), repeat),
+            }
+            sdf.unpersist()
+            results['datasets'][label] = timings
+    finally:
+        spark.stop()
+    print(RESULT_PREFIX + json.dumps(results))
+
+
+def run_profile(profile, repeat, scale):
+    """在子进程中运行一个档案，返回测量结果"""
+    command = [sys.executable, os.path.abspath(__file__), '--worker', profile,
+               '--repeat', str(repeat), '--scale', str(scale)]
+    completed = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               universal_newlines=True, encoding='utf-8')
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            return json.loads(line[len(RESULT_PREFIX):])
+    print(f"档案 {profile} 运行失败:\n{completed.stderr[-2000:]}")
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Spark配置档案基准测试')
+    parser.add_argument('--profiles', nargs='+', default=['static', 'interactive', 'batch', 'low_memory'])
+    parser.add_argument('--repeat', type=int, default=3, help='每个作业重复次数（取中位数）')
+    parser.add_argument('--scale', type=int, default=200, help='合成数据的放大倍数')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.repeat, args.scale)
+        return
+
+    results = {}
+    for profile in args.profiles:
+        print(f"运行档案 {profile} ...")
+        result = run_profile(profile, args.repeat, args.scale)
+        if result:
+            results[profile] = result
+
+    jobs = ('aggregate', 'describe', 'kmeans', 'regression')
+    print(f"\n{'档案':<14}{'数据':<8}{'行数':>9}{'分区':>6}{'启动(ms)':>11}"
+          + ''.join(f"{job + '(ms)':>16}" for job in jobs))
+    for profile, result in results.items():
+        for label, timings in result['datasets'].items():
+            print(f"{profile:<14}{label:<8}{timings['rows']:>9}{timings['shuffle_partitions']:>6}"
+                  f"{result['startup_ms']:>11.0f}" + ''.join(f"{timings[job]:>16.1f}" for job in jobs))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+基准测试：流式Excel读取器与openpyxl、spark-excel（POI）的解析吞吐量对比
+
+除自带的工作簿外，另生成一个放大的合成网格工作簿（第一列为省份，其余为数值），
+分别测量：流式读取器（NumPy列）、流式读取器（Arrow批）、pd.read_excel（openpyxl）、
+openpyxl只读模式逐行遍历，以及加--spark时的spark-excel。
+
+用法:
+    python benchmark_xlsx_reader.py [--repeat 3] [--rows 20000] [--cols 30] [--spark]
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.models import parquet_cache, xlsx_reader
+
+
+def measure(func, repeat):
+    """重复执行func，返回耗时中位数（秒）"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def make_workbook(path, rows, cols):
+    """生成 rows×cols 的合成网格工作簿，返回单元格数"""
+    import openpyxl
+
+    rng = np.random.RandomState(0)
+    book = openpyxl.Workbook(write_only=True)
+    sheet = book.create_sheet('Sheet1')
+    sheet.append(['时间'] + [f'{2000 + j}年' for j in range(cols)])
+    provinces = [f'省份{i}' for i in range(31)]
+    for i in range(rows):
+        sheet.append([provinces[i % len(provinces)]] + list(np.round(rng.lognormal(8, 1, cols), 2)))
+    book.save(path)
+    return (rows + 1) * (cols + 1)
+
+
+def openpyxl_rows(path):
+    import openpyxl
+
+    book = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        for _ in book.active.iter_rows(values_only=True):
+            pass
+    finally:
+        book.close()
+
+
+def arrow_batches(path):
+    for _ in xlsx_reader.iter_batches(path):
+        pass
+
+
+def poi_reader(spark):
+    from app.models.spark_utils import read_excel_with_poi
+
+    def read(path):
+        uri = 'file:///' + os.path.abspath(path).replace('\\', '/').lstrip('/')
+        read_excel_with_poi(spark, uri).count()
+    return read
+
+
+def bench(sources, repeat, spark=None):
+    readers = [
+        ('流式(NumPy)', xlsx_reader.read_frame),
+        ('流式(Arrow)', arrow_batches),
+        ('pd.read_excel', pd.read_excel),
+        ('openpyxl只读', openpyxl_rows),
+    ]
+    if spark is not None:
+        readers.append(('spark-excel', poi_reader(spark)))
+
+    print(f"{'文件':<36}{'读取方式':<16}{'耗时(ms)':>12}{'单元格/秒':>14}{'MB/秒':>10}{'相对流式':>10}")
+    for path, cells in sources:
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        baseline = None
+        for name, reader in readers:
+            try:
+                seconds = measure(lambda: reader(path), repeat)
+            except Exception as e:
+                print(f"{os.path.basename(path):<36}{name:<16}失败: {str(e)}")
+                continue
+            baseline = baseline or seconds
+            print(f"{os.path.basename(path):<36}{name:<16}{seconds * 1000:>12.2f}{cells / seconds:>14,.0f}"
+                  f"{size_mb / seconds:>10.2f}{seconds / baseline:>9.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流式Excel读取器基准测试')
+    parser.add_argument('--repeat', type=int, default=3, help='每项测试重复次数')
+    parser.add_argument('--rows', type=int, default=20000, help='合成工作簿的行数（0表示不生成）')
+    parser.add_argument('--cols', type=int, default=30, help='合成工作簿的数值列数')
+    parser.add_argument('--spark', action='store_true', help='同时测试spark-excel（需要已下载的JAR）')
+    args = parser.parse_args()
+
+    sources = []
+    for source in parquet_cache.list_source_workbooks():
+        if source.lower().endswith('.xlsx'):
+            rows, cols = pd.read_excel(source).shape
+            sources.append((source, (rows + 1) * cols))
+
+    spark = None
+    if args.spark:
+        from app.models.spark_utils import init_spark_session
+        spark = init_spark_session()
+        if spark is None:
+            print("Spark会话初始化失败，跳过spark-excel")
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.rows:
+            path = os.path.join(directory, f'合成-{args.rows}x{args.cols}.xlsx')
+            sources.append((path, make_workbook(path, args.rows, args.cols)))
+        print(f"共 {len(sources)} 个工作簿，每项重复 {args.repeat} 次（取中位数）\n")
+        try:
+            bench(sources, args.repeat, spark)
+        finally:
+            if spark is not None:
+                spark.stop()
+
+
+if __name__ == '__main__':
+    main()
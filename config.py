@@ -16,6 +16,12 @@ class Config:
     HADOOP_PORT = 9000
     HADOOP_USER = 'hadoop'  # Hadoop用户名
     HDFS_BASE_PATH = '/manufacture_data'  # HDFS上的基础数据目录
+    HDFS_PARQUET_PATH = HDFS_BASE_PATH + '_parquet'  # HDFS上Parquet副本目录（与基础目录同级）
+    HDFS_WEB_PORT = 9870  # WebHDFS端口（Hadoop 3.x默认9870，2.x为50070）
+    HDFS_WEB_URL = f'http://{HADOOP_HOST}:{HDFS_WEB_PORT}'
+    HDFS_TIMEOUT = 30  # WebHDFS请求超时（秒）
+    HDFS_SYNC_WORKERS = 4  # 并行上传的线程数
+    HDFS_SYNC_MANIFEST = os.path.join(DATA_DIR, '.hdfs_sync_manifest.json')  # 上传清单，用于增量和断点续传
     
     # Spark配置
     SPARK_MASTER = 'local[*]'  # 本地模式，使用所有可用核心
@@ -31,12 +37,142 @@ class Config:
         'spark.sql.warehouse.dir': os.path.join(os.path.dirname(BASE_DIR), 'spark_warehouse'),
         # Hadoop集成配置
         'spark.hadoop.fs.defaultFS': f'hdfs://{HADOOP_HOST}:{HADOOP_PORT}',
-
+        # FAIR调度：不同类型的分析使用不同的调度池，互不阻塞
+        'spark.scheduler.mode': 'FAIR',
+        'spark.scheduler.allocation.file': os.path.join(BASE_DIR, 'fairscheduler.xml'),
+        # Spark与pandas之间用Arrow列式传输，不支持的类型自动退回逐行转换
+        'spark.sql.execution.arrow.pyspark.enabled': 'true',
+        'spark.sql.execution.arrow.pyspark.fallback.enabled': 'true',
+    }
+    # Spark配置档案（interactive/batch/low_memory，见app/models/spark_profiles.py），
+    # 按主机资源和输入数据量覆盖上面的内存、核数和shuffle分区设置；设为None时按SPARK_CONF原样启动
+    SPARK_PROFILE = os.environ.get('SPARK_PROFILE', 'interactive')
+    SPARK_POOL_PROFILES = {        # 各调度池（路由）的作业使用的档案
+        'preview': 'interactive',
+        'analysis': 'interactive',
+        'regression': 'batch',
+        'visualization': 'interactive',
     }
+    SPARK_WARMUP_ON_START = True  # 应用启动时在后台预热Spark会话
+    PRELOAD_ON_START = True       # 应用启动后在后台导入数据层模块（pandas等），首个数据请求无需等待导入
+    SPARK_MAX_CONCURRENT_JOBS = 4  # 同时提交到Spark的最大作业数
+    SPARK_POOL_LIMITS = {          # 各调度池的并发作业上限
+        'preview': 2,
+        'analysis': 2,
+        'regression': 1,
+        'visualization': 2,
+    }
+    SPARK_JOB_WAIT_TIMEOUT = 60    # 等待会话就绪或并发名额的超时时间（秒）
+    FAST_PATH_MAX_CELLS = 200000   # 数据单元格数不超过该值时用pandas/scikit-learn在进程内计算，跳过Spark
+    
+    # K-means配置
+    KMEANS_MINIBATCH_MIN_ROWS = 20000  # mode='auto'时样本数达到该值改用mini-batch
+    KMEANS_BATCH_SIZE = 1024           # mini-batch每批的样本数
+    KMEANS_MINIBATCH_MAX_STEPS = 100   # Spark上mini-batch的最大批次数（每批一次Spark作业）
+    KMEANS_WARM_START_TOLERANCE = 0.25  # 数据更新后上次中心的平均误差增加不超过该比例时从上次中心热启动
+    KMEANS_SWEEP_SAMPLE = 2000         # k扫描计算轮廓系数的抽样数（各k共用同一个样本和距离矩阵）
+    
+    # spark-excel依赖JAR配置（python download_jars.py 下载，见app/models/jar_provisioner.py）
+    JAR_CACHE_DIR = os.path.join(BASE_DIR, 'app', 'jars')  # 按SHA-1内容寻址的JAR缓存目录
+    MAVEN_REPOSITORIES = [  # 依次尝试的Maven仓库
+        'https://maven.aliyun.com/repository/public',
+        'https://repo1.maven.org/maven2',
+    ]
+    JAR_DOWNLOAD_WORKERS = 4   # 并行下载的线程数
+    JAR_DOWNLOAD_TIMEOUT = 60  # 单个请求的超时时间（秒）
     
     # 数据处理配置
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 最大上传文件大小：16MB
+    # 上传按块流式写入磁盘，解析和转换在后台任务中进行，上限可以放宽
+    MAX_CONTENT_LENGTH = 512 * 1024 * 1024  # 最大上传文件大小：512MB
     ALLOWED_EXTENSIONS = {'xls', 'xlsx'}    # 允许的文件类型
+    UPLOAD_DIR = os.path.join(DATA_DIR, 'uploads')  # 上传暂存目录
+    UPLOAD_STATUS_DIR = os.path.join(UPLOAD_DIR, 'status')  # 上传任务状态文件，多进程部署时各工作进程都能查询
+    PROCESSED_DIR = os.path.join(DATA_DIR, 'processed')  # 整理后的长表输出目录
+    UPLOAD_CHUNK_SIZE = 1024 * 1024  # 上传写盘的块大小：1MB
+    UPLOAD_WORKERS = 2  # 后台处理上传文件的线程数
+    UPLOAD_JOB_HISTORY = 200  # 内存中保留的上传任务数
+    
+    # 后台分析任务配置
+    JOB_DB = os.path.join(DATA_DIR, 'jobs.sqlite3')  # 持久化的任务队列
+    JOB_WORKERS = 2      # 执行分析任务的线程数
+    JOB_HISTORY = 500    # 保留的已结束任务数
+    
+    # 生产模式（serve.py）：多个Web工作进程共用一个监听端口，另有一个驱动进程独占Spark会话并执行后台任务
+    SERVE_HOST = os.environ.get('SERVE_HOST', '0.0.0.0')
+    SERVE_PORT = int(os.environ.get('SERVE_PORT', 5000))
+    SERVE_WORKERS = int(os.environ.get('SERVE_WORKERS', 0)) or min(os.cpu_count() or 1, 8)  # Web工作进程数
+    # local: 本进程按需创建Spark会话并执行后台任务（开发服务器）；
+    # driver: 驱动进程；client: Web工作进程，不创建Spark会话，任务由驱动进程执行
+    SPARK_ROLE = 'local'
+    SPARK_STATUS_FILE = os.path.join(DATA_DIR, 'spark_status.json')  # 驱动进程发布的Spark会话状态
+    SHARED_DATASETS = False  # 数据集、面板以只读内存映射文件在进程间共享（serve.py开启）
+    SHARED_DATA_DIR = os.path.join(DATA_DIR, 'shared')  # 数据集的Arrow IPC副本
+    
+    # 指标数据目录：指标编号 -> 数据文件名（不含扩展名）
+    DATA_MAP = {
+        'index': '1997-2022年市场化指数（含分项指数）',
+        'province1': '分省年度数据',
+        'province2': '分省年度数据-GDP',
+        'province3': '分省年度数据-第二产业增加值',
+        'province4': '分省年度数据-第三产业增加值',
+        'province5': '分省年度数据-二氧化硫排放量',
+        'province6': '分省年度数据-工业增加值',
+        'province7': '分省年度数据-规模以上工业企业R&D经费‘’支出‘’',
+        'province8': '分省年度数据-规模以上工业企业利润总额',
+        'province9': '分省年度数据-规模以上工业企业主营业务成本',
+        'province10': '分省年度数据-规模以上工业营业收入',
+        'province11': '分省年度数据-化学需氧量',
+        'province12': '分省年度数据-货物进出口总额',
+        'province13': '分省年度数据-煤炭消费量',
+        'province14': '分省年度数据-外商直接投资额',
+        'product1': '制造业高质量发展指数',
+        'product2': '制造业指标',
+    }
+    PANEL_FILE = os.path.join(DATA_DIR, 'indicator_panel.bin')  # 指标面板的内存映射文件
+    COMPACT_FLOATS = True  # 面板数值能按数据的小数位数无损还原时以float32保存
+    FLOAT32_MAX_DECIMALS = 6  # 判断数据小数位数时最多检查的位数，超过时保持float64
+    
+    # 分析结果缓存配置
+    RESULT_CACHE_DIR = os.path.join(DATA_DIR, 'result_cache')  # 磁盘缓存目录
+    RESULT_CACHE_MAX_ENTRIES = 256  # 内存LRU缓存的最大条目数
+    RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 磁盘缓存总大小上限：256MB
+    
+    # 图表渲染配置
+    CHART_CACHE_DIR = os.path.join(BASE_DIR, 'app', 'static', 'images', 'charts')  # 内容寻址的图表目录
+    CHART_WORKERS = 2  # 常驻的Matplotlib渲染进程数
+    CHART_RENDER_TIMEOUT = 60  # 单张图表渲染超时（秒）
+    CHART_DPI = 100
+    CHART_MAX_POINTS = 500  # JSON图表数据每张图最多返回的点数（超过时降采样）
+    CHART_MAX_CATEGORIES = 40  # 柱状图/饼图最多的类别数，其余合并为“其他”
+    CHART_GZIP_MIN_BYTES = 1024  # 超过该大小的JSON响应进行gzip压缩
+    CORRELATION_MIN_PERIODS = 3  # 计算相关系数所需的最少共同观测数，不足时为缺失
+    
+    # 批量报告导出：DATA_MAP中每个指标的全部图表类型，以及K-means聚类和趋势回归摘要
+    EXPORT_DIR = os.path.join(DATA_DIR, 'exports')  # 后台任务导出的ZIP文件
+    EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', 0)) or None  # 导出进程数，None时为CPU核数
+    EXPORT_KEEP = 10  # EXPORT_DIR中保留的最近导出文件数
+    EXPORT_KMEANS_K = 3  # 聚类摘要的类别数
+    EXPORT_TREND_DEGREE = 1  # 趋势回归摘要的多项式次数
+    EXPORT_TREND_HORIZON = 3  # 趋势回归摘要预测的年数
+    
+    # 性能剖析配置：开启后请求可以带 ?_profile=cprofile 或 ?_profile=pyspy 生成剖析文件
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+    PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+    
+    # Parquet缓存配置
+    PARQUET_CACHE_DIR = os.path.join(DATA_DIR, 'parquet_cache')  # 本地Parquet缓存目录
+    PARQUET_ROW_GROUP_SIZE = 10000  # Parquet行组大小，分页预览按行组定位，只读取需要的行组
+    EXCEL_READER = 'stream'  # Excel解析方式：stream（流式读取器，见xlsx_reader.py）或 pandas（pd.read_excel）
+    XLSX_BATCH_ROWS = 10000  # 流式读取器输出Arrow record batch时每批的行数
+    
+    # 数据预览配置
+    PREVIEW_PAGE_SIZE = 100       # 每页默认行数
+    PREVIEW_MAX_PAGE_SIZE = 1000  # 每页最大行数
+    PREVIEW_CHUNK_ROWS = 1000     # 流式预览每块行数
+    
+    # 统计索引配置：各数据集的基本统计和年份汇总预先计算，数据追加后增量更新
+    STATS_INDEX_DIR = os.path.join(DATA_DIR, 'stats_index')
+    STATS_INDEX_CHUNK_ROWS = 1000  # 列统计的分块行数，数据变化时只重新计算变化的块
     
     @staticmethod
     def init_app(app):
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+批量导出月度报告：DATA_MAP中每个指标 × 每种图表类型，以及K-means聚类和趋势回归摘要，写入一个ZIP
+
+项目在 --workers 个进程中并行生成（默认CPU核数），完成一项写入一项；数据没有变化的项目复用上一次的结果。
+结束后按耗时列出每一项，以及总耗时、各项耗时之和和并行度。
+
+用法:
+    python export_report.py [--output data/exports/report.zip] [--workers 4]
+    python export_report.py --indicators province3,province4 --chart-types bar,line --json manifest.json
+"""
+
+import argparse
+import json
+import os
+import time
+
+from config import Config
+
+
+def print_manifest(manifest, top=None):
+    items = sorted(manifest['items'], key=lambda entry: entry['seconds'], reverse=True)
+    print(f"\n{'项目':<28}{'类型':<12}{'耗时(秒)':>10}{'大小(KB)':>10}  状态")
+    for entry in items[:top] if top else items:
+        state = '复用' if entry['reused'] else ('失败: ' + entry['error'] if entry['error'] else '生成')
+        print(f"{entry['path']:<28}{entry['kind']:<12}{entry['seconds']:>10.3f}{entry['bytes'] / 1024:>10.1f}  {state}")
+
+    busy = sum(entry['seconds'] for entry in manifest['items'])
+    print(f"\n共 {len(manifest['items'])} 项：生成 {manifest['generated']}，复用 {manifest['reused']}，"
+          f"失败 {manifest['failed']}；{manifest['workers']} 个进程")
+    print(f"总耗时 {manifest['seconds']:.2f} 秒，各项耗时之和 {busy:.2f} 秒，"
+          f"并行度 {busy / manifest['seconds'] if manifest['seconds'] else 0:.2f}")
+    if manifest['missing']:
+        print(f"未找到数据文件的指标: {', '.join(manifest['missing'])}")
+    print(f"报告已写入: {manifest['output']}")
+
+
+def _split(value):
+    return [part.strip() for part in value.split(',') if part.strip()] if value else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量导出全部指标的图表和分析摘要')
+    parser.add_argument('--output', help='ZIP文件路径（默认 data/exports/report-日期时间.zip）')
+    parser.add_argument('--workers', type=int, help='并行进程数（默认CPU核数）')
+    parser.add_argument('--indicators', help='逗号分隔的指标编号，默认DATA_MAP中的全部指标')
+    parser.add_argument('--chart-types', help='逗号分隔的图表类型，默认全部')
+    parser.add_argument('--top', type=int, help='只列出耗时最多的若干项')
+    parser.add_argument('--json', help='把清单写入JSON文件')
+    args = parser.parse_args()
+
+    from app.models.report_export import export_report
+
+    output = args.output or os.path.join(Config.EXPORT_DIR, time.strftime('report-%Y%m%d-%H%M%S.zip'))
+    try:
+        manifest = export_report(output, indicators=_split(args.indicators), chart_types=_split(args.chart_types),
+                                 workers=args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    print_manifest(manifest, args.top)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        print(f"清单已写入: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+负载测试：数据预览、分析和图表接口的吞吐量（请求/秒）与延迟分位数
+
+按接口分组依次压测，每组在 --duration 秒内由 --concurrency 个并发客户端循环请求，
+报告每组的请求数、错误数、请求/秒和p50/p95/p99延迟。请求参数（数据集、数值列）从
+/preview接口的第一页自动推断。
+
+    preview   /preview/<数据集> 第一页和后续页
+    analysis  /preview/<数据集>/stats、/years，/correlation、/correlation/dataset/<数据集>
+    chart     /charts/data（折线图、柱状图、热力图）和 /charts/render
+
+用法:
+    python loadtest.py [--url http://127.0.0.1:5000] [--duration 10] [--concurrency 16]
+    python loadtest.py --spawn 1,4          # 依次以1个和4个工作进程启动serve.py并压测，便于对比
+    python loadtest.py --groups preview,chart --json report.json
+"""
+
+import argparse
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+GROUPS = ('preview', 'analysis', 'chart')
+
+
+def fetch(url, timeout=60):
+    """发出GET请求，返回(状态码, 响应体)"""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def discover(base, limit):
+    """从数据集列表和预览第一页推断压测用的数据集和数值列：[(数据集, 第一列, 数值列, 下一页游标)]"""
+    sources = sorted(name for name in os.listdir(ROOT)
+                     if name.lower().endswith(('.xls', '.xlsx')) and not name.startswith('~$'))
+    datasets = []
+    for name in sources[:limit]:
+        status, body = fetch(f"{base}/preview/{urllib.parse.quote(name)}?limit=20")
+        if status != 200:
+            print(f"跳过数据集 {name}: 预览返回 {status}")
+            continue
+        page = json.loads(body)
+        numeric = [column for i, column in enumerate(page['columns'][1:], start=1)
+                   if page['rows'] and all(isinstance(row[i], (int, float)) or row[i] is None for row in page['rows'])]
+        if numeric:
+            datasets.append((name, page['columns'][0], numeric, page['next_cursor']))
+    return datasets
+
+
+def build_requests(base, datasets):
+    """各分组的请求地址列表"""
+    requests = {group: [] for group in GROUPS}
+    for name, x, numeric, cursor in datasets:
+        quoted = urllib.parse.quote(name)
+        requests['preview'].append(f"{base}/preview/{quoted}?limit=100")
+        if cursor:
+            requests['preview'].append(f"{base}/preview/{quoted}?limit=50&cursor={urllib.parse.quote(cursor)}")
+        requests['analysis'] += [f"{base}/preview/{quoted}/stats", f"{base}/preview/{quoted}/years",
+                                 f"{base}/correlation/dataset/{quoted}"]
+        for chart_type, y in (('line', numeric[:3]), ('bar', numeric[:1]), ('heatmap', numeric[:8])):
+            query = urllib.parse.urlencode([('dataset', name), ('type', chart_type), ('x', x)] + [('y', c) for c in y])
+            requests['chart'].append(f"{base}/charts/data?{query}")
+        query = urllib.parse.urlencode([('dataset', name), ('type', 'line'), ('x', x)] + [('y', c) for c in numeric[:3]])
+        requests['chart'].append(f"{base}/charts/render?{query}")
+    requests['analysis'] += [f"{base}/correlation", f"{base}/correlation?method=spearman", f"{base}/correlation/pairs"]
+    return requests
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    return sorted_values[max(math.ceil(p * len(sorted_values)) - 1, 0)]
+
+
+def run_group(urls, duration, concurrency):
+    """并发循环请求urls，返回统计结果"""
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(offset):
+        i = offset
+        own, failed = [], 0
+        while time.perf_counter() < deadline:
+            url = urls[i % len(urls)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                status, _ = fetch(url)
+            except OSError:
+                status = None
+            own.append(time.perf_counter() - start)
+            if status != 200:
+                failed += 1
+        with lock:
+            latencies.extend(own)
+            errors[0] += failed
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': (percentile(latencies, 0.50) or 0) * 1000,
+        'p95_ms': (percentile(latencies, 0.95) or 0) * 1000,
+        'p99_ms': (percentile(latencies, 0.99) or 0) * 1000,
+    }
+
+
+def loadtest(base, groups, duration, concurrency, datasets_limit):
+    datasets = discover(base, datasets_limit)
+    if not datasets:
+        raise RuntimeError('没有可用于压测的数据集')
+    requests = build_requests(base, datasets)
+    # 预热：每个地址请求一次，生成Parquet/Arrow副本、统计索引、缓存的图表
+    for group in groups:
+        for url in requests[group]:
+            fetch(url)
+
+    results = {}
+    print(f"\n{'分组':<10}{'地址数':>8}{'请求数':>10}{'错误':>8}{'请求/秒':>12}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}")
+    for group in groups:
+        result = run_group(requests[group], duration, concurrency)
+        result['urls'] = len(requests[group])
+        results[group] = result
+        print(f"{group:<10}{result['urls']:>8}{result['requests']:>10}{result['errors']:>8}{result['rps']:>12.1f}"
+              f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}")
+    return results
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def spawn_server(workers, timeout=120):
+    """以指定工作进程数启动serve.py，返回(进程, 基础地址)"""
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'serve.py'), '--host', '127.0.0.1',
+                                '--port', str(port), '--workers', str(workers)],
+                               cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"serve.py已退出（返回码 {process.returncode}）")
+        try:
+            if fetch(f"{base}/health", timeout=1)[0] == 200:
+                return process, base
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"serve.py在{timeout}秒内没有响应")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='预览、分析、图表接口的负载测试')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='被测服务地址')
+    parser.add_argument('--spawn', help='逗号分隔的工作进程数，依次启动serve.py压测（忽略--url）')
+    parser.add_argument('--duration', type=float, default=10, help='每组压测秒数')
+    parser.add_argument('--concurrency', type=int, default=16, help='并发客户端数')
+    parser.add_argument('--groups', default=','.join(GROUPS), help=f"压测的分组（{', '.join(GROUPS)}）")
+    parser.add_argument('--datasets', type=int, default=5, help='最多使用的数据集个数')
+    parser.add_argument('--json', help='把结果写入JSON文件')
+    args = parser.parse_args()
+
+    groups = [group.strip() for group in args.groups.split(',') if group.strip()]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"未知的分组: {', '.join(sorted(unknown))}")
+
+    report = {}
+    if args.spawn:
+        for workers in [int(n) for n in args.spawn.split(',')]:
+            print(f"\n=== {workers} 个工作进程，并发 {args.concurrency}，每组 {args.duration} 秒 ===")
+            process, base = spawn_server(workers)
+            try:
+                report[f'workers={workers}'] = loadtest(base, groups, args.duration, args.concurrency, args.datasets)
+            finally:
+                process.terminate()
+                process.wait()
+    else:
+        print(f"=== {args.url}，并发 {args.concurrency}，每组 {args.duration} 秒 ===")
+        report[args.url] = loadtest(args.url.rstrip('/'), groups, args.duration, args.concurrency, args.datasets)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+数据层内存占用报告：各数据集各处理阶段、指标面板的字节数，以及按float64/object存储时的对照
+
+用法:
+    python memory_report.py [数据集 ...] [--shared] [--no-panel] [--json report.json]
+"""
+
+import argparse
+import json
+
+from config import Config
+
+
+def _kb(n):
+    return f"{n / 1024:.1f}"
+
+
+def print_report(report):
+    print(f"{'数据集/阶段':<28}{'形状':>14}{'总计(KB)':>10}{'共用(KB)':>10}{'映射(KB)':>10}"
+          f"{'自身(KB)':>10}{'对照(KB)':>10}  类型")
+    for dataset in report['datasets']:
+        print(dataset['dataset'])
+        for stage in dataset['stages']:
+            shape = '×'.join(str(n) for n in stage['shape'])
+            print(f"  {stage['stage']:<26}{shape:>14}{_kb(stage['bytes']):>10}{_kb(stage['shared_bytes']):>10}"
+                  f"{_kb(stage['mapped_bytes']):>10}{_kb(stage['own_bytes']):>10}{_kb(stage['baseline_bytes']):>10}"
+                  f"  {', '.join(stage['dtypes'])}")
+    own = sum(dataset['own_bytes'] for dataset in report['datasets'])
+    baseline = sum(dataset['baseline_bytes'] for dataset in report['datasets'])
+    print(f"\n数据集合计: 自身 {_kb(own)} KB，按float64/object存储 {_kb(baseline)} KB")
+    for dataset, error in report['errors'].items():
+        print(f"跳过 {dataset}: {error}")
+
+    panel = report.get('panel')
+    if panel:
+        print(f"\n指标面板 {panel['shape']}: {panel['dtype']}"
+              f"（小数位 {panel['decimals']}）{'，内存映射' if panel['mapped'] else ''}")
+        print(f"  数值 {_kb(panel['bytes'])} KB，按float64 {_kb(panel['baseline_bytes'])} KB，"
+              f"标签 {panel['label_bytes']} 字节")
+    print(f"标签字典: 省份 {report['labels']['provinces']}，指标 {report['labels']['indicators']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据层内存占用报告')
+    parser.add_argument('datasets', nargs='*', help='数据集文件名，默认全部')
+    parser.add_argument('--shared', action='store_true', help='按多进程模式以内存映射方式读取数据集')
+    parser.add_argument('--no-panel', action='store_true', help='不统计指标面板')
+    parser.add_argument('--json', help='把报告写入JSON文件')
+    args = parser.parse_args()
+
+    if args.shared:
+        Config.SHARED_DATASETS = True
+    from app.models.memory import memory_report
+
+    report = memory_report(args.datasets or None, panel=not args.no_panel)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"报告已写入: {args.json}")
+
+
+if __name__ == '__main__':
+    main()
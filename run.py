@@ -1,7 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from app import app
+import atexit
+
+from app.factory import create_app, shutdown
+
+app = create_app()
+atexit.register(shutdown)
  
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True) 
\ No newline at end of file
+    app.run(host='0.0.0.0', port=5000, debug=True)
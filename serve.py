@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+生产模式入口：多个Web工作进程共用一个监听端口，另有一个独占Spark会话的驱动进程
+
+启动顺序：
+1. 主进程准备共享数据：各数据集的Parquet副本和Arrow IPC副本、指标面板文件，并导入数据层模块，
+   之后fork出的子进程直接共用这些内存页；
+2. 主进程创建监听端口并fork出 --workers 个Web工作进程，由内核在进程间分发连接。
+   工作进程内是多线程的WSGI服务器，数据集、面板和结果缓存以只读内存映射方式打开，
+   不创建Spark会话（Config.SPARK_ROLE为client）；
+3. 再fork一个驱动进程（SPARK_ROLE为driver）：唯一创建Spark会话的进程，执行后台分析任务（/jobs），
+   并把会话状态发布给工作进程的/ready。
+主进程监控子进程，异常退出的自动重启；收到SIGTERM/SIGINT时通知所有子进程退出。
+Windows没有fork，退化为单进程多线程服务。
+
+用法:
+    python serve.py [--host 0.0.0.0] [--port 5000] [--workers 4] [--no-driver]
+
+吞吐量和延迟可用 python loadtest.py --spawn 1,4 对比。
+"""
+
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+
+from config import Config
+
+SHUTDOWN_TIMEOUT = 30  # 等待子进程退出的秒数
+
+
+def prepare():
+    """生成进程间共享的数据文件并导入数据层模块"""
+    import importlib
+
+    Config.SHARED_DATASETS = True
+    from app.factory import PRELOAD_MODULES
+    from app.models import shared_data
+    from app.models.panel import get_panel
+    from app.models.parquet_cache import ensure_parquet, list_source_workbooks
+
+    start = time.perf_counter()
+    for name in PRELOAD_MODULES:
+        importlib.import_module(name)
+    datasets = 0
+    for source in list_source_workbooks():
+        try:
+            shared_data.export(ensure_parquet(source))
+            datasets += 1
+        except Exception as e:
+            print(f"准备共享数据失败 {os.path.basename(source)}: {str(e)}")
+    removed = shared_data.prune()
+    try:
+        panel = get_panel()
+        print(f"指标面板 {panel.shape} 已映射: {Config.PANEL_FILE}")
+    except Exception as e:
+        print(f"构建指标面板失败: {str(e)}")
+    print(f"共享数据准备完成: {datasets} 个数据集，清理 {removed} 个旧副本，"
+          f"耗时 {time.perf_counter() - start:.2f} 秒")
+
+
+def listen(host, port, backlog=128):
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, host, port):
+    """Web工作进程：在继承来的监听端口上运行多线程WSGI服务器"""
+    from werkzeug.serving import make_server
+    from app.factory import shutdown
+
+    Config.SPARK_ROLE = 'client'
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C由主进程统一处理
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    print(f"Web工作进程 {os.getpid()} 已启动")
+    try:
+        server.serve_forever()
+    finally:
+        shutdown()
+
+
+def run_driver():
+    """驱动进程：预热Spark会话，执行后台分析任务"""
+    from app.factory import shutdown
+    from app.models.jobs import get_job_queue
+    from app.models.spark_manager import get_spark_manager
+
+    Config.SPARK_ROLE = 'driver'
+    stopping = threading.Event()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    if Config.SPARK_WARMUP_ON_START:
+        get_spark_manager().start_warmup()
+    get_job_queue()
+    print(f"驱动进程 {os.getpid()} 已启动，执行后台任务的线程数: {Config.JOB_WORKERS}")
+    stopping.wait()
+    shutdown()
+
+
+class Supervisor:
+    """启动并监控子进程，异常退出的自动重启"""
+
+    def __init__(self):
+        self._context = multiprocessing.get_context('fork')
+        self._children = {}
+        self._stopping = threading.Event()
+
+    def spawn(self, name, target, *args):
+        process = self._context.Process(target=target, args=args, name=name)
+        process.start()
+        self._children[name] = (target, args, process)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, lambda *_: self._stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: self._stopping.set())
+        while not self._stopping.wait(1):
+            for name, (target, args, process) in list(self._children.items()):
+                if not process.is_alive():
+                    print(f"{name} 已退出（返回码 {process.exitcode}），重新启动")
+                    self.spawn(name, target, *args)
+        self.stop()
+
+    def stop(self):
+        print("正在停止所有子进程...")
+        processes = [process for _, _, process in self._children.values()]
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        deadline = time.time() + SHUTDOWN_TIMEOUT
+        for process in processes:
+            process.join(max(deadline - time.time(), 0))
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+
+def serve_single(app, host, port):
+    """没有fork的平台：单进程多线程服务"""
+    from werkzeug.serving import make_server
+    from app.factory import shutdown, start_warmup
+
+    print("当前平台不支持fork，以单进程多线程模式运行")
+    start_warmup()
+    server = make_server(host, port, app, threaded=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生产模式：多进程Web服务 + Spark驱动进程')
+    parser.add_argument('--host', default=Config.SERVE_HOST)
+    parser.add_argument('--port', type=int, default=Config.SERVE_PORT)
+    parser.add_argument('--workers', type=int, default=Config.SERVE_WORKERS, help='Web工作进程数')
+    parser.add_argument('--no-driver', action='store_true', help='不启动驱动进程（后台任务由其他实例执行）')
+    args = parser.parse_args()
+
+    prepare()
+    from app.factory import create_app
+    app = create_app(warmup=False)
+
+    if not hasattr(os, 'fork'):
+        serve_single(app, args.host, args.port)
+        return
+
+    sock = listen(args.host, args.port)
+    supervisor = Supervisor()
+    for i in range(max(args.workers, 1)):
+        supervisor.spawn(f'web-{i}', run_worker, app, sock, args.host, args.port)
+    if not args.no_driver:
+        supervisor.spawn('spark-driver', run_driver)
+    print(f"已在 http://{args.host}:{args.port} 启动 {max(args.workers, 1)} 个Web工作进程"
+          f"{'' if args.no_driver else '和1个驱动进程'}")
+    supervisor.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+启动耗时报告：应用创建时导入了哪些模块、各花了多少时间，以及从启动进程到响应第一个HTTP请求的耗时
+
+导入耗时来自 python -X importtime（在子进程中执行create_app），按顶层包汇总累计耗时，
+并列出启动时被导入的重量级依赖（应用创建时不应导入它们）。可在CI中用--max-seconds检查回退。
+
+用法:
+    python startup_report.py [--top 15] [--repeat 3] [--max-seconds 1.0] [--json report.json]
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# 应用创建时不应导入的重量级依赖
+HEAVY_PACKAGES = ('pandas', 'numpy', 'pyarrow', 'pyspark', 'py4j', 'sklearn', 'scipy', 'matplotlib', 'seaborn')
+
+CREATE_APP = "from app.factory import create_app; create_app(warmup=False)"
+
+SERVE = """
+import sys
+from werkzeug.serving import make_server
+from app.factory import create_app
+server = make_server('127.0.0.1', int(sys.argv[1]), create_app(), threaded=True)
+server.serve_forever()
+"""
+
+
+def parse_importtime(stderr):
+    """
+    解析 -X importtime 的输出
+
+    返回 [(模块名, 自身耗时秒, 累计耗时秒, 嵌套深度)]，顺序与输出相同（被导入的模块在前）
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        modules.append((name.strip(), int(self_us) / 1e6, int(cumulative_us) / 1e6, depth))
+    return modules
+
+
+def import_profile():
+    """在全新的解释器中执行create_app，返回 (总耗时秒, 导入记录)"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', CREATE_APP], cwd=ROOT,
+                            capture_output=True, text=True, encoding='utf-8', errors='replace')
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"创建应用失败:\n{result.stderr[-2000:]}")
+    return elapsed, parse_importtime(result.stderr)
+
+
+def summarize(modules):
+    """按顶层包汇总各模块自身的导入耗时：{包名: 秒}"""
+    packages = {}
+    for name, own, _, _ in modules:
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0.0) + own
+    return packages
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def first_response(timeout=30):
+    """启动应用服务进程，返回从启动进程到/health返回200的秒数"""
+    port = _free_port()
+    url = f'http://127.0.0.1:{port}/health'
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', SERVE, str(port)], cwd=ROOT,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"应用服务进程已退出（返回码 {process.returncode}）")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"{timeout}秒内没有响应")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='应用启动耗时报告')
+    parser.add_argument('--top', type=int, default=15, help='列出耗时最多的前N个顶层包')
+    parser.add_argument('--repeat', type=int, default=3, help='测量首个请求耗时的次数（取中位数）')
+    parser.add_argument('--max-seconds', type=float, help='首个请求耗时超过该值时以返回码1退出')
+    parser.add_argument('--json', help='把报告写入JSON文件')
+    args = parser.parse_args()
+
+    create_seconds, modules = import_profile()
+    packages = summarize(modules)
+    print(f"创建应用（含解释器启动）: {create_seconds:.3f} 秒，导入 {len(modules)} 个模块，"
+          f"导入合计 {sum(packages.values()):.3f} 秒")
+    print(f"\n{'顶层包':<30}{'导入耗时(ms)':>18}")
+    for package, seconds in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{package:<30}{seconds * 1000:>18.1f}")
+
+    heavy = sorted({name.split('.')[0] for name, *_ in modules} & set(HEAVY_PACKAGES))
+    if heavy:
+        print(f"\n警告：创建应用时导入了重量级依赖: {', '.join(heavy)}")
+
+    timings = [first_response() for _ in range(max(args.repeat, 1))]
+    seconds = statistics.median(timings)
+    print(f"\n从启动进程到响应第一个请求: {seconds:.3f} 秒"
+          f"（{len(timings)} 次: {', '.join(f'{t:.3f}' for t in timings)}）")
+
+    if args.json:
+        report = {
+            'create_app_seconds': create_seconds,
+            'first_response_seconds': seconds,
+            'first_response_timings': timings,
+            'packages': packages,
+            'heavy_imports': heavy,
+            'modules': [{'name': name, 'self': own, 'cumulative': cumulative, 'depth': depth}
+                        for name, own, cumulative, depth in modules],
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"报告已写入: {args.json}")
+
+    if args.max_seconds is not None and seconds > args.max_seconds:
+        print(f"首个请求耗时超过 {args.max_seconds} 秒")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试Arrow转换路径的记录：Arrow不支持的数据类型事先走逐行转换、转换失败时不记为Arrow
+
+用模拟的Spark会话，不需要启动Spark。
+
+运行: python -m pytest test_arrow_bridge.py
+"""
+
+import pandas as pd
+import pytest
+
+from app.models import arrow_bridge
+from app.models.arrow_bridge import ARROW_ENABLED_KEY, to_spark, transfer_stats
+
+
+class FakeConf:
+    def get(self, key, default=None):
+        return 'true' if key == ARROW_ENABLED_KEY else default
+
+
+class FakeSpark:
+    """createDataFrame按behavior模拟Arrow成功或抛出异常"""
+
+    conf = FakeConf()
+
+    def __init__(self, behavior):
+        self.behavior = behavior
+        self.calls = []
+
+    def createDataFrame(self, data, schema=None):
+        self.calls.append(type(data).__name__)
+        if isinstance(data, pd.DataFrame) and self.behavior == 'error':
+            raise RuntimeError('Arrow转换失败')
+        return data
+
+
+@pytest.fixture(autouse=True)
+def counters(monkeypatch):
+    monkeypatch.setattr(arrow_bridge, '_counters', arrow_bridge.Counter())
+    monkeypatch.setattr(arrow_bridge, '_pyarrow', True)
+
+
+def test_arrow_recorded_only_when_used():
+    pdf = pd.DataFrame({'a': [1.0, 2.0]})
+    to_spark(FakeSpark('arrow'), pdf)
+    assert transfer_stats() == {'to_spark.arrow': 1}
+
+    # 混合类型的对象列推断不出Arrow类型，不尝试Arrow（Spark会自动退回），直接逐行转换
+    spark = FakeSpark('arrow')
+    to_spark(spark, pd.DataFrame({'a': [1, 'x']}))
+    assert spark.calls == ['list']
+    assert transfer_stats() == {'to_spark.arrow': 1, 'to_spark.pickle': 1}
+
+    spark = FakeSpark('error')
+    to_spark(spark, pdf)
+    assert spark.calls == ['DataFrame', 'list']
+    assert transfer_stats() == {'to_spark.arrow': 1, 'to_spark.pickle': 2}
+
+
+def test_empty_frame_is_not_recorded_as_arrow():
+    to_spark(FakeSpark('arrow'), pd.DataFrame({'a': pd.Series([], dtype=float)}))
+    assert transfer_stats() == {'to_spark.pickle': 1}
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试批量趋势回归：与逐个序列用np.polyfit拟合的系数、R²、RMSE和预测值一致，
+缺失年份不计入，样本数不超过次数的序列结果为NaN
+
+运行: python -m pytest test_batch_regression.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models.batch_regression import coefficient_names, trend_regression
+from app.models.panel import IndicatorPanel
+
+YEARS = list(range(2001, 2013))
+PROVINCES = ['甲', '乙', '丙', '丁']
+
+
+@pytest.fixture
+def panel():
+    rng = np.random.RandomState(3)
+    t = np.arange(len(YEARS), dtype=float)
+    frames = {}
+    for name in ('gdp', 'pop'):
+        data = np.array([100 + 5 * t + 0.3 * t ** 2 + rng.normal(0, 2, len(t)) for _ in PROVINCES])
+        data[0, [2, 5, 6]] = np.nan  # 缺失年份
+        data[1, :] = np.nan
+        data[1, [3, 8]] = [10.0, 20.0]  # 只有两个样本：一次趋势可解，二次不可解
+        data[2, :] = np.nan
+        data[2, 4] = 7.0  # 只有一个样本
+        frames[name] = pd.DataFrame(data, index=PROVINCES, columns=YEARS)
+    return IndicatorPanel.from_frames(frames, version='v1')
+
+
+def _expected(panel, indicator, province, degree, horizon):
+    """逐个序列用np.polyfit拟合"""
+    y = panel.to_frame(indicator).loc[province].to_numpy(dtype=float)
+    t = np.asarray(panel.years, dtype=float) - panel.years[0]
+    observed = ~np.isnan(y)
+    t, y = t[observed], y[observed]
+    if len(y) <= degree:
+        return None
+    coefficients = np.polyfit(t, y, degree)
+    fitted = np.polyval(coefficients, t)
+    sse = ((y - fitted) ** 2).sum()
+    sst = ((y - y.mean()) ** 2).sum()
+    future = np.arange(1, horizon + 1) + panel.years[-1] - panel.years[0]
+    return {
+        'n': len(y),
+        'coefficients': coefficients[::-1],
+        'r2': 1 - sse / sst if sst > 0 else np.nan,
+        'rmse': np.sqrt(sse / len(y)),
+        'forecasts': np.polyval(coefficients, future),
+    }
+
+
+@pytest.mark.parametrize('degree', [1, 2])
+def test_matches_per_series_polyfit(panel, degree):
+    horizon = 3
+    table = trend_regression(panel, degree=degree, horizon=horizon).set_index(['indicator', 'province'])
+    forecast_columns = [f'forecast_{YEARS[-1] + h}' for h in range(1, horizon + 1)]
+    for indicator in panel.indicators:
+        for province in PROVINCES:
+            row = table.loc[(indicator, province)]
+            expected = _expected(panel, indicator, province, degree, horizon)
+            if expected is None:
+                # 样本数不超过次数：保留该序列，系数和指标为NaN
+                assert row[coefficient_names(degree) + ['r2', 'rmse'] + forecast_columns].isna().all()
+                continue
+            assert row['n'] == expected['n']
+            np.testing.assert_allclose(row[coefficient_names(degree)].to_numpy(dtype=float),
+                                       expected['coefficients'], rtol=1e-8, atol=1e-8)
+            np.testing.assert_allclose(row['rmse'], expected['rmse'], rtol=1e-6, atol=1e-9)
+            np.testing.assert_allclose(row[forecast_columns].to_numpy(dtype=float), expected['forecasts'],
+                                       rtol=1e-8)
+            if np.isnan(expected['r2']):
+                assert np.isnan(row['r2'])
+            else:
+                np.testing.assert_allclose(row['r2'], expected['r2'], rtol=1e-8, atol=1e-10)
+
+
+def test_series_without_data_are_dropped(panel):
+    table = trend_regression(panel, degree=1)
+    assert '丁' in set(table['province'])
+    assert len(table) == len(panel.indicators) * len(PROVINCES)
+    empty = IndicatorPanel(np.full((1, 2, len(YEARS)), np.nan), ['gdp'], ['甲', '乙'], YEARS)
+    assert trend_regression(empty).empty
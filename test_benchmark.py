@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+基准测试的冒烟测试：在合成工作簿上跑完整套测量；某个数据集失败时记录错误并继续
+
+运行: python -m pytest test_benchmark.py
+"""
+
+import json
+import sys
+
+import pytest
+
+from config import Config
+import benchmark
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    # main()把缓存目录指向临时目录，测试结束后恢复
+    for name in ('PARQUET_CACHE_DIR', 'RESULT_CACHE_DIR', 'CHART_CACHE_DIR'):
+        monkeypatch.setattr(Config, name, str(tmp_path / name.lower()))
+
+
+def test_synthetic_suite_runs(tmp_path, monkeypatch):
+    history_dir = tmp_path / 'history'
+    monkeypatch.setattr(sys, 'argv', ['benchmark.py', '--engines', 'pandas', '--scales', '1', '--repeat', '1',
+                                      '--no-real', '--history-dir', str(history_dir)])
+    benchmark.main()
+
+    run = json.loads((history_dir / 'history.jsonl').read_text(encoding='utf-8'))
+    assert run['failures'] == []
+    tasks = {(result['task'], result['engine']) for result in run['results']}
+    assert tasks == {('excel_parse', '-'), ('excel_pandas', '-'), ('parquet_load', '-'), ('preview', '-'),
+                     ('kmeans', 'pandas'), ('regression', 'pandas'), ('chart_json', '-'), ('chart_png', '-')}
+
+
+def test_failed_dataset_is_recorded(tmp_path, monkeypatch):
+    paths = benchmark.make_synthetic_workbooks(str(tmp_path), 1)[:3]
+    suite = benchmark.Benchmark(['pandas'], 1, str(tmp_path))
+    suite.run_dataset('missing', [str(tmp_path / '不存在.xlsx')])
+    suite.run_dataset('synthetic', paths)
+    assert [failure['dataset'] for failure in suite.failures] == ['missing']
+    assert {result['dataset'] for result in suite.results} == {'synthetic'}
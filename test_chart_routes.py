@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试图表数据接口的参数校验：无效参数返回400而不是500，max_points可以放在查询参数或JSON请求体中；
+渲染服务在锁外读取数据，相同图表的并发请求共用一次渲染
+
+运行: python -m pytest test_chart_routes.py
+"""
+
+import pytest
+
+from config import Config
+from app.factory import create_app
+from app.models.parquet_cache import find_source
+
+DATASET = Config.DATA_MAP['province3']
+
+
+@pytest.fixture
+def client():
+    if find_source(DATASET) is None:
+        pytest.skip('缺少示例数据文件')
+    return create_app(warmup=False).test_client()
+
+
+def test_invalid_parameters_return_400(client):
+    response = client.get('/charts/data', query_string={'dataset': DATASET, 'type': 'scatter', 'max_points': -5})
+    assert response.status_code == 400
+    response = client.get('/charts/data', query_string={'dataset': DATASET, 'type': 'line', 'max_points': 'many'})
+    assert response.status_code == 400
+    # 标签列不是数值列，不能作为y
+    x = client.get('/charts/data', query_string={'dataset': DATASET, 'type': 'bar'}).get_json()['x']
+    response = client.get('/charts/data', query_string={'dataset': DATASET, 'type': 'bar', 'y': x})
+    assert response.status_code == 400
+    response = client.post('/charts/render', json={'dataset': DATASET, 'type': 'bar', 'y': [x]})
+    assert response.status_code == 400
+
+
+def test_max_points_from_json_body(client):
+    body = {'dataset': DATASET, 'type': 'scatter', 'max_points': 5}
+    payload = client.post('/charts/data', json=body).get_json()
+    assert payload['returned'] == 5
+    payload = client.get('/charts/data', query_string=body).get_json()
+    assert payload['returned'] == 5
+
+
+def test_cached_render_does_not_load_frame(client, tmp_path, monkeypatch):
+    from app.models import chart_service
+    from app.models.result_cache import dataset_fingerprint
+    from app.models.reshape import key_column
+
+    df = chart_service.read_excel_cached(find_source(DATASET))
+    x, y = chart_service.chart_columns(DATASET)
+    assert x == key_column(df) and y == [c for c in df.select_dtypes('number').columns if c != x]
+
+    monkeypatch.setattr(Config, 'CHART_CACHE_DIR', str(tmp_path))
+    key = chart_service.chart_key(dataset_fingerprint(DATASET), 'bar', x, y)
+    open(chart_service.chart_path(key), 'wb').close()
+
+    def fail(*args, **kwargs):
+        raise AssertionError('缓存命中时不应读取数据')
+
+    monkeypatch.setattr(chart_service, 'read_excel_cached', fail)
+    assert chart_service.ChartRenderer().render(DATASET, 'bar') == key
+
+
+def test_render_loads_data_outside_lock(client, tmp_path, monkeypatch):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from app.models import chart_service
+
+    monkeypatch.setattr(Config, 'CHART_CACHE_DIR', str(tmp_path))
+    renderer = chart_service.ChartRenderer()
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(renderer, '_pool', lambda: pool)
+
+    def render_chart(path, *args):
+        open(path, 'wb').close()
+        return path
+
+    monkeypatch.setattr(chart_service, 'render_chart', render_chart)
+    select = chart_service.select_chart_frame
+    loading, release, loads = threading.Event(), threading.Event(), []
+
+    def slow_select(*args):
+        free = renderer._lock.acquire(blocking=False)
+        if free:
+            renderer._lock.release()
+        loads.append(free)
+        loading.set()
+        release.wait(10)
+        return select(*args)
+
+    monkeypatch.setattr(chart_service, 'select_chart_frame', slow_select)
+    keys = []
+    threads = [threading.Thread(target=lambda: keys.append(renderer.render(DATASET, 'bar'))) for _ in range(2)]
+    threads[0].start()
+    assert loading.wait(10)
+    threads[1].start()
+    # 读取数据期间锁是空闲的，其他图表的请求不会被阻塞；同一图表只登记一次
+    with renderer._lock:
+        assert len(renderer._pending) == 1
+    release.set()
+    for thread in threads:
+        thread.join(10)
+    pool.shutdown()
+    assert loads == [True] and len(keys) == 2 and keys[0] == keys[1]
+    assert renderer._pending == {}
+
+
+def test_render_failure_reaches_waiters(client, tmp_path, monkeypatch):
+    from app.models import chart_service
+
+    monkeypatch.setattr(Config, 'CHART_CACHE_DIR', str(tmp_path))
+
+    def fail(*args):
+        raise ValueError('数据读取失败')
+
+    monkeypatch.setattr(chart_service, 'select_chart_frame', fail)
+    renderer = chart_service.ChartRenderer()
+    monkeypatch.setattr(renderer, '_pool', lambda: None)
+    with pytest.raises(ValueError):
+        renderer.render(DATASET, 'bar')
+    assert renderer._pending == {}
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试紧凑的数据表示：面板数值无损压缩为float32，长表标签为共享的分类编码，宽表整理不复制数据
+
+运行: python -m pytest test_compact_panel.py
+"""
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+from app.models.labels import PROVINCES
+from app.models.memory import stage_report
+from app.models.panel import IndicatorPanel, compact_floats
+from app.models.reshape import drop_empty, melt_province_year, to_province_year
+
+
+def _raw_frame():
+    return pd.DataFrame({
+        '地区': ['北京市', '天津市', '河北省'],
+        '2020年': [36102.6, 14083.7, np.nan],
+        '2021年': [40269.55, np.nan, np.nan],
+        '2019年': [35445.1, 14055.5, 34978.6],
+    })
+
+
+def test_compact_floats_is_lossless_or_falls_back():
+    values = np.array([[1.5, 36102.6, np.nan], [19.17, 0.25, 4419.8]])
+    narrow, decimals = compact_floats(values)
+    assert narrow.dtype == np.float32 and decimals == 2
+    np.testing.assert_array_equal(np.round(narrow.astype(float), decimals), values)
+
+    # float32在该量级上保留不了两位小数，保持float64
+    wide, decimals = compact_floats(np.array([141955.99, 1.0]))
+    assert wide.dtype == np.float64 and decimals is None
+    # 小数位超过上限的数据（计算结果）不压缩
+    assert compact_floats(np.array([1 / 3, 2.0]))[1] is None
+
+
+def test_province_year_views_and_categorical_long_table():
+    raw = _raw_frame()
+    wide = to_province_year(raw)
+    assert list(wide.columns) == [2019, 2020, 2021]
+    assert list(wide.index) == ['北京市', '天津市', '河北省']
+    assert drop_empty(wide) is wide
+
+    long = melt_province_year(wide)
+    assert long['province'].cat.categories.equals(PROVINCES.categories())
+    assert long['year'].dtype == np.int16
+    assert len(long) == wide.notna().to_numpy().sum()
+    assert list(long[long['year'] == 2020]['province']) == ['北京市', '天津市']
+    # 长表的类别就是进程内的省份字典，不同数据集的长表可以直接拼接
+    other = melt_province_year(to_province_year(raw.iloc[:1]))
+    assert pd.concat([long, other])['province'].dtype == long['province'].dtype
+
+    # 分类的类别是进程内共享的省份字典，随其他数据集增长，行数多时编码才明显更省
+    many = pd.concat([long] * 200, ignore_index=True)
+    report = stage_report([('raw', raw), ('wide', wide), ('long', many)])
+    assert report[2]['baseline_bytes'] > report[2]['bytes']
+
+
+def test_panel_save_load_keeps_decimals(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'COMPACT_FLOATS', True)
+    frames = {'gdp': to_province_year(_raw_frame())}
+    panel = IndicatorPanel.from_frames(frames, {'gdp': 'GDP'}, 'v1')
+    assert panel.values.dtype == np.float32 and panel.decimals == 2
+    assert panel.get('gdp', '天津市', 2020) == 14083.7
+    assert panel.as_float64().dtype == np.float64
+
+    path = str(tmp_path / 'panel.bin')
+    panel.save(path)
+    loaded = IndicatorPanel.load(path)
+    assert isinstance(loaded.values, np.memmap) and loaded.decimals == 2
+    pd.testing.assert_frame_equal(loaded.to_frame('gdp'), panel.to_frame('gdp'))
+    assert loaded.to_frame('gdp').loc['北京市', 2021] == 40269.55
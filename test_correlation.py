@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试向量化相关系数：与pandas逐对计算的结果一致，面板各范围和滑动窗口的形状与取值正确
+
+运行: python -m pytest test_correlation.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import Config
+from app.models.correlation import CorrelationEngine, correlate, panel_observations, rank_columns, rolling_correlate
+from app.models.panel import IndicatorPanel
+from app.models.result_cache import ResultCache
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.RandomState(0)
+    values = rng.lognormal(5, 1, (40, 5))
+    values[:, 1] = values[:, 0] * 2 + rng.normal(0, 10, 40)
+    values[rng.rand(40, 5) < 0.2] = np.nan
+    return pd.DataFrame(values, columns=list('abcde'))
+
+
+@pytest.fixture
+def panel():
+    rng = np.random.RandomState(1)
+    years = list(range(2001, 2013))
+    frames = {}
+    for name in ('gdp', 'pop', 'income'):
+        data = rng.lognormal(6, 0.5, (4, len(years)))
+        data[rng.rand(*data.shape) < 0.1] = np.nan
+        frames[name] = pd.DataFrame(data, index=['甲', '乙', '丙', '丁'], columns=years)
+    return IndicatorPanel.from_frames(frames, version='v1')
+
+
+def test_matches_pandas(frame):
+    expected = frame.corr(min_periods=3).to_numpy()
+    np.testing.assert_allclose(correlate(frame.to_numpy(), min_periods=3), expected, atol=1e-10)
+    # 没有缺失值时Spearman按列排名一次
+    complete = frame.dropna()
+    expected = complete.corr(method='spearman').to_numpy()
+    np.testing.assert_allclose(correlate(complete.to_numpy(), 'spearman'), expected, atol=1e-10)
+
+
+def test_spearman_ranks_each_pair_over_shared_rows(frame):
+    expected = frame.corr(method='spearman', min_periods=3).to_numpy()
+    np.testing.assert_allclose(correlate(frame.to_numpy(), 'spearman', min_periods=3), expected, atol=1e-10)
+    # 各列只排名一次的近似在缺失年份不同时与逐对排名不同
+    approximate = correlate(rank_columns(frame.to_numpy()), min_periods=3)
+    assert np.nanmax(np.abs(approximate - expected)) > 1e-3
+
+    batched = correlate(np.stack([frame.to_numpy()[:20], frame.to_numpy()[20:]]), 'spearman', min_periods=3)
+    expected = frame.iloc[20:].corr(method='spearman', min_periods=3).to_numpy()
+    np.testing.assert_allclose(batched[1], expected, atol=1e-10)
+
+
+def test_batched_and_rolling_match_single(frame):
+    values = frame.to_numpy()
+    batched = correlate(np.stack([values[:20], values[20:]]))
+    np.testing.assert_allclose(batched[1], correlate(values[20:]), equal_nan=True)
+
+    rolling = rolling_correlate(values, 10)
+    assert rolling.shape == (31, 5, 5)
+    expected = frame.iloc[7:17].corr(min_periods=3).to_numpy()
+    np.testing.assert_allclose(rolling[7], expected, atol=1e-10)
+
+
+def test_engine_panel_scopes(panel, tmp_path):
+    engine = CorrelationEngine(ResultCache(cache_dir=str(tmp_path)))
+    national = engine.indicator_matrix(panel=panel)
+    long = pd.DataFrame({name: panel.indicator(name).ravel() for name in panel.indicators})
+    np.testing.assert_allclose(national.to_numpy(), long.corr(min_periods=3).to_numpy(), atol=1e-10)
+
+    province = engine.indicator_matrix(province='乙', indicators=['income', 'gdp'], panel=panel)
+    expected = pd.DataFrame({name: panel.to_frame(name).loc['乙'] for name in ('income', 'gdp')}).corr(min_periods=3)
+    np.testing.assert_allclose(province.to_numpy(), expected.to_numpy(), atol=1e-10)
+
+    series = engine.rolling_pair('gdp', 'pop', window=5, province='甲', panel=panel)
+    assert list(series) == list(range(2005, 2013))
+    assert engine.panel_matrices('pearson', 'province', 5, panel) is engine.panel_matrices('pearson', 'province', 5, panel)
+    with pytest.raises(KeyError):
+        engine.indicator_matrix(province='不存在', panel=panel)
+    with pytest.raises(ValueError):
+        engine.indicator_matrix(window=50, panel=panel)
+    # 窗口内的观测少于CORRELATION_MIN_PERIODS时相关系数全部缺失，不允许
+    with pytest.raises(ValueError):
+        engine.indicator_matrix(window=Config.CORRELATION_MIN_PERIODS - 1, panel=panel)
+    with pytest.raises(ValueError):
+        rolling_correlate(panel_observations(panel, 'province'), Config.CORRELATION_MIN_PERIODS - 1)
+
+
+def test_rolling_route_rejects_short_window(panel, tmp_path, monkeypatch):
+    from app.factory import create_app
+    from app.models import correlation
+
+    monkeypatch.setattr(correlation, '_engine', CorrelationEngine(ResultCache(cache_dir=str(tmp_path))))
+    monkeypatch.setattr('app.models.panel.get_panel', lambda: panel)
+    client = create_app(warmup=False).test_client()
+    query = {'a': 'gdp', 'b': 'pop', 'window': Config.CORRELATION_MIN_PERIODS - 1}
+    assert client.get('/correlation/rolling', query_string=query).status_code == 400
+    query['window'] = Config.CORRELATION_MIN_PERIODS
+    response = client.get('/correlation/rolling', query_string=query)
+    assert response.status_code == 200 and response.get_json()['series']
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试pandas与Spark执行引擎：结果结构一致、数值一致
+
+运行: python -m pytest test_engines.py
+没有安装PySpark（或没有Java）时跳过Spark一致性测试。
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models.engines import PandasEngine, SparkEngine, select_engine, warm_start_centers
+
+FEATURES = ['工业增加值', '营业收入']
+TARGET = '利润总额'
+
+
+def make_dataset():
+    """三个明显分开的簇，目标列是特征的线性组合加少量噪声，含一个缺失值"""
+    rng = np.random.RandomState(0)
+    centers = np.array([[0.0, 0.0], [50.0, 50.0], [0.0, 100.0]])
+    points = np.vstack([center + rng.normal(scale=2.0, size=(10, 2)) for center in centers])
+    df = pd.DataFrame(points, columns=FEATURES, index=[f'省份{i}' for i in range(len(points))])
+    df[TARGET] = 3.0 * df[FEATURES[0]] - 0.5 * df[FEATURES[1]] + 7.0 + rng.normal(scale=0.1, size=len(df))
+    df.iloc[4, 1] = np.nan
+    return df
+
+
+@pytest.fixture(scope='module')
+def spark():
+    pytest.importorskip('pyspark')
+    from pyspark.sql import SparkSession
+
+    try:
+        session = SparkSession.builder.master('local[1]').appName('test_engines') \
+            .config('spark.sql.shuffle.partitions', '1').getOrCreate()
+    except Exception as e:
+        pytest.skip(f"无法启动Spark: {e}")
+    yield session
+    session.stop()
+
+
+def test_select_engine_by_size():
+    df = make_dataset()
+    assert isinstance(select_engine(df), PandasEngine)
+    assert isinstance(select_engine(df, threshold=df.size - 1), SparkEngine)
+
+
+def test_pandas_engine_result_schema():
+    df = make_dataset()
+    engine = PandasEngine()
+
+    stats = engine.describe(df)
+    assert stats['rows'] == 30
+    assert set(stats['columns']) == set(FEATURES + [TARGET])
+    assert stats['columns'][FEATURES[1]]['missing'] == 1
+
+    result = engine.kmeans(df, FEATURES, k=3)
+    assert set(result) == {'engine', 'k', 'mode', 'init', 'features', 'index', 'labels', 'centers',
+                           'cluster_sizes', 'inertia'}
+    assert result['mode'] == 'full'
+    assert len(result['labels']) == 29
+    assert sorted(result['cluster_sizes']) == [9, 10, 10]
+    assert result['labels'][0] == 0
+
+    regression = engine.linear_regression(df, FEATURES, TARGET)
+    assert regression['coefficients'][FEATURES[0]] == pytest.approx(3.0, abs=0.01)
+    assert regression['intercept'] == pytest.approx(7.0, abs=0.1)
+    assert regression['r2'] > 0.99
+
+
+def test_describe_parity(spark):
+    df = make_dataset()
+    expected = PandasEngine().describe(df)
+    actual = SparkEngine(spark).describe(df)
+    assert actual['rows'] == expected['rows']
+    for column, stats in expected['columns'].items():
+        for key, value in stats.items():
+            assert actual['columns'][column][key] == pytest.approx(value)
+
+
+def test_kmeans_parity(spark):
+    df = make_dataset()
+    expected = PandasEngine().kmeans(df, FEATURES, k=3)
+    actual = SparkEngine(spark).kmeans(df, FEATURES, k=3)
+    assert set(actual) == set(expected)
+    assert actual['index'] == expected['index']
+    assert actual['labels'] == expected['labels']
+    assert actual['inertia'] == pytest.approx(expected['inertia'], rel=1e-6)
+    np.testing.assert_allclose(actual['centers'], expected['centers'], rtol=1e-6)
+
+
+def test_regression_parity(spark):
+    df = make_dataset()
+    expected = PandasEngine().linear_regression(df, FEATURES, TARGET)
+    actual = SparkEngine(spark).linear_regression(df, FEATURES, TARGET)
+    assert set(actual) == set(expected)
+    assert actual['index'] == expected['index']
+    for feature in FEATURES:
+        assert actual['coefficients'][feature] == pytest.approx(expected['coefficients'][feature], rel=1e-6)
+    assert actual['intercept'] == pytest.approx(expected['intercept'], rel=1e-6)
+    assert actual['r2'] == pytest.approx(expected['r2'], rel=1e-6)
+    np.testing.assert_allclose(actual['predictions'], expected['predictions'], rtol=1e-6)
+
+
+def test_minibatch_and_warm_start():
+    df = make_dataset()
+    engine = PandasEngine()
+    full = engine.kmeans(df, FEATURES, k=3)
+
+    minibatch = engine.kmeans(df, FEATURES, k=3, mode='minibatch', batch_size=8)
+    assert minibatch['mode'] == 'minibatch'
+    assert minibatch['labels'] == full['labels']
+
+    # 追加少量新样本后，上次的中心仍然适用，从这些中心热启动
+    grown = pd.concat([df, df.iloc[:3] + 0.5])
+    previous = {'centers': full['centers'], 'mean_cost': full['inertia'] / len(full['labels'])}
+    centers = warm_start_centers(grown, FEATURES, previous)
+    assert centers == full['centers']
+    warm = engine.kmeans(grown, FEATURES, k=3, init_centers=centers)
+    assert warm['init'] == 'warm'
+    assert sorted(warm['cluster_sizes']) == [10, 10, 12]
+
+    # 数据分布变化很大时重新初始化
+    shifted = df.copy()
+    shifted[FEATURES] = shifted[FEATURES] * 10
+    assert warm_start_centers(shifted, FEATURES, previous) is None
+
+    with pytest.raises(ValueError):
+        engine.kmeans(df, FEATURES, mode='streaming')
+
+
+def test_kmeans_sweep_finds_three_clusters():
+    result = PandasEngine().kmeans_sweep(make_dataset(), FEATURES, k_values=range(1, 7))
+    assert result['k_values'] == [2, 3, 4, 5, 6]
+    assert len(result['inertia']) == len(result['silhouette']) == 5
+    assert result['inertia'] == sorted(result['inertia'], reverse=True)
+    assert result['best_k'] == 3
+    assert result['elbow_k'] == 3
+
+
+def test_kmeans_modes_parity(spark):
+    df = make_dataset()
+    expected = PandasEngine().kmeans(df, FEATURES, k=3)
+    engine = SparkEngine(spark)
+
+    warm = engine.kmeans(df, FEATURES, k=3, init_centers=expected['centers'])
+    assert warm['init'] == 'warm'
+    assert warm['labels'] == expected['labels']
+    assert warm['inertia'] == pytest.approx(expected['inertia'], rel=1e-6)
+
+    minibatch = engine.kmeans(df, FEATURES, k=3, mode='minibatch', batch_size=16)
+    assert minibatch['mode'] == 'minibatch'
+    assert minibatch['labels'] == expected['labels']
+
+
+def test_kmeans_sweep_parity(spark):
+    df = make_dataset()
+    expected = PandasEngine().kmeans_sweep(df, FEATURES, k_values=[2, 3, 4])
+    actual = SparkEngine(spark).kmeans_sweep(df, FEATURES, k_values=[2, 3, 4])
+    assert set(actual) == set(expected)
+    assert actual['k_values'] == expected['k_values']
+    assert actual['best_k'] == expected['best_k'] == 3
+    assert actual['inertia'][1] == pytest.approx(expected['inertia'][1], rel=1e-6)
+
+
+def test_result_cache_key_includes_frame(tmp_path, monkeypatch):
+    """同一数据集上不同的数据（如筛选后的子集）不共用缓存结果"""
+    from config import Config
+    from app.models import result_cache
+    from app.models.data_processor import DataProcessor
+
+    monkeypatch.setattr(Config, 'PARQUET_CACHE_DIR', str(tmp_path / 'parquet'))
+    monkeypatch.setattr(result_cache, '_cache', result_cache.ResultCache(cache_dir=str(tmp_path / 'results')))
+    dataset = str(tmp_path / 'data.xlsx')
+    df = make_dataset().dropna()
+    df.to_excel(dataset)
+
+    processor = DataProcessor()
+    full = processor.run_regression(df, FEATURES, TARGET, dataset=dataset)
+    subset = processor.run_regression(df.iloc[:12], FEATURES, TARGET, dataset=dataset)
+    assert subset != full
+    assert processor.run_regression(df.copy(), FEATURES, TARGET, dataset=dataset) == full
+    assert result_cache.get_result_cache().stats()['misses'] == 2
+
+    clusters = processor.run_kmeans(df, FEATURES, k=3, dataset=dataset)
+    assert processor.run_kmeans(df.iloc[::2], FEATURES, k=3, dataset=dataset) != clusters
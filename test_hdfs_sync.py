@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试HDFS增量并行同步（使用本地模拟的WebHDFS服务，无需Hadoop）
+
+运行: python -m pytest test_hdfs_sync.py
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import pytest
+
+from app.models.hdfs_sync import HdfsSync, create_client
+
+
+class FakeWebHdfs:
+    """内存中的WebHDFS模拟服务，实现同步用到的几个操作"""
+
+    def __init__(self):
+        self.files = {}
+        self.dirs = {'/'}
+        self.calls = Counter()
+        self.fail_paths = set()
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code, body=None, headers=None):
+                payload = json.dumps(body).encode('utf-8') if body is not None else b''
+                self.send_response(code)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _not_found(self, path):
+                self._send(404, {'RemoteException': {
+                    'exception': 'FileNotFoundException',
+                    'javaClassName': 'java.io.FileNotFoundException',
+                    'message': f'File does not exist: {path}'}})
+
+            def _parse(self):
+                parts = urlsplit(self.path)
+                path = unquote(parts.path[len('/webhdfs/v1'):]) or '/'
+                params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+                op = params.get('op', '').upper()
+                with fake.lock:
+                    fake.calls[op] += 1
+                return path, op, params
+
+            def _read_body(self):
+                if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+                    body = b''
+                    while True:
+                        size = int(self.rfile.readline().strip(), 16)
+                        if size == 0:
+                            self.rfile.readline()
+                            return body
+                        body += self.rfile.read(size)
+                        self.rfile.readline()
+                return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+            def do_GET(self):
+                path, op, _ = self._parse()
+                if op == 'GETFILESTATUS':
+                    if path in fake.files:
+                        return self._send(200, {'FileStatus': {
+                            'type': 'FILE', 'length': len(fake.files[path]), 'modificationTime': 0}})
+                    if path in fake.dirs:
+                        return self._send(200, {'FileStatus': {'type': 'DIRECTORY', 'length': 0}})
+                    return self._not_found(path)
+                if op == 'GETFILECHECKSUM':
+                    if path not in fake.files:
+                        return self._not_found(path)
+                    digest = hashlib.md5(fake.files[path]).hexdigest()
+                    return self._send(200, {'FileChecksum': {
+                        'algorithm': 'MD5-of-0MD5-of-512CRC32C', 'bytes': digest, 'length': 28}})
+                self._send(400, {'RemoteException': {'exception': 'IllegalArgumentException',
+                                                     'message': f'unsupported op {op}'}})
+
+            def do_PUT(self):
+                path, op, params = self._parse()
+                if op == 'MKDIRS':
+                    fake.dirs.add(path)
+                    return self._send(200, {'boolean': True})
+                if op == 'CREATE':
+                    if 'datanode' not in params:
+                        # 与真实NameNode一样重定向到DataNode
+                        return self._send(307, headers={'Location': f'{fake.url}{self.path}&datanode=true'})
+                    body = self._read_body()
+                    if path in fake.fail_paths:
+                        return self._send(500, {'RemoteException': {'exception': 'IOException',
+                                                                    'message': 'disk full'}})
+                    with fake.lock:
+                        fake.files[path] = body
+                    return self._send(201)
+                self._send(400, {'RemoteException': {'exception': 'IllegalArgumentException',
+                                                     'message': f'unsupported op {op}'}})
+
+        return Handler
+
+
+@pytest.fixture
+def webhdfs():
+    fake = FakeWebHdfs()
+    yield fake
+    fake.close()
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    directory = tmp_path / 'data'
+    directory.mkdir()
+    for i in range(6):
+        (directory / f'分省年度数据-{i}.xlsx').write_bytes(os.urandom(2048 + i))
+    (directory / 'notes.txt').write_text('不是数据文件')
+    return directory
+
+
+def make_syncer(webhdfs, tmp_path):
+    client = create_client(webhdfs.url, user='hadoop', pool_size=4)
+    return HdfsSync(client=client, workers=4, manifest_path=str(tmp_path / 'manifest.json'))
+
+
+def test_first_sync_uploads_everything(webhdfs, data_dir, tmp_path):
+    report = make_syncer(webhdfs, tmp_path).sync_directory(str(data_dir), '/manufacture_data')
+
+    assert len(report['uploaded']) == 6
+    assert report['skipped'] == [] and report['failed'] == {}
+    assert '/manufacture_data/notes.txt' not in webhdfs.files
+    for name in os.listdir(data_dir):
+        if name.endswith('.xlsx'):
+            assert webhdfs.files[f'/manufacture_data/{name}'] == (data_dir / name).read_bytes()
+
+    manifest = json.loads((tmp_path / 'manifest.json').read_text(encoding='utf-8'))
+    assert len(manifest) == 6
+
+
+def test_unchanged_files_are_skipped(webhdfs, data_dir, tmp_path):
+    make_syncer(webhdfs, tmp_path).sync_directory(str(data_dir), '/manufacture_data')
+    webhdfs.calls.clear()
+
+    report = make_syncer(webhdfs, tmp_path).sync_directory(str(data_dir), '/manufacture_data')
+
+    assert len(report['skipped']) == 6
+    assert webhdfs.calls['CREATE'] == 0
+
+
+def test_only_changed_files_are_uploaded(webhdfs, data_dir, tmp_path):
+    make_syncer(webhdfs, tmp_path).sync_directory(str(data_dir), '/manufacture_data')
+    (data_dir / '分省年度数据-2.xlsx').write_bytes(b'new content')
+    # HDFS上的副本被其他人修改过：大小相同但校验和不同
+    remote = '/manufacture_data/分省年度数据-4.xlsx'
+    webhdfs.files[remote] = bytes(len(webhdfs.files[remote]))
+
+    report = make_syncer(webhdfs, tmp_path).sync_directory(str(data_dir), '/manufacture_data')
+
+    assert sorted(os.path.basename(p) for p in report['uploaded']) == ['分省年度数据-2.xlsx', '分省年度数据-4.xlsx']
+    assert len(report['skipped']) == 4
+    assert webhdfs.files['/manufacture_data/分省年度数据-2.xlsx'] == b'new content'
+
+
+def test_interrupted_sync_resumes(webhdfs, data_dir, tmp_path):
+    webhdfs.fail_paths.add('/manufacture_data/分省年度数据-3.xlsx')
+    report = make_syncer(webhdfs, tmp_path).sync_directory(str(data_dir), '/manufacture_data')
+    assert list(map(os.path.basename, report['failed'])) == ['分省年度数据-3.xlsx']
+    assert len(report['uploaded']) == 5
+
+    webhdfs.fail_paths.clear()
+    webhdfs.calls.clear()
+    report = make_syncer(webhdfs, tmp_path).sync_directory(str(data_dir), '/manufacture_data')
+
+    assert list(map(os.path.basename, report['uploaded'])) == ['分省年度数据-3.xlsx']
+    assert webhdfs.calls['CREATE'] == 2  # 一次NameNode重定向 + 一次DataNode写入
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试JAR缓存、并行下载、SHA-1校验和离线包（使用本地模拟的Maven仓库，无需网络）
+
+运行: python -m pytest test_jar_provisioner.py
+"""
+
+import hashlib
+import os
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.models.jar_provisioner import ChecksumMismatch, JarProvisioner, artifact_path
+
+ARTIFACTS = [
+    'org.example:alpha:1.0',
+    'org.example:beta:2.1',
+    'com.example.tools:gamma_2.12:0.3',
+]
+
+
+class FakeMavenRepo:
+    """内存中的Maven仓库，按 group/artifact/version/文件名 的布局提供JAR和.sha1文件"""
+
+    def __init__(self, artifacts):
+        self.files = {}
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        for coordinate in artifacts:
+            self.publish(coordinate, os.urandom(4096) + coordinate.encode('utf-8'))
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/maven2'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def publish(self, coordinate, content, sha1=None):
+        path = '/maven2/' + artifact_path(coordinate)
+        self.files[path] = content
+        self.files[path + '.sha1'] = (sha1 or hashlib.sha1(content).hexdigest()).encode('ascii')
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def jar_requests(self):
+        return sum(count for path, count in self.calls.items() if path.endswith('.jar'))
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with fake.lock:
+                    fake.calls[self.path] += 1
+                body = fake.files.get(self.path)
+                self.send_response(200 if body is not None else 404)
+                body = body if body is not None else b'not found'
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+@pytest.fixture
+def repo():
+    fake = FakeMavenRepo(ARTIFACTS)
+    yield fake
+    fake.close()
+
+
+def make_provisioner(tmp_path, *repositories, directory='cache'):
+    return JarProvisioner(cache_dir=str(tmp_path / directory), repositories=list(repositories),
+                          artifacts=ARTIFACTS, workers=3, timeout=5)
+
+
+def test_downloads_all_missing_jars(repo, tmp_path):
+    provisioner = make_provisioner(tmp_path, repo.url)
+    assert provisioner.spark_jars() is None
+
+    report = provisioner.ensure()
+
+    assert sorted(report['downloaded']) == sorted(ARTIFACTS)
+    assert report['failed'] == {}
+    jars = provisioner.spark_jars()
+    assert len(jars) == len(ARTIFACTS)
+    for coordinate, path in zip(ARTIFACTS, jars):
+        content = repo.files['/maven2/' + artifact_path(coordinate)]
+        # 缓存按内容寻址：文件名就是内容的SHA-1
+        assert os.path.basename(path) == hashlib.sha1(content).hexdigest() + '.jar'
+        with open(path, 'rb') as f:
+            assert f.read() == content
+
+
+def test_cached_jars_are_not_downloaded_again(repo, tmp_path):
+    make_provisioner(tmp_path, repo.url).ensure()
+    repo.calls.clear()
+
+    report = make_provisioner(tmp_path, repo.url).ensure()
+
+    assert sorted(report['cached']) == sorted(ARTIFACTS)
+    assert report['downloaded'] == []
+    assert sum(repo.calls.values()) == 0
+
+
+def test_only_missing_or_corrupt_jars_are_fetched(repo, tmp_path):
+    provisioner = make_provisioner(tmp_path, repo.url)
+    provisioner.ensure()
+    # 删除一个，损坏一个（大小不变，只有重新计算SHA-1才能发现）
+    os.remove(provisioner.cached_path(ARTIFACTS[0]))
+    corrupt = provisioner.cached_path(ARTIFACTS[1])
+    with open(corrupt, 'r+b') as f:
+        f.write(b'\0' * 16)
+    repo.calls.clear()
+
+    assert provisioner.ensure()['downloaded'] == [ARTIFACTS[0]]
+    assert provisioner.ensure(verify=True)['downloaded'] == [ARTIFACTS[1]]
+    assert repo.jar_requests() == 2
+    assert provisioner.missing(verify=True) == []
+
+
+def test_checksum_mismatch_falls_back_to_next_repository(repo, tmp_path):
+    broken = FakeMavenRepo([])
+    try:
+        for coordinate in ARTIFACTS:
+            broken.publish(coordinate, b'tampered', sha1=hashlib.sha1(b'original').hexdigest())
+        provisioner = make_provisioner(tmp_path, broken.url, repo.url)
+
+        with pytest.raises(ChecksumMismatch):
+            make_provisioner(tmp_path, broken.url, directory='other').download(ARTIFACTS[0])
+        report = provisioner.ensure()
+
+        assert sorted(report['downloaded']) == sorted(ARTIFACTS)
+        assert provisioner.missing(verify=True) == []
+        assert not [name for name in os.listdir(provisioner.cache_dir) if name.endswith('.part')]
+    finally:
+        broken.close()
+
+
+def test_missing_artifact_is_reported(repo, tmp_path):
+    provisioner = JarProvisioner(cache_dir=str(tmp_path / 'cache'), repositories=[repo.url],
+                                 artifacts=ARTIFACTS + ['org.example:absent:9.9'], workers=2, timeout=5)
+
+    report = provisioner.ensure()
+
+    assert list(report['failed']) == ['org.example:absent:9.9']
+    assert provisioner.spark_jars() is None
+
+
+def test_offline_bundle_roundtrip(repo, tmp_path):
+    source = make_provisioner(tmp_path, repo.url)
+    source.ensure()
+    bundle = source.build_bundle(str(tmp_path / 'jars.zip'))
+
+    # 目标机器没有可用的仓库
+    target = make_provisioner(tmp_path, 'http://127.0.0.1:9/unreachable', directory='offline')
+    assert target.install_bundle(bundle) == len(ARTIFACTS)
+    assert target.install_bundle(bundle) == 0
+    assert [os.path.basename(path) for path in target.spark_jars()] == \
+        [os.path.basename(path) for path in source.spark_jars()]
+
+
+def test_bundle_requires_complete_cache(repo, tmp_path):
+    with pytest.raises(FileNotFoundError):
+        make_provisioner(tmp_path, repo.url).build_bundle(str(tmp_path / 'jars.zip'))
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试后台任务队列：提交、领取、完成后读取结果，结果淘汰后返回410，排队中和运行中的任务取消，
+重启后运行中的任务重新排队，无效的任务类型和参数返回400
+
+任务由测试直接领取（_claim）和执行（_run），不启动工作线程。
+
+运行: python -m pytest test_jobs.py
+"""
+
+import threading
+
+import pytest
+
+from app.factory import create_app
+from app.models import jobs
+from app.models.jobs import RESULT_TAG, JobError, JobQueue
+from app.models.result_cache import ResultCache
+
+
+class FakeSparkManager:
+    """记录被取消的作业组"""
+
+    def __init__(self):
+        self.cancelled = []
+
+    def group_progress(self, group_id):
+        return None
+
+    def cancel_group(self, group_id):
+        self.cancelled.append(group_id)
+
+
+def _echo(context, dataset, params):
+    return {'value': params.get('value')}
+
+
+def _fail(context, dataset, params):
+    raise RuntimeError('计算失败')
+
+
+started = threading.Event()
+release = threading.Event()
+
+
+def _wait(context, dataset, params):
+    started.set()
+    release.wait(10)
+    context.progress(0.5, '继续')
+    return {}
+
+
+KINDS = {'echo': (_echo, False), 'fail': (_fail, False), 'wait': (_wait, False)}
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = JobQueue(db_path=str(tmp_path / 'jobs.sqlite3'), kinds=KINDS,
+                     result_cache=ResultCache(cache_dir=str(tmp_path / 'results')), spark_manager=FakeSparkManager())
+    queue.executes = False  # 不启动工作线程，由测试领取执行
+    return queue
+
+
+@pytest.fixture
+def client(queue, monkeypatch):
+    monkeypatch.setattr(jobs, '_queue', queue)
+    return create_app(warmup=False).test_client()
+
+
+def _run_next(queue):
+    row = queue._claim()
+    assert row is not None and queue.get(row['id'])['state'] == queue.RUNNING
+    queue._run(row)
+    return row['id']
+
+
+def test_submit_claim_done_and_result_eviction(queue, client):
+    response = client.post('/jobs', json={'kind': 'echo', 'params': {'value': 42}})
+    assert response.status_code == 202
+    job_id = response.get_json()['id']
+    assert response.get_json()['state'] == queue.QUEUED
+    assert client.get(f'/jobs/{job_id}/result').status_code == 202
+
+    assert _run_next(queue) == job_id
+    assert queue._claim() is None
+    assert queue.get(job_id)['state'] == queue.DONE
+    response = client.get(f'/jobs/{job_id}/result')
+    assert response.status_code == 200 and response.get_json()['result'] == {'value': 42}
+
+    queue._result_cache().invalidate(RESULT_TAG)
+    assert client.get(f'/jobs/{job_id}/result').status_code == 410
+
+
+def test_failed_job_reports_error(queue, client):
+    job_id = queue.submit('fail')['id']
+    _run_next(queue)
+    job = queue.get(job_id)
+    assert job['state'] == queue.FAILED and job['error'] == '计算失败'
+    assert client.get(f'/jobs/{job_id}/result').status_code == 409
+
+
+def test_cancel_queued_and_running(queue, client):
+    queued = queue.submit('echo')['id']
+    response = client.post(f'/jobs/{queued}/cancel')
+    assert response.get_json()['state'] == queue.CANCELLED
+    assert queue._claim() is None
+
+    started.clear()
+    release.clear()
+    running = queue.submit('wait')['id']
+    row = queue._claim()
+    worker = threading.Thread(target=queue._run, args=(row,))
+    worker.start()
+    assert started.wait(10)
+    job = queue.cancel(running)
+    assert job['state'] == queue.RUNNING and job['cancel_requested']
+    assert queue._spark_manager().cancelled == [queue.group_id(running)]
+    release.set()
+    worker.join(10)
+    assert queue.get(running)['state'] == queue.CANCELLED
+    assert queue.result(running) == (False, None)
+
+
+def test_running_jobs_requeued_on_restart(queue, tmp_path):
+    job_id = queue.submit('echo')['id']
+    queue._claim()
+    assert queue.get(job_id)['state'] == queue.RUNNING
+
+    restarted = JobQueue(db_path=queue.db_path, kinds=KINDS, result_cache=queue._cache,
+                         spark_manager=queue._manager)
+    restarted.executes = False
+    job = restarted.get(job_id)
+    assert job['state'] == restarted.QUEUED and job['started'] is None
+    assert _run_next(restarted) == job_id
+
+
+def test_invalid_submissions(queue, client):
+    assert client.post('/jobs', json={'kind': 'no-such-kind'}).status_code == 400
+    assert client.post('/jobs', json={'kind': 'echo', 'params': [1, 2]}).status_code == 400
+    with pytest.raises(JobError):
+        queue.submit('echo', params='value=1')
+    assert queue.list() == []
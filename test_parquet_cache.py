@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试Parquet缓存清单的跨进程互斥：多个进程同时转换不同的工作簿，清单保留所有条目
+
+运行: python -m pytest test_parquet_cache.py
+"""
+
+import json
+import multiprocessing
+import os
+
+import pandas as pd
+import pytest
+
+from config import Config
+from app.models import parquet_cache
+
+WORKERS = 4
+
+
+def _convert(cache_dir, source, barrier):
+    Config.PARQUET_CACHE_DIR = cache_dir
+    barrier.wait(30)
+    for _ in range(3):
+        parquet_cache.ensure_parquet(source)
+        parquet_cache.dataset_version(source)
+
+
+@pytest.mark.skipif(parquet_cache.fcntl is None, reason='需要fcntl文件锁')
+def test_concurrent_processes_keep_all_manifest_entries(tmp_path):
+    sources = []
+    for i in range(WORKERS):
+        source = str(tmp_path / f'data{i}.xlsx')
+        pd.DataFrame({'地区': ['北京市', '天津市'], '2020年': [1.0 + i, 2.0]}).to_excel(source, index=False)
+        sources.append(source)
+
+    cache_dir = str(tmp_path / 'parquet')
+    context = multiprocessing.get_context('fork')
+    barrier = context.Barrier(WORKERS)
+    processes = [context.Process(target=_convert, args=(cache_dir, source, barrier)) for source in sources]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    with open(os.path.join(cache_dir, parquet_cache.MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert sorted(manifest) == sorted(os.path.abspath(source) for source in sources)
+    for entry in manifest.values():
+        assert os.path.exists(os.path.join(cache_dir, entry['sheets']['0']))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试批量报告导出：各项在进程池中生成并写入同一个ZIP，数据没有变化时第二次导出全部复用
+
+运行: python -m pytest test_report_export.py
+"""
+
+import json
+import zipfile
+
+import pandas as pd
+import pytest
+
+from config import Config
+from app.models import result_cache
+from app.models.parquet_cache import find_source
+from app.models.report_export import MANIFEST_NAME, export_report, plan
+
+INDICATOR = 'province3'
+
+
+@pytest.fixture
+def isolated(tmp_path, monkeypatch):
+    if find_source(Config.DATA_MAP[INDICATOR]) is None:
+        pytest.skip('缺少示例数据文件')
+    monkeypatch.setattr(Config, 'CHART_CACHE_DIR', str(tmp_path / 'charts'))
+    monkeypatch.setattr(Config, 'RESULT_CACHE_DIR', str(tmp_path / 'results'))
+    monkeypatch.setattr(result_cache, '_cache', None)
+    return tmp_path
+
+
+def test_export_then_reuse(isolated):
+    output = str(isolated / 'report.zip')
+    manifest = export_report(output, indicators=[INDICATOR], chart_types=['bar', 'heatmap'], workers=2)
+    expected = {f'{INDICATOR}/bar.png', f'{INDICATOR}/heatmap.png', f'{INDICATOR}/kmeans.csv',
+                f'{INDICATOR}/regression.csv'}
+    assert manifest['generated'] == 4 and manifest['failed'] == 0 and manifest['reused'] == 0
+    assert all(entry['seconds'] > 0 for entry in manifest['items'])
+
+    with zipfile.ZipFile(output) as archive:
+        assert set(archive.namelist()) == expected | {MANIFEST_NAME}
+        assert json.loads(archive.read(MANIFEST_NAME))['generated'] == 4
+        with archive.open(f'{INDICATOR}/kmeans.csv') as f:
+            clusters = pd.read_csv(f, encoding='utf-8-sig')
+    assert list(clusters.columns[:2]) == ['province', 'cluster']
+    assert clusters['cluster'].nunique() == Config.EXPORT_KMEANS_K
+
+    again = export_report(str(isolated / 'again.zip'), indicators=[INDICATOR], chart_types=['bar', 'heatmap'])
+    assert again['reused'] == 4 and again['generated'] == 0
+    with zipfile.ZipFile(output) as first, zipfile.ZipFile(str(isolated / 'again.zip')) as second:
+        for name in expected:
+            assert first.read(name) == second.read(name)
+
+
+def test_plan_rejects_unknown_names():
+    with pytest.raises(ValueError):
+        plan(indicators=['no-such-indicator'])
+    with pytest.raises(ValueError):
+        plan(chart_types=['radar'])
+
+
+def test_failing_indicator_does_not_abort_export(isolated, monkeypatch):
+    monkeypatch.setitem(Config.DATA_MAP, 'broken', 'broken.xlsx')
+    (isolated / 'broken.xlsx').write_bytes(b'not a workbook')
+    monkeypatch.setattr(Config, 'DATA_DIR', str(isolated))
+    monkeypatch.setattr(Config, 'PARQUET_CACHE_DIR', str(isolated / 'parquet'))
+    output = str(isolated / 'report.zip')
+    manifest = export_report(output, indicators=['broken', INDICATOR], chart_types=['bar'], workers=2)
+    failed = [entry for entry in manifest['items'] if entry['error'] is not None]
+    assert {entry['indicator'] for entry in failed} == {'broken'} and manifest['failed'] == 3
+    assert manifest['generated'] == 3
+    with zipfile.ZipFile(output) as archive:
+        names = set(archive.namelist())
+    assert f'{INDICATOR}/bar.png' in names and not any(name.startswith('broken/') for name in names)
+
+
+def test_export_route_validates_before_queueing(monkeypatch):
+    from app.factory import create_app
+    from app.views import export
+
+    submitted = []
+    monkeypatch.setattr(export, '_queue', lambda: submitted.append(1))
+    client = create_app(warmup=False).test_client()
+    assert client.post('/export', json={'indicators': ['no-such-indicator']}).status_code == 400
+    assert client.post('/export', json={'chart_types': ['radar']}).status_code == 400
+    assert client.post('/export', json={'indicators': INDICATOR}).status_code == 400
+    assert submitted == []
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试多进程共享的数据文件：Arrow副本零拷贝读取，结果缓存条目以内存映射方式读回
+
+运行: python -m pytest test_shared_data.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import Config
+from app.models.result_cache import ResultCache
+
+
+def test_shared_frame_is_zero_copy(tmp_path, monkeypatch):
+    pytest.importorskip('pyarrow')
+    from app.models import shared_data
+
+    monkeypatch.setattr(Config, 'SHARED_DATA_DIR', str(tmp_path / 'shared'))
+    monkeypatch.setattr(Config, 'PARQUET_CACHE_DIR', str(tmp_path))
+    expected = pd.DataFrame({'地区': ['北京市', '天津市', None], '2021': [1.5, np.nan, 3.0], '2022': [1, 2, 3]})
+    parquet_path = str(tmp_path / 'data-0123456789abcdef-0.parquet')
+    expected.to_parquet(parquet_path, index=False)
+
+    frame = shared_data.read_frame(parquet_path)
+    pd.testing.assert_frame_equal(frame, pd.read_parquet(parquet_path))
+    table = shared_data.open_table(parquet_path)
+    assert shared_data.open_table(parquet_path) is table
+    # 浮点列直接引用映射的Arrow缓冲区，缺失值保存为NaN
+    values = frame['2021'].to_numpy()
+    assert values.ctypes.data == table.column('2021').chunk(0).buffers()[1].address
+    assert not values.flags.writeable
+    assert list(shared_data.read_frame(parquet_path, columns=['2022']).columns) == ['2022']
+
+    (tmp_path / 'data-0123456789abcdef-0.parquet').unlink()
+    assert shared_data.prune() == 1
+
+
+def test_result_cache_entries_are_memory_mapped(tmp_path):
+    frame = pd.DataFrame({'x': np.arange(1000, dtype=float), 'label': ['a'] * 1000})
+    value = {'frame': frame, 'centers': np.eye(3), 'k': 3}
+    ResultCache(cache_dir=str(tmp_path)).put('data.xlsx', 'v1', 'key', value)
+
+    hit, loaded = ResultCache(cache_dir=str(tmp_path)).get('data.xlsx', 'v1', 'key')
+    assert hit
+    pd.testing.assert_frame_equal(loaded['frame'], frame)
+    np.testing.assert_array_equal(loaded['centers'], np.eye(3))
+    assert loaded['k'] == 3
+    assert not loaded['centers'].flags.writeable
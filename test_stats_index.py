@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试统计索引的增量刷新：追加年份、追加行时沿用已有的块和年份，结果与完整重新计算一致
+
+运行: python -m pytest test_stats_index.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import Config
+from app.models.stats_index import StatsIndex
+
+PROVINCES = ['北京市', '天津市', '河北省', '山西省', '内蒙古自治区']
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'PARQUET_CACHE_DIR', str(tmp_path / 'parquet'))
+    monkeypatch.setattr(Config, 'HDFS_SYNC_MANIFEST', str(tmp_path / 'hdfs.json'))
+
+
+def _write(path, provinces, years):
+    rng = np.random.RandomState(len(provinces))
+    frame = pd.DataFrame({'地区': provinces})
+    for year in years:
+        frame[f'{year}年'] = np.round(rng.lognormal(8, 1, len(provinces)), 1)
+    frame.to_excel(path, index=False)
+    return frame
+
+
+def _same(index, other, path):
+    """增量刷新的索引与另一个目录中完整计算的索引结果一致"""
+    described, expected = index.describe(path), other.describe(path)
+    assert described['rows'] == expected['rows'] and list(described['columns']) == list(expected['columns'])
+    for column, stats in expected['columns'].items():
+        assert described['columns'][column] == pytest.approx(stats)
+    summary, expected = index.year_summary(path), other.year_summary(path)
+    assert list(summary) == list(expected)
+    for year, stats in expected.items():
+        assert summary[year] == pytest.approx(stats)
+    growth, expected = index.growth(path), other.growth(path)
+    assert list(growth) == list(expected)
+    for year, rates in expected.items():
+        assert growth[year] == pytest.approx(rates)
+
+
+def test_appended_year_reuses_existing_chunks(tmp_path):
+    path = str(tmp_path / 'data.xlsx')
+    years = list(range(2015, 2021))
+    first = _write(path, PROVINCES, years)
+    index = StatsIndex(index_dir=str(tmp_path / 'index'), chunk_rows=2)
+    assert index.get(path)['refresh']['reused'] == 0
+
+    # 追加一年：原有的列和除最后一年外的年份都不重新计算
+    second = _write(path, PROVINCES, years + [2021])
+    pd.testing.assert_frame_equal(second.iloc[:, :-1], first)
+    refresh = index.get(path)['refresh']
+    chunks_per_column = 3
+    assert refresh['computed'] == chunks_per_column + 1
+    assert refresh['reused'] == chunks_per_column * len(years) + len(years)
+    assert 2021 in index.growth(path) and set(index.growth(path)[2021]) == set(PROVINCES)
+    _same(index, StatsIndex(index_dir=str(tmp_path / 'full'), chunk_rows=2), path)
+
+
+def test_appended_rows_recompute_only_the_tail(tmp_path):
+    path = str(tmp_path / 'data.xlsx')
+    years = list(range(2018, 2021))
+    _write(path, PROVINCES[:3], years)
+    index = StatsIndex(index_dir=str(tmp_path / 'index'), chunk_rows=2)
+    index.get(path)
+
+    frame = pd.read_excel(path)
+    extra = pd.DataFrame({'地区': PROVINCES[3:], **{f'{year}年': [1.5, 2.5] for year in years}})
+    pd.concat([frame, extra], ignore_index=True).to_excel(path, index=False)
+    refresh = index.get(path)['refresh']
+    # 每列沿用第一块，从没装满的第二块开始重新计算；省份变化，年份全部重新计算
+    assert refresh['reused'] == len(years)
+    assert refresh['computed'] == len(years) * 2 + len(years)
+    _same(index, StatsIndex(index_dir=str(tmp_path / 'full'), chunk_rows=2), path)
+
+
+def test_revised_rows_are_recomputed(tmp_path):
+    path = str(tmp_path / 'data.xlsx')
+    _write(path, PROVINCES, [2019, 2020])
+    index = StatsIndex(index_dir=str(tmp_path / 'index'), chunk_rows=2)
+    index.get(path)
+
+    frame = pd.read_excel(path)
+    frame.loc[len(frame) - 1, '2020年'] = -1.0
+    frame.to_excel(path, index=False)
+    assert index.describe(path, columns=['2020年'])['columns']['2020年']['min'] == -1.0
+    _same(index, StatsIndex(index_dir=str(tmp_path / 'full'), chunk_rows=2), path)
+
+
+def test_revised_early_rows_with_append_are_recomputed(tmp_path):
+    path = str(tmp_path / 'data.xlsx')
+    years = [2018, 2019, 2020]
+    _write(path, PROVINCES, years)
+    index = StatsIndex(index_dir=str(tmp_path / 'index'), chunk_rows=2)
+    index.get(path)
+
+    # 修订第一块中的2019年数据，同时追加2021年
+    frame = pd.read_excel(path)
+    frame.loc[1, '2019年'] = 1e6
+    frame['2021年'] = frame['2020年'] * 1.1
+    frame.to_excel(path, index=False)
+    refresh = index.get(path)['refresh']
+    # 2019年列重新计算被修订的第一块；年份中2019（本年变化）和2020（上一年变化）、2021重新计算
+    assert refresh['computed'] == 1 + 3 + 3
+    assert refresh['reused'] == 3 * 3 - 1 + 1
+    assert index.describe(path, columns=['2019年'])['columns']['2019年']['max'] == 1e6
+    assert index.growth(path)[2020][PROVINCES[1]] == pytest.approx(frame.loc[1, '2020年'] / 1e6 - 1)
+    _same(index, StatsIndex(index_dir=str(tmp_path / 'full'), chunk_rows=2), path)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试上传接口：与已有数据集同名的上传返回409，指定replace时覆盖；超过MAX_CONTENT_LENGTH的请求返回413
+
+运行: python -m pytest test_uploads.py
+"""
+
+import io
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from config import Config
+from app.factory import create_app
+from app.models import stats_index, upload_jobs
+from app.models.stats_index import StatsIndex
+from app.models.upload_jobs import UploadJobQueue
+
+
+class NoHdfs:
+    def is_available(self):
+        return False
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    for name in ('DATA_DIR', 'BASE_DIR'):
+        monkeypatch.setattr(Config, name, str(tmp_path / 'data'))
+    for name in ('UPLOAD_DIR', 'UPLOAD_STATUS_DIR', 'PROCESSED_DIR', 'PARQUET_CACHE_DIR'):
+        monkeypatch.setattr(Config, name, str(tmp_path / name.lower()))
+    monkeypatch.setattr(Config, 'HDFS_SYNC_MANIFEST', str(tmp_path / 'hdfs.json'))
+    monkeypatch.setattr(stats_index, '_index', StatsIndex(index_dir=str(tmp_path / 'index')))
+    queue = UploadJobQueue(workers=1, syncer=NoHdfs())
+    monkeypatch.setattr(upload_jobs, '_queue', queue)
+    yield queue
+    queue.shutdown()
+
+
+def _workbook(value):
+    buffer = io.BytesIO()
+    pd.DataFrame({'地区': ['北京市', '天津市'], '2020年': [value, 2.0], '2021年': [3.0, 4.0]}) \
+        .to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def _wait(queue, job_id):
+    for _ in range(200):
+        job = queue.get(job_id)
+        if job['state'] in (queue.DONE, queue.FAILED):
+            return job
+        time.sleep(0.05)
+    raise AssertionError('上传任务没有完成')
+
+
+def test_existing_dataset_is_not_overwritten(queue):
+    client = create_app(warmup=False).test_client()
+    response = client.post('/upload?filename=gdp.xlsx', data=_workbook(1.0))
+    assert response.status_code == 202
+    assert _wait(queue, response.get_json()['id'])['state'] == queue.DONE
+
+    response = client.post('/upload?filename=gdp.xlsx', data=_workbook(5.0))
+    assert response.status_code == 409
+    response = client.post('/upload', data={'file': (io.BytesIO(_workbook(5.0)), 'gdp.xlsx')})
+    assert response.status_code == 409
+    assert pd.read_excel(upload_jobs.find_source('gdp.xlsx'))['2020年'][0] == 1.0
+
+    response = client.post('/upload?filename=gdp.xlsx&replace=1', data=_workbook(5.0))
+    assert response.status_code == 202
+    job = _wait(queue, response.get_json()['id'])
+    assert job['state'] == queue.DONE, job['error']
+    assert pd.read_excel(upload_jobs.find_source('gdp.xlsx'))['2020年'][0] == 5.0
+
+
+def test_dataset_placed_by_another_upload_conflicts(queue, tmp_path):
+    staged = tmp_path / 'staged.xlsx'
+    staged.write_bytes(_workbook(1.0))
+    (tmp_path / 'data').mkdir()
+    (tmp_path / 'data' / 'gdp.xlsx').write_bytes(_workbook(2.0))
+    with pytest.raises(upload_jobs.UploadConflict):
+        upload_jobs._place(str(staged), str(tmp_path / 'data' / 'gdp.xlsx'))
+    assert staged.exists()
+
+
+def test_max_content_length_is_enforced(queue, monkeypatch):
+    monkeypatch.setattr(Config, 'MAX_CONTENT_LENGTH', 1024)
+    app = create_app(warmup=False)
+    assert app.config['MAX_CONTENT_LENGTH'] == 1024
+    response = app.test_client().post('/upload', data={'file': (io.BytesIO(b'x' * 4096), 'big.xlsx')})
+    assert response.status_code == 413
+
+
+def test_failed_processing_does_not_leave_dataset(queue, monkeypatch):
+    client = create_app(warmup=False).test_client()
+
+    def fail(df, path):
+        raise OSError('磁盘已满')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(upload_jobs, '_write_table', fail)
+        job = _wait(queue, client.post('/upload?filename=gdp.xlsx', data=_workbook(1.0)).get_json()['id'])
+        assert job['state'] == queue.FAILED
+        assert upload_jobs.find_source('gdp.xlsx') is None
+
+    response = client.post('/upload?filename=gdp.xlsx', data=_workbook(1.0))
+    assert response.status_code == 202
+    assert _wait(queue, response.get_json()['id'])['state'] == queue.DONE
+
+    # 覆盖失败时恢复原数据集
+    with monkeypatch.context() as patch:
+        patch.setattr(upload_jobs, '_write_table', fail)
+        response = client.post('/upload?filename=gdp.xlsx&replace=1', data=_workbook(5.0))
+        assert _wait(queue, response.get_json()['id'])['state'] == queue.FAILED
+    source = upload_jobs.find_source('gdp.xlsx')
+    assert pd.read_excel(source)['2020年'][0] == 1.0
+    assert not [name for name in os.listdir(os.path.dirname(source)) if name.endswith('.bak')]
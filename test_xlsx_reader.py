@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+测试流式Excel读取器：结果与pd.read_excel一致，分批输出与整表一致
+
+运行: python -m pytest test_xlsx_reader.py
+"""
+
+import datetime
+import glob
+import os
+import zipfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models.xlsx_reader import UnsupportedWorkbook, iter_batches, read_columns, read_frame
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def _comparable(df):
+    # pandas新版本把文本列读为str类型、日期精度为微秒，这里统一按object和纳秒比较
+    return df.astype({column: object if df[column].dtype == 'str' else 'datetime64[ns]'
+                      for column in df.columns
+                      if df[column].dtype == 'str' or pd.api.types.is_datetime64_any_dtype(df[column])})
+
+
+def assert_same_frame(expected, actual):
+    pd.testing.assert_frame_equal(_comparable(expected), _comparable(actual))
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    """两个工作表：网格数据（含缺失、整数列、空行、重复表头），以及日期、布尔、内联文本"""
+    openpyxl = pytest.importorskip('openpyxl')
+    book = openpyxl.Workbook()
+    grid = book.active
+    grid.title = '指标'
+    grid.append(['地区', 2021, 2022, 2022, None, '备注'])
+    grid.append(['北京市', 1.5, 3, 7, None, 'NA'])
+    grid.append(['天津市', None, 4, 8, None, '说明'])
+    grid.append([])
+    grid.append(['河北省', 2.25, 5, 9, None, None])
+    other = book.create_sheet('其他')
+    other.append(['日期', '标志', '文本'])
+    other.append([datetime.datetime(2020, 1, 31), True, 'a'])
+    other.append([datetime.datetime(2021, 6, 1, 12, 30), False, 'b'])
+    path = str(tmp_path / 'book.xlsx')
+    book.save(path)
+    return path
+
+
+def test_bundled_workbooks_match_pandas():
+    sources = glob.glob(os.path.join(ROOT, '*.xlsx'))
+    if not sources:
+        pytest.skip('没有自带的工作簿')
+    for source in sources:
+        assert_same_frame(pd.read_excel(source), read_frame(source))
+
+
+def test_grid_sheet_matches_pandas(workbook):
+    expected = pd.read_excel(workbook, sheet_name='指标')
+    actual = read_frame(workbook, sheet_name='指标')
+
+    assert_same_frame(expected, actual)
+    assert list(actual.columns) == ['地区', 2021, 2022, '2022.1', 'Unnamed: 4', '备注']
+    # 中间的空行保留为缺失
+    assert actual.iloc[2].isna().all()
+
+
+def test_dates_booleans_and_sheet_index(workbook):
+    assert_same_frame(pd.read_excel(workbook, sheet_name=1), read_frame(workbook, sheet_name=1))
+    with pytest.raises(ValueError):
+        read_frame(workbook, sheet_name=5)
+    with pytest.raises(ValueError):
+        read_frame(workbook, sheet_name='不存在')
+
+
+def test_labels_are_interned(workbook, tmp_path):
+    copy = str(tmp_path / 'copy.xlsx')
+    with open(workbook, 'rb') as src, open(copy, 'wb') as dst:
+        dst.write(src.read())
+    _, first = read_columns(workbook, sheet_name='指标')
+    _, second = read_columns(copy, sheet_name='指标')
+    assert first[0][0] is second[0][0]
+
+
+def test_batches_match_full_read(workbook):
+    pa = pytest.importorskip('pyarrow')
+    batches = list(iter_batches(workbook, sheet_name='指标', batch_rows=2))
+
+    assert [batch.num_rows for batch in batches] == [2, 2]
+    table = pa.Table.from_batches(batches).to_pandas()
+    full = read_frame(workbook, sheet_name='指标')
+    assert list(table.columns) == [str(column) for column in full.columns]
+    np.testing.assert_allclose(table['2022'].to_numpy(), full[2022].to_numpy(dtype=float))
+    assert table['地区'].tolist() == full['地区'].tolist()
+
+
+def test_invalid_file_is_unsupported(tmp_path):
+    path = tmp_path / 'broken.xlsx'
+    path.write_bytes(b'not a zip file')
+    with pytest.raises(UnsupportedWorkbook):
+        read_frame(str(path))
+    with zipfile.ZipFile(str(tmp_path / 'empty.xlsx'), 'w') as archive:
+        archive.writestr('docProps/app.xml', '')
+    with pytest.raises(UnsupportedWorkbook):
+        read_frame(str(tmp_path / 'empty.xlsx'))
+
+
+def test_na_markers_in_numeric_columns(tmp_path):
+    """数值列中的空字符串、NA等缺失标记与pd.read_excel一样读为NaN"""
+    openpyxl = pytest.importorskip('openpyxl')
+    written = str(tmp_path / 'written.xlsx')
+    pd.DataFrame({'地区': ['北京', '天津', '河北'], '2020年': [1.0, np.nan, 3.0]}).to_excel(written, index=False)
+    assert_same_frame(pd.read_excel(written), read_frame(written))
+
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.append(['地区', '2020年', '2021年'])
+    sheet.append(['北京', 1.5, ''])
+    sheet.append(['天津', 'NA', 4])
+    sheet.append(['河北', 2.5, 'n/a'])
+    marked = str(tmp_path / 'marked.xlsx')
+    book.save(marked)
+    expected, actual = pd.read_excel(marked), read_frame(marked)
+    assert_same_frame(expected, actual)
+    assert actual['2020年'].dtype == np.float64 and np.isnan(actual['2020年'][1])
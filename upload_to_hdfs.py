@@ -5,21 +5,22 @@ import os
 import subprocess
 import sys
 import time
-from pyhdfs import HdfsClient
+from hdfs import HdfsError
 from config import Config
+from app.models.hdfs_sync import HdfsSync
+
+_syncer = None
+
+def get_syncer():
+    """返回共享的WebHDFS同步器（所有操作共用一个连接池）"""
+    global _syncer
+    if _syncer is None:
+        _syncer = HdfsSync()
+    return _syncer
 
 def check_hadoop_available():
-    """检查Hadoop是否可用"""
-    try:
-        # 尝试ping HDFS
-        subprocess.run(["hadoop", "fs", "-ls", "/"], 
-                       stdout=subprocess.PIPE, 
-                       stderr=subprocess.PIPE, 
-                       check=True,
-                       shell=True)
-        return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        return False
+    """检查Hadoop（WebHDFS）是否可用"""
+    return get_syncer().is_available()
 
 def check_safe_mode():
     """检查HDFS是否处于安全模式"""
@@ -66,46 +67,45 @@ def create_hdfs_dirs():
                 return False
     
     try:
-        cmd = f"hadoop fs -mkdir -p {Config.HDFS_BASE_PATH}"
-        subprocess.run(cmd, shell=True, check=True)
+        get_syncer().makedirs(Config.HDFS_BASE_PATH)
         print(f"✅ 已创建HDFS基础目录: {Config.HDFS_BASE_PATH}")
         return True
-    except subprocess.CalledProcessError as e:
+    except HdfsError as e:
         print(f"❌ 创建HDFS目录失败: {e}")
         
         # 如果失败，检查错误是否是权限问题
         if "Permission denied" in str(e):
             print("⚠️ 可能是权限问题，请确保您有权限写入HDFS")
-        elif "Name node is in safe mode" in str(e):
+        elif "safe mode" in str(e).lower():
             print("⚠️ Hadoop仍处于安全模式，无法创建目录")
             print("✳️ 提示: 您可以等待一段时间再尝试，安全模式通常会自动退出")
             print("✳️ 或者以管理员身份运行: hadoop dfsadmin -safemode leave")
         
         return False
 
-def upload_file_to_hdfs(local_path, hdfs_path):
-    """将本地文件上传到HDFS"""
+def upload_file_to_hdfs(local_path, hdfs_path, force=False):
+    """将本地文件上传到HDFS（内容未变化时跳过）"""
     try:
-        cmd = f'hadoop fs -put -f "{local_path}" "{hdfs_path}"'
-        subprocess.run(cmd, shell=True, check=True)
+        result = get_syncer().upload_file(local_path, hdfs_path, force=force)
         file_size = os.path.getsize(local_path) / 1024  # KB
-        print(f"✅ 已上传: {os.path.basename(local_path)} ({file_size:.2f} KB)")
+        if result == 'skipped':
+            print(f"⏭️ 未变化，跳过: {os.path.basename(local_path)} ({file_size:.2f} KB)")
+        else:
+            print(f"✅ 已上传: {os.path.basename(local_path)} ({file_size:.2f} KB)")
         return True
-    except subprocess.CalledProcessError as e:
+    except (HdfsError, OSError) as e:
         print(f"❌ 上传失败 {os.path.basename(local_path)}: {e}")
         return False
 
 def check_hdfs_file_exists(hdfs_path):
     """检查HDFS文件是否存在"""
     try:
-        cmd = f'hadoop fs -test -e "{hdfs_path}"'
-        result = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        return result.returncode == 0
+        return get_syncer().exists(hdfs_path)
     except Exception:
         return False
 
-def upload_data_directory():
-    """上传data目录中的所有Excel文件到HDFS"""
+def upload_data_directory(force=False):
+    """并行上传data目录中的所有Excel文件到HDFS，已同步的文件跳过"""
     if not check_hadoop_available():
         print("❌ 无法连接到Hadoop。请确保Hadoop服务已启动。")
         return False
@@ -122,24 +122,28 @@ def upload_data_directory():
         return False
     
     files = [f for f in os.listdir(data_dir) 
-             if f.endswith(('.xls', '.xlsx')) and os.path.isfile(os.path.join(data_dir, f))]
+             if f.lower().endswith(('.xls', '.xlsx')) and os.path.isfile(os.path.join(data_dir, f))]
     
     if not files:
         print(f"⚠️ 未在 {data_dir} 中找到Excel文件")
         return False
     
-    print(f"ℹ️ 发现 {len(files)} 个Excel文件，准备上传...")
-    
-    # 上传文件到HDFS
-    successful_uploads = 0
-    for filename in files:
-        local_path = os.path.join(data_dir, filename)
-        hdfs_path = f"{Config.HDFS_BASE_PATH}/{filename}"
-        
-        if upload_file_to_hdfs(local_path, hdfs_path):
-            successful_uploads += 1
-    
-    print(f"\n🎉 上传完成! 成功上传 {successful_uploads}/{len(files)} 个文件到 {Config.HDFS_BASE_PATH}")
+    print(f"ℹ️ 发现 {len(files)} 个Excel文件，使用 {Config.HDFS_SYNC_WORKERS} 个线程并行同步...")
+    
+    # 并行上传文件到HDFS，内容未变化的文件跳过
+    start = time.time()
+    report = get_syncer().sync_directory(data_dir, Config.HDFS_BASE_PATH, force=force)
+    for local_path in report['uploaded']:
+        print(f"✅ 已上传: {os.path.basename(local_path)}")
+    for local_path in report['skipped']:
+        print(f"⏭️ 未变化，跳过: {os.path.basename(local_path)}")
+    for local_path, error in report['failed'].items():
+        print(f"❌ 上传失败 {os.path.basename(local_path)}: {error}")
+    successful_uploads = len(report['uploaded']) + len(report['skipped'])
+    
+    print(f"\n🎉 同步完成! 上传 {len(report['uploaded'])} 个，跳过 {len(report['skipped'])} 个，"
+          f"失败 {len(report['failed'])} 个，耗时 {time.time() - start:.2f} 秒")
+    print(f"📋 上传清单: {Config.HDFS_SYNC_MANIFEST}（重新运行会从断点继续）")
     print(f"📋 可以通过以下命令查看文件列表:")
     print(f"   hadoop fs -ls {Config.HDFS_BASE_PATH}")
     
@@ -171,7 +175,7 @@ if __name__ == "__main__":
     print("🚀 开始将制造业数据上传到HDFS...")
     
     # 如果第一次尝试失败，询问是否使用本地模式
-    if not upload_data_directory():
+    if not upload_data_directory(force='--force' in sys.argv):
         print("\n⚠️ HDFS上传遇到问题")
         user_input = input("您希望为应用创建本地模式备份吗? (y/n): ")
         if user_input.lower() == 'y':